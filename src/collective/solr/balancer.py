@@ -0,0 +1,112 @@
+from logging import getLogger
+from httplib import HTTPException
+from socket import error
+from threading import Lock, Thread
+from time import sleep, time
+
+from collective.solr.timeout import HTTPConnectionWithTimeout
+
+logger = getLogger('collective.solr.balancer')
+
+
+def ping(host, base, timeout=5):
+    """ check if the solr server at the given host is responding """
+    conn = HTTPConnectionWithTimeout(host, timeout=timeout)
+    try:
+        try:
+            conn.request('GET', '%s/admin/ping' % base)
+            response = conn.getresponse()
+            response.read()
+            return response.status == 200
+        except (error, HTTPException):
+            return False
+    finally:
+        conn.close()
+
+
+class SolrNodes(object):
+    """ a set of solr servers (replicas) searches are distributed across
+        in round-robin fashion;  nodes failing to answer a request are
+        ejected and probed again in the background until they respond """
+
+    def __init__(self, hosts, base, interval=30):
+        self.hosts = list(hosts)
+        self.base = base
+        self.interval = interval    # seconds between probes of ejected nodes
+        self.ejected = {}           # ejected nodes and their ejection times
+        self.counter = 0
+        self.lock = Lock()
+        self.prober = None
+
+    def healthy(self):
+        """ return the list of nodes currently considered healthy """
+        return [host for host in self.hosts if host not in self.ejected]
+
+    def choose(self):
+        """ return the next healthy node or `None` if all have failed """
+        self.lock.acquire()
+        try:
+            hosts = self.healthy()
+            if not hosts:
+                return None
+            self.counter += 1
+            return hosts[self.counter % len(hosts)]
+        finally:
+            self.lock.release()
+
+    def eject(self, host):
+        """ mark the given node as unhealthy and start probing it """
+        self.lock.acquire()
+        try:
+            if host not in self.hosts or host in self.ejected:
+                return
+            logger.warning('ejecting unresponsive solr node %s', host)
+            self.ejected[host] = time()
+            if self.prober is None:
+                self.prober = Thread(target=self.probe,
+                    name='collective.solr node prober')
+                self.prober.setDaemon(True)
+                self.prober.start()
+        finally:
+            self.lock.release()
+
+    def restore(self, host):
+        """ mark the given node as healthy again """
+        self.lock.acquire()
+        try:
+            if self.ejected.pop(host, None) is not None:
+                logger.info('solr node %s is responding again', host)
+        finally:
+            self.lock.release()
+
+    def probe(self):
+        """ periodically check all ejected nodes until none are left """
+        while True:
+            sleep(self.interval)
+            for host in list(self.ejected):
+                if ping(host, self.base):
+                    self.restore(host)
+            self.lock.acquire()
+            try:
+                if not self.ejected:
+                    self.prober = None
+                    return
+            finally:
+                self.lock.release()
+
+
+# like the connection pools the node sets are shared process-wide
+nodes = {}
+nodesLock = Lock()
+
+
+def getNodes(hosts, base):
+    """ return the node set for the given list of solr servers """
+    key = tuple(hosts), base
+    nodesLock.acquire()
+    try:
+        if key not in nodes:
+            nodes[key] = SolrNodes(hosts, base)
+        return nodes[key]
+    finally:
+        nodesLock.release()
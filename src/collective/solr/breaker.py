@@ -0,0 +1,100 @@
+from logging import getLogger
+from threading import Lock
+from time import time
+
+logger = getLogger('collective.solr.breaker')
+
+
+class CircuitBreaker(object):
+    """ a circuit breaker for requests to a solr server;  it opens after
+        `threshold` consecutive failures, after which requests are refused
+        immediately instead of waiting for timeouts;  once `cooldown`
+        seconds have passed it "half-opens" and lets a single request
+        through, closing again on success or re-opening on failure """
+
+    def __init__(self, host, threshold=5, cooldown=30):
+        self.host = host
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened = None          # time the breaker was opened at
+        self.probing = False
+        self.lock = Lock()
+
+    def isOpen(self, now=None):
+        """ check if requests are currently refused (not counting the
+            probe requests let through when half-open) """
+        opened = self.opened
+        if opened is None:
+            return False
+        return (now or time()) - opened < self.cooldown
+
+    def allow(self, now=None):
+        """ check if a request may be sent """
+        self.lock.acquire()
+        try:
+            if self.opened is None:
+                return True
+            if self.probing or self.isOpen(now):
+                return False
+            logger.info('probing solr server at %s', self.host)
+            self.probing = True     # half-open: let one request through
+            return True
+        finally:
+            self.lock.release()
+
+    def success(self):
+        """ record a successful request """
+        if self.failures or self.opened is not None:
+            self.lock.acquire()
+            try:
+                if self.opened is not None:
+                    logger.warning('solr server at %s is available again, '
+                        'closing circuit breaker', self.host)
+                self.failures = 0
+                self.opened = None
+                self.probing = False
+            finally:
+                self.lock.release()
+
+    def cancel(self):
+        """ end the probe let through while half-open without recording
+            an outcome, e.g. when it failed for reasons unrelated to the
+            availability of the server, so another request can probe """
+        self.lock.acquire()
+        try:
+            self.probing = False
+        finally:
+            self.lock.release()
+
+    def failure(self, now=None):
+        """ record a failed request """
+        self.lock.acquire()
+        try:
+            self.failures += 1
+            if self.probing or (self.opened is None and
+                    self.failures >= self.threshold):
+                logger.warning('solr server at %s failed %d time(s), '
+                    'opening circuit breaker for %ds', self.host,
+                    self.failures, self.cooldown)
+                self.opened = now or time()
+                self.probing = False
+        finally:
+            self.lock.release()
+
+
+# breakers are shared process-wide, keyed by solr server
+breakers = {}
+breakersLock = Lock()
+
+
+def getBreaker(host, base):
+    """ return the circuit breaker for the given solr server """
+    breakersLock.acquire()
+    try:
+        breaker = breakers.get((host, base), None)
+        if breaker is None:
+            breaker = breakers[host, base] = CircuitBreaker(host)
+        return breaker
+    finally:
+        breakersLock.release()
@@ -15,6 +15,7 @@ from collective.solr.interfaces import ISolrConnectionManager
 from collective.solr.interfaces import ISolrMaintenanceView
 from collective.solr.interfaces import ISolrAddHandler
 from collective.solr.interfaces import ISearch
+from collective.solr.memo import forgetSearches
 from collective.solr.indexer import indexable, handlers, SolrIndexProcessor
 from collective.solr.indexer import boost_values
 from collective.solr.parser import parse_date_as_datetime
@@ -24,7 +25,6 @@ from collective.solr.utils import findObjects
 from collective.solr.utils import prepareData
 
 logger = getLogger('collective.solr.maintenance')
-MAX_ROWS = 1000000000
 
 
 def timer(func=time):
@@ -89,6 +89,7 @@ class SolrMaintenanceView(BrowserView):
         conn.setTimeout(None)
         conn.deleteByQuery('%s:[* TO *]' % uniqueKey)
         conn.commit()
+        forgetSearches()    # the request's responses are outdated
         return 'solr index cleared.'
 
     def reindex(self, batch=1000, skip=0):
@@ -150,12 +151,35 @@ class SolrMaintenanceView(BrowserView):
                     log('missing data, skipping indexing of %r.\n' % obj)
         checkPoint()
         conn.commit()
+        forgetSearches()
         log('solr index rebuilt.\n')
         msg = 'processed %d items in %s (%s cpu time).'
         msg = msg % (processed, real.next(), cpu.next())
         log(msg)
         logger.info(msg)
 
+    def replay(self):
+        """ send the update requests spooled while the solr server was
+            unavailable """
+        manager = queryUtility(ISolrConnectionManager)
+        conn = manager.getConnection()
+        if conn.spool is None or not conn.spool.pending():
+            return 'no spooled requests found.'
+        schema = manager.getSchema()
+        if schema is None:
+            logger.warning('unable to fetch schema, not replaying %d '
+                'spooled request(s)', len(conn.spool))
+            return 'unable to fetch schema, spooled requests not sent.'
+        uniqueKey = schema.uniqueKey
+        conn.setTimeout(None)
+        count = len(conn.spool)
+        if not conn.spool.replay(conn, uniqueKey):
+            return '%d of %d spooled request(s) could not be sent.' % (
+                len(conn.spool), count)
+        conn.commit()
+        forgetSearches()
+        return '%d spooled request(s) sent.' % count
+
     def sync(self, batch=1000):
         """Sync the Solr index with the portal catalog. Records contained
         in the catalog but not in Solr will be indexed and records not
@@ -176,18 +200,18 @@ class SolrMaintenanceView(BrowserView):
         cpu = timer(clock)      # cpu time
         # get Solr status
         query = '+%s:[* TO *]' % key
-        response = conn.search(q=query, rows=MAX_ROWS, fl='%s modified' % key)
         # avoid creating DateTime instances
         simple_unmarshallers = unmarshallers.copy()
         simple_unmarshallers['date'] = parse_date_as_datetime
-        flares = SolrResponse(response, simple_unmarshallers)
-        response.close()
+        parser = SolrResponse(unmarshallers=simple_unmarshallers)
         solr_results = {}
         solr_uids = set()
         def _utc_convert(value):
             t_tup = value.utctimetuple()
             return ((((t_tup[0] * 12 + t_tup[1]) * 31 + t_tup[2])
                       * 24 + t_tup[3]) * 60 + t_tup[4])
+        flares = conn.iterate(key, batch, parser, q=query,   # page by page
+            fl='%s modified' % key)
         for flare in flares:
             uid = flare[key]
             solr_uids.add(uid)
@@ -276,6 +300,7 @@ class SolrMaintenanceView(BrowserView):
                 if obj is not None:
                     obj._p_deactivate()
         conn.commit()
+        forgetSearches()
         log('solr index synced.\n')
         msg = 'processed %d object(s) in %s (%s cpu time).'
         msg = msg % (processed, real.next(), cpu.next())
@@ -0,0 +1,217 @@
+from logging import getLogger
+from httplib import HTTPException
+from socket import error
+from threading import Lock
+from time import time
+
+from collective.solr.exceptions import SolrUnavailableException
+from collective.solr.solr import SolrException
+
+logger = getLogger('collective.solr.cache')
+
+
+def normalize(query, params):
+    """ return a key for the given query and parameters, which is the
+        same for equivalent searches, or `None` if the parameters cannot
+        be used in a key """
+    items = []
+    for name, value in params.items():
+        if isinstance(value, (list, tuple)):
+            value = tuple(value)
+            if name == 'fq':            # the order doesn't matter here
+                value = tuple(sorted(value))
+        items.append((name, value))
+    key = ' '.join(query.split()), tuple(sorted(items))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+class Entry(object):
+    """ a cached search response, linked into the lru list """
+
+    __slots__ = ('key', 'response', 'size', 'expires', 'prev', 'next')
+
+    def __init__(self, key=None, response=None, size=0, expires=0):
+        self.key = key
+        self.response = response
+        self.size = size
+        self.expires = expires
+        self.prev = self.next = self
+
+
+class SolrResultCache(object):
+    """ an lru cache of parsed search responses shared by all threads;
+        entries expire after `ttl` seconds and the total size of the
+        responses (as sent by solr) is limited to `size` bytes;  the cache
+        is cleared whenever the index changes, i.e. when this process
+        commits or the index version reported by solr has changed, which
+        is checked every `check` seconds """
+
+    def __init__(self, size=1048576, ttl=60, check=10):
+        self.size = size
+        self.ttl = ttl
+        self.check = check
+        self.lock = Lock()
+        self.generation = 0         # incremented on every invalidation
+        self.versions = {}          # the last seen index versions by host
+        self.checked = 0            # the time of the last version check
+        self.stale = False          # whether the version needs checking
+        self.stats = dict(hits=0, misses=0, evictions=0, invalidations=0)
+        self.clear()
+
+    def clear(self):
+        """ remove all entries """
+        self.lock.acquire()
+        try:
+            self.entries = {}
+            self.head = Entry()     # the most recently used entry follows
+            self.bytes = 0
+            self.generation += 1
+        finally:
+            self.lock.release()
+
+    def key(self, query, params):
+        """ return a normalized key for the given query and parameters;
+            the filter queries holding the security tokens (i.e. the
+            values of `allowedRolesAndUsers`) are part of it """
+        return normalize(query, params)
+
+    def get(self, key, now=None):
+        """ return a copy of the cached response for the given key or
+            `None`;  it can be modified without affecting the cache """
+        if key is None:
+            return None
+        now = now or time()
+        self.lock.acquire()
+        try:
+            if self.check and now - self.checked >= self.check:
+                self.checked = now      # let the next search check the
+                self.stale = True       # index version (see `set`)
+                entry = None
+            else:
+                entry = self.entries.get(key, None)
+            if entry is not None and entry.expires <= now:
+                self.remove(entry)
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            self.unlink(entry)
+            self.link(entry)
+            response = entry.response
+        finally:
+            self.lock.release()
+        return response.copy()
+
+    def set(self, key, response, size, generation, conn=None, now=None):
+        """ add the given response, which was received from solr via the
+            given connection;  it's dropped if the cache was invalidated
+            since `generation` was taken, i.e. while searching, or if its
+            size isn't known """
+        if self.stale and conn is not None:
+            self.validate(conn)
+        if key is None or size is None or size > self.size / 10:
+            return          # keep the cache from being flushed by a few
+                            # large responses
+        now = now or time()
+        self.lock.acquire()
+        try:
+            if generation != self.generation:
+                return
+            entry = self.entries.get(key, None)
+            if entry is not None:
+                self.remove(entry)
+            entry = self.entries[key] = Entry(key, response, size,
+                now + self.ttl)
+            self.link(entry)
+            self.bytes += size
+            while self.bytes > self.size:
+                self.remove(self.head.prev)
+                self.stats['evictions'] += 1
+        finally:
+            self.lock.release()
+
+    def validate(self, conn):
+        """ check the index version reported via the given connection and
+            invalidate the cache if it has changed """
+        self.stale = False
+        try:
+            version = conn.getIndexVersion()
+        except (SolrException, SolrUnavailableException, HTTPException,
+                error):
+            logger.warning('could not check index version of %s',
+                conn.host, exc_info=True)
+            return
+        last = self.versions.get(conn.host, None)
+        self.versions[conn.host] = version
+        if last is not None and version != last:
+            logger.debug('index version of %s changed', conn.host)
+            self.invalidate()
+
+    def invalidate(self):
+        """ drop all entries, e.g. after a commit """
+        self.lock.acquire()
+        try:
+            self.stats['invalidations'] += 1
+        finally:
+            self.lock.release()
+        self.clear()
+
+    def link(self, entry):
+        """ insert the given entry as the most recently used one """
+        head = self.head
+        entry.prev = head
+        entry.next = head.next
+        head.next.prev = entry
+        head.next = entry
+
+    def unlink(self, entry):
+        """ remove the given entry from the lru list """
+        entry.prev.next = entry.next
+        entry.next.prev = entry.prev
+
+    def remove(self, entry):
+        """ remove the given entry from the cache """
+        self.unlink(entry)
+        del self.entries[entry.key]
+        self.bytes -= entry.size
+
+    def statistics(self):
+        """ return usage statistics of the cache """
+        self.lock.acquire()
+        try:
+            stats = dict(self.stats)
+            stats.update(size=self.size, bytes=self.bytes,
+                entries=len(self.entries))
+            return stats
+        finally:
+            self.lock.release()
+
+
+# like the connection pools the caches are shared process-wide
+caches = {}
+cachesLock = Lock()
+
+
+def getResultCache(host, base, size, ttl):
+    """ return the result cache for the given solr server using the given
+        settings or `None` if caching is disabled """
+    cachesLock.acquire()
+    try:
+        cache = caches.get((host, base), None)
+        if not size or not ttl:
+            if cache is not None:
+                del caches[host, base]
+            return None
+        if cache is None:
+            cache = caches[host, base] = SolrResultCache(size, ttl)
+        cache.size = size
+        cache.ttl = ttl
+        return cache
+    finally:
+        cachesLock.release()
+
@@ -66,6 +66,18 @@ class SolrControlPanelAdapter(SchemaAdapterBase):
 
     base = property(getBase, setBase)
 
+    def getReplicas(self):
+        util = queryUtility(ISolrConnectionConfig)
+        return getattr(util, 'replicas', '')
+
+    def setReplicas(self, value):
+        util = queryUtility(ISolrConnectionConfig)
+        if util is not None:
+            util.replicas = value
+        self.reset()
+
+    replicas = property(getReplicas, setReplicas)
+
     def getAsync(self):
         util = queryUtility(ISolrConnectionConfig)
         return getattr(util, 'async', '')
@@ -121,6 +133,61 @@ class SolrControlPanelAdapter(SchemaAdapterBase):
 
     search_timeout = property(getSearchTimeout, setSearchTimeout)
 
+    def getPoolSize(self):
+        util = queryUtility(ISolrConnectionConfig)
+        return getattr(util, 'pool_size', '')
+
+    def setPoolSize(self, value):
+        util = queryUtility(ISolrConnectionConfig)
+        if util is not None:
+            util.pool_size = value
+
+    pool_size = property(getPoolSize, setPoolSize)
+
+    def getBatchSize(self):
+        util = queryUtility(ISolrConnectionConfig)
+        return getattr(util, 'batch_size', '')
+
+    def setBatchSize(self, value):
+        util = queryUtility(ISolrConnectionConfig)
+        if util is not None:
+            util.batch_size = value
+
+    batch_size = property(getBatchSize, setBatchSize)
+
+    def getBatchBytes(self):
+        util = queryUtility(ISolrConnectionConfig)
+        return getattr(util, 'batch_bytes', '')
+
+    def setBatchBytes(self, value):
+        util = queryUtility(ISolrConnectionConfig)
+        if util is not None:
+            util.batch_bytes = value
+
+    batch_bytes = property(getBatchBytes, setBatchBytes)
+
+    def getUpdateConnections(self):
+        util = queryUtility(ISolrConnectionConfig)
+        return getattr(util, 'update_connections', '')
+
+    def setUpdateConnections(self, value):
+        util = queryUtility(ISolrConnectionConfig)
+        if util is not None:
+            util.update_connections = value
+
+    update_connections = property(getUpdateConnections, setUpdateConnections)
+
+    def getCompression(self):
+        util = queryUtility(ISolrConnectionConfig)
+        return getattr(util, 'compression', '')
+
+    def setCompression(self, value):
+        util = queryUtility(ISolrConnectionConfig)
+        if util is not None:
+            util.compression = value
+
+    compression = property(getCompression, setCompression)
+
     def getMaxResults(self):
         util = queryUtility(ISolrConnectionConfig)
         return getattr(util, 'max_results', '')
@@ -132,6 +199,28 @@ class SolrControlPanelAdapter(SchemaAdapterBase):
 
     max_results = property(getMaxResults, setMaxResults)
 
+    def getSearchCacheSize(self):
+        util = queryUtility(ISolrConnectionConfig)
+        return getattr(util, 'search_cache_size', '')
+
+    def setSearchCacheSize(self, value):
+        util = queryUtility(ISolrConnectionConfig)
+        if util is not None:
+            util.search_cache_size = value
+
+    search_cache_size = property(getSearchCacheSize, setSearchCacheSize)
+
+    def getSearchCacheTTL(self):
+        util = queryUtility(ISolrConnectionConfig)
+        return getattr(util, 'search_cache_ttl', '')
+
+    def setSearchCacheTTL(self, value):
+        util = queryUtility(ISolrConnectionConfig)
+        if util is not None:
+            util.search_cache_ttl = value
+
+    search_cache_ttl = property(getSearchCacheTTL, setSearchCacheTTL)
+
     def getRequiredParameters(self):
         util = queryUtility(ISolrConnectionConfig)
         return getattr(util, 'required', '')
@@ -176,6 +265,17 @@ class SolrControlPanelAdapter(SchemaAdapterBase):
 
     filter_queries = property(getFilterQueryParameters, setFilterQueryParameters)
 
+    def getFieldLists(self):
+        util = queryUtility(ISolrConnectionConfig)
+        return getattr(util, 'field_lists', '')
+
+    def setFieldLists(self, value):
+        util = queryUtility(ISolrConnectionConfig)
+        if util is not None:
+            util.field_lists = value
+
+    field_lists = property(getFieldLists, setFieldLists)
+
     def getSlowQueryThreshold(self):
         util = queryUtility(ISolrConnectionConfig)
         return getattr(util, 'slow_query_threshold', '')
@@ -1,26 +1,40 @@
+from logging import getLogger
+from httplib import HTTPException
+from socket import error
 from zope.interface import implements
 from zope.component import queryUtility, queryMultiAdapter, getSiteManager
 from zope.publisher.interfaces.http import IHTTPRequest
 from Acquisition import aq_base
 from Missing import MV
+from DateTime import DateTime
 from Products.ZCatalog.ZCatalog import ZCatalog
+from Products.CMFCore.utils import getToolByName
 
 from collective.solr.interfaces import ISolrConnectionConfig
 from collective.solr.interfaces import ISearchDispatcher
 from collective.solr.interfaces import ISearch
 from collective.solr.interfaces import IFlare
+from collective.solr.exceptions import SolrUnavailableException
+from collective.solr.exceptions import SolrInactiveException
 from collective.solr.utils import isActive, prepareData
 from collective.solr.utils import padResults
 from collective.solr.mangler import mangleQuery
 from collective.solr.mangler import extractQueryParameters
 from collective.solr.mangler import cleanupQueryParameters
+from collective.solr.mangler import fieldListParameter
 from collective.solr.mangler import optimizeQueryParameters
 from collective.solr.lingua import languageFilter
+from collective.solr.solr import SolrException
+from collective.solr.cache import normalize
+from collective.solr.memo import getSearchMemo
 
 from collective.solr.monkey import patchCatalogTool, patchLazy
+from collective.solr.monkey import catalogArguments
 patchCatalogTool() # patch catalog tool to use the dispatcher...
 patchLazy() # ...as well as ZCatalog's Lazy class
 
+logger = getLogger('collective.solr.dispatcher')
+
 
 class FallBackException(Exception):
     """ exception indicating the dispatcher should fall back to searching
@@ -42,14 +56,19 @@ class SearchDispatcher(object):
                 return solrSearchResults(request, **keywords)
             except FallBackException:
                 pass
+            except SolrUnavailableException:
+                # solr is known to be down, so use the catalog instead
+                # of letting all requests wait for their timeouts...
+                logger.debug('solr is unavailable, using the portal catalog')
         if getattr(aq_base(self.context), '_cs_old_searchResults', None):
             return self.context._cs_old_searchResults(request, **keywords)
         return ZCatalog.searchResults(self.context, request, **keywords)
 
 
-def solrSearchResults(request=None, **keywords):
-    """ perform a query using solr after translating the passed in
-        parameters with portal catalog semantics """
+def prepareSearch(request=None, **keywords):
+    """ translate the passed in parameters with portal catalog semantics
+        into a solr query;  the request to be used for the results, the
+        query, its parameters and the fields to be returned are returned """
     search = queryUtility(ISearch)
     config = queryUtility(ISolrConnectionConfig)
     if request is None:
@@ -70,6 +89,11 @@ def solrSearchResults(request=None, **keywords):
         request = getattr(getSiteManager(), 'REQUEST', args)
     if 'path' in args and 'navtree' in args['path']:
         raise FallBackException     # we can't handle navtree queries yet
+    effective = args.get('effectiveRange', None)
+    if isinstance(effective, DateTime):
+        memo = getSearchMemo(request, create=True)
+        if memo is not None:        # let identical queries stay the same
+            args['effectiveRange'] = memo.effective(effective)
     use_solr = args.get('use_solr', False)  # A special key to force Solr
     if not use_solr and config.required:
         required = set(config.required).intersection(args)
@@ -81,22 +105,134 @@ def solrSearchResults(request=None, **keywords):
             raise FallBackException
     schema = search.getManager().getSchema() or {}
     params = cleanupQueryParameters(extractQueryParameters(args), schema)
+    fields = fieldListParameter(params, config, schema)
     languageFilter(args)
     prepareData(args)
     mangleQuery(args, config, schema)
     query = search.buildQuery(**args)
     optimizeQueryParameters(query, params)
-    __traceback_info__ = (query, params, args)
-    response = search(query, fl='* score', **params)
+    key = getattr(schema, 'uniqueKey', None)
+    if params.get('rows') == 0 and key:     # only count the results, in
+        params['fl'] = key                  # which case scores aren't needed
+    return request, query, params, fields
+
+
+def searchKey(query, params):
+    """ return a key identifying the given search """
+    if isinstance(query, dict):
+        query = ' '.join(sorted(query.values()))
+    return normalize(query, params)
+
+
+def solrSearchResults(request=None, **keywords):
+    """ perform a query using solr after translating the passed in
+        parameters with portal catalog semantics """
+    search = queryUtility(ISearch)
+    request, query, params, fields = prepareSearch(request, **keywords)
+    __traceback_info__ = (query, params, keywords)
+    key = searchKey(query, params)
+    memo = key is not None and getSearchMemo(request, create=True) or None
+    response = memo is not None and memo.get(key) or None
+    if response is None:
+        future = memo is not None and memo.prefetch(key) or None
+        if future is not None:
+            response = future.result()      # the search was prefetched
+        else:
+            response = search(query, **params)
+        if memo is not None:
+            response = memo.set(key, response)
+    schema = search.getManager().getSchema() or {}
     def wrap(flare):
         """ wrap a flare object with a helper class """
         adapter = queryMultiAdapter((flare, request), IFlare)
         return adapter is not None and adapter or flare
-    results = response.results()
-    for idx, flare in enumerate(results):
-        flare = wrap(flare)
-        for missing in set(schema.stored).difference(flare):
-            flare[missing] = MV
-        results[idx] = wrap(flare)
-    padResults(results, **params)           # pad the batch
+    stored = frozenset(getattr(schema, 'stored', ()))
+    if fields is not None:          # only pad the requested fields
+        stored = stored.intersection(fields)
+    defaults = dict.fromkeys(stored, MV)
+    def process(response):
+        """ let missing stored fields of the flares default to `MV` """
+        fields = getattr(response, 'flareFields', None)
+        if fields is not None:
+            fields.defaults = defaults
+        return response.results()
+    extra = {}
+    if params.get('rows') == 0:     # the results are only counted, see above
+        extra['fl'] = fields and ' '.join(sorted(fields)) or '* score'
+    def fetch(start, rows):
+        """ fetch another window of results, e.g. for a different batch """
+        try:
+            more = search(query, **dict(params, start=start, rows=rows,
+                **extra))
+        except (SolrException, SolrInactiveException, HTTPException, error):
+            logger.exception('could not fetch results %d-%d for %r (%r)',
+                start, start + rows, query, params)
+            return []
+        return process(more)
+    # flares only get wrapped when they're accessed, e.g. for a batch
+    response.response = padResults(process(response), fetch=fetch,
+        wrapper=wrap, **params)
     return response
+
+
+class PrefetchedResults(object):
+    """ the results of a catalog query, which are only waited for when
+        they're accessed """
+
+    __allow_access_to_unprotected_subobjects__ = True
+
+    def __init__(self, catalog, keywords):
+        self.catalog = catalog
+        self.keywords = keywords
+        self.response = None
+
+    def results(self):
+        """ perform the query, using the prefetched response if possible """
+        if self.response is None:
+            self.response = self.catalog.searchResults(**self.keywords)
+        return self.response
+
+    def __len__(self):
+        return len(self.results())
+
+    def __getitem__(self, index):
+        return self.results()[index]
+
+    def __iter__(self):
+        return iter(self.results())
+
+    def __getattr__(self, name):
+        if name in ('catalog', 'keywords', 'response'):
+            raise AttributeError(name)
+        return getattr(self.results(), name)
+
+
+def prefetch(context, *queries):
+    """ send the given catalog queries (i.e. dicts with keyword arguments
+        for `searchResults`) to solr in parallel;  the responses are kept
+        for the current request and used once the same queries are made,
+        e.g. by portlets, so that views can prefetch the searches needed
+        for a page;  for each query an object giving access to its results
+        is returned, which only waits for the response when accessed """
+    catalog = getToolByName(context, 'portal_catalog')
+    results = [PrefetchedResults(catalog, keywords) for keywords in queries]
+    if not isActive():
+        return results
+    search = queryUtility(ISearch)
+    memo = getSearchMemo(create=True)
+    if memo is None:
+        return results
+    for keywords in queries:
+        try:
+            ignored, query, params, fields = prepareSearch(None,
+                **catalogArguments(catalog, keywords))
+        except FallBackException:
+            continue
+        key = searchKey(query, params)
+        if key is None or key in memo.responses or key in memo.futures:
+            continue                # identical queries are only sent once
+        try:
+            memo.futures[key] = search.submit(query, **params)
+        except SolrInactiveException:
+            break
+    return results
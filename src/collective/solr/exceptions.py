@@ -1,4 +1,12 @@
 
 
+from socket import error
+
+
 class SolrInactiveException(Exception):
     """ an exception indicating the solr integration is not activated """
+
+
+class SolrUnavailableException(error):
+    """ an exception indicating the solr server is considered to be down,
+        i.e. its circuit breaker is open, so no request was attempted """
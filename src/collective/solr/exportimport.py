@@ -29,16 +29,25 @@ class SolrConfigXMLAdapter(XMLAdapterBase):
         self.context.host = ''
         self.context.port = 0
         self.context.base = ''
+        self.context.replicas = []
         self.context.async = False
         self.context.auto_commit = True
         self.context.commit_within = 0
         self.context.index_timeout = 0
         self.context.search_timeout = 0
+        self.context.pool_size = 10
+        self.context.batch_size = 100
+        self.context.batch_bytes = 1048576
+        self.context.update_connections = 1
+        self.context.compression = False
         self.context.max_results = 0
+        self.context.search_cache_size = 0
+        self.context.search_cache_ttl = 60
         self.context.required = []
         self.context.search_pattern = ''
         self.context.facets = []
         self.context.filter_queries = []
+        self.context.field_lists = []
         self.context.slow_query_threshold = 0
         self.context.effective_steps = 1
         self.context.exclude_user = False
@@ -59,6 +68,11 @@ class SolrConfigXMLAdapter(XMLAdapterBase):
                     self.context.host = str(child.getAttribute('value'))
                 elif child.nodeName == 'base':
                     self.context.base = str(child.getAttribute('value'))
+                elif child.nodeName == 'replicas':
+                    value = []
+                    for elem in child.getElementsByTagName('replica'):
+                        value.append(elem.getAttribute('host'))
+                    self.context.replicas = tuple(map(str, value))
         elems = node.getElementsByTagName('settings')
         if elems:
             assert len(elems) == 1
@@ -79,9 +93,30 @@ class SolrConfigXMLAdapter(XMLAdapterBase):
                 elif child.nodeName == 'search-timeout':
                     value = float(str(child.getAttribute('value')))
                     self.context.search_timeout = value
+                elif child.nodeName == 'pool-size':
+                    value = int(str(child.getAttribute('value')))
+                    self.context.pool_size = value
+                elif child.nodeName == 'batch-size':
+                    value = int(str(child.getAttribute('value')))
+                    self.context.batch_size = value
+                elif child.nodeName == 'batch-bytes':
+                    value = int(str(child.getAttribute('value')))
+                    self.context.batch_bytes = value
+                elif child.nodeName == 'update-connections':
+                    value = int(str(child.getAttribute('value')))
+                    self.context.update_connections = value
+                elif child.nodeName == 'compression':
+                    value = str(child.getAttribute('value'))
+                    self.context.compression = self._convertToBoolean(value)
                 elif child.nodeName == 'max-results':
                     value = int(str(child.getAttribute('value')))
                     self.context.max_results = value
+                elif child.nodeName == 'search-cache-size':
+                    value = int(str(child.getAttribute('value')))
+                    self.context.search_cache_size = value
+                elif child.nodeName == 'search-cache-ttl':
+                    value = int(str(child.getAttribute('value')))
+                    self.context.search_cache_ttl = value
                 elif child.nodeName == 'required-query-parameters':
                     value = []
                     for elem in child.getElementsByTagName('parameter'):
@@ -100,6 +135,11 @@ class SolrConfigXMLAdapter(XMLAdapterBase):
                     for elem in child.getElementsByTagName('parameter'):
                         value.append(elem.getAttribute('name'))
                     self.context.filter_queries = tuple(map(str, value))
+                elif child.nodeName == 'field-lists':
+                    value = []
+                    for elem in child.getElementsByTagName('parameter'):
+                        value.append(elem.getAttribute('name'))
+                    self.context.field_lists = tuple(map(str, value))
                 elif child.nodeName == 'slow-query-threshold':
                     value = int(str(child.getAttribute('value')))
                     self.context.slow_query_threshold = value
@@ -125,6 +165,12 @@ class SolrConfigXMLAdapter(XMLAdapterBase):
         conn.appendChild(create('host', self.context.host))
         conn.appendChild(create('port', str(self.context.port)))
         conn.appendChild(create('base', self.context.base))
+        replicas = self._doc.createElement('replicas')
+        conn.appendChild(replicas)
+        for host in self.context.replicas:
+            replica = self._doc.createElement('replica')
+            replica.setAttribute('host', host)
+            replicas.appendChild(replica)
         settings = self._doc.createElement('settings')
         node.appendChild(settings)
         append = settings.appendChild
@@ -133,7 +179,16 @@ class SolrConfigXMLAdapter(XMLAdapterBase):
         append(create('commit-within', str(self.context.commit_within)))
         append(create('index-timeout', str(self.context.index_timeout)))
         append(create('search-timeout', str(self.context.search_timeout)))
+        append(create('pool-size', str(self.context.pool_size)))
+        append(create('batch-size', str(self.context.batch_size)))
+        append(create('batch-bytes', str(self.context.batch_bytes)))
+        append(create('update-connections',
+            str(self.context.update_connections)))
+        append(create('compression', str(bool(self.context.compression))))
         append(create('max-results', str(self.context.max_results)))
+        append(create('search-cache-size',
+            str(self.context.search_cache_size)))
+        append(create('search-cache-ttl', str(self.context.search_cache_ttl)))
         required = self._doc.createElement('required-query-parameters')
         append(required)
         for name in self.context.required:
@@ -153,6 +208,12 @@ class SolrConfigXMLAdapter(XMLAdapterBase):
             param = self._doc.createElement('parameter')
             param.setAttribute('name', name)
             filter_queries.appendChild(param)
+        field_lists = self._doc.createElement('field-lists')
+        append(field_lists)
+        for name in self.context.field_lists:
+            param = self._doc.createElement('parameter')
+            param.setAttribute('name', name)
+            field_lists.appendChild(param)
         append(create('slow-query-threshold',
             str(self.context.slow_query_threshold)))
         append(create('effective-steps', str(self.context.effective_steps)))
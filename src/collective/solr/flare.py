@@ -7,12 +7,12 @@ from DateTime import DateTime
 
 from collective.solr.interfaces import ISolrFlare
 from collective.solr.interfaces import IFlare
-from collective.solr.parser import AttrDict
+from collective.solr.parser import FlareDict, SolrFlare
 
 timezone = DateTime().timezone()
 
 
-class PloneFlare(AttrDict):
+class PloneFlare(FlareDict):
     """ a sol(a)r brain, i.e. a data container for search results """
     implements(IFlare)
     adapts(ISolrFlare, IHTTPRequest)
@@ -22,7 +22,15 @@ class PloneFlare(AttrDict):
     def __init__(self, context, request=None):
         self.context = context
         self.request = request
-        self.update(context)        # copy data
+        if not isinstance(context, FlareDict):
+            context = SolrFlare(context)
+        self._fields = context._fields      # share the field index, but
+        self._values = context._values[:]   # keep changes to ourselves
+
+    def __reduce__(self):
+        state = dict(self.__dict__)
+        del state['context'], state['request']
+        return self.__class__, (dict(self.items()),), state or None
 
     @property
     def id(self):
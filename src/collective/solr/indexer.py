@@ -23,6 +23,8 @@ from collective.solr.interfaces import ISolrIndexQueueProcessor
 from collective.solr.interfaces import ISolrAddHandler
 from collective.solr.solr import SolrException
 from collective.solr.utils import prepareData
+from collective.solr.worker import getWorker
+from collective.solr.memo import forgetSearches
 from socket import error
 from urllib import urlencode, quote
 
@@ -159,7 +161,7 @@ class SolrIndexProcessor(object):
                 logger.warning(msg, obj)
                 return
             if attributes is not None:
-                attributes = set(schema.keys()).intersection(attributes)
+                attributes = schema.fieldNames.intersection(attributes)
                 if not attributes:
                     return
             data, missing = self.getData(obj)
@@ -224,9 +226,15 @@ class SolrIndexProcessor(object):
             config = getUtility(ISolrConnectionConfig)
             if not isinstance(wait, bool):
                 wait = not config.async
+            commit = config.auto_commit and not config.commit_within
             try:
                 logger.debug('committing')
-                if not config.auto_commit or config.commit_within:
+                if config.async and not wait and \
+                        getWorker(conn.host, conn.solrBase).put(conn, commit):
+                    # the requests will be sent by the background worker,
+                    # unless its queue was full, see `SolrIndexWorker.put`
+                    pass
+                elif not commit:
                     # If we have commitWithin enabled, we never want to do
                     # explicit commits. Even though only add's support this
                     # and we might wait a bit longer on delete's this way
@@ -236,6 +244,7 @@ class SolrIndexProcessor(object):
             except (SolrException, error):
                 logger.exception('exception during commit')
             self.manager.closeConnection()
+            forgetSearches()    # the responses might be outdated now
 
     def abort(self):
         conn = self.getConnection()
@@ -281,7 +290,8 @@ class SolrIndexProcessor(object):
         if schema is None:
             return {}, ()
         if attributes is None:
-            attributes = schema.keys()
+            attributes = schema.fieldNames
+        converters = schema.converters(handlers)
         obj = self.wrapObject(obj)
         data, marker = {}, []
         for name in attributes:
@@ -297,16 +307,14 @@ class SolrIndexProcessor(object):
                 logger.exception('Error occured while getting data for '
                     'indexing!')
                 continue
-            field = schema[name]
-            handler = handlers.get(field.class_, None)
+            handler, separator = converters[name]
             if handler is not None:
                 try:
                     value = handler(value)
                 except AttributeError:
                     continue
-            elif isinstance(value, (list, tuple)) and not field.multiValued:
-                separator = getattr(field, 'separator', ' ')
+            elif isinstance(value, (list, tuple)) and separator is not None:
                 value = separator.join(value)
             data[name] = value
-        missing = set(schema.requiredFields) - set(data.keys())
+        missing = schema.required.difference(data)
         return data, missing
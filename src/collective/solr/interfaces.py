@@ -21,10 +21,20 @@ class ISolrSchema(Interface):
     base = TextLine(title=_(u'Base'),
         description=_(u'The base prefix of the Solr instance to be used.'))
 
+    replicas = List(title=_(u'Search replicas'),
+        description=_(u'Specify additional Solr servers as "host:port", one '
+                       'per line, e.g. replication slaves of the above '
+                       'instance. Searches will be distributed across the '
+                       'responding replicas, while all updates are still '
+                       'sent to the above instance only.'),
+        value_type=TextLine(), default=[], required=False)
+
     async = Bool(title=_(u'Asynchronous indexing'), default=False,
         description=_(u'Check to enable asynchronous indexing operations, '
                        'which will improve Zope response times in return for '
-                       'not having the Solr index updated immediately.'))
+                       'not having the Solr index updated immediately. '
+                       'Updates are then sent to Solr by a background '
+                       'thread after the transaction has been committed.'))
 
     auto_commit = Bool(title=_(u'Automatic commit'), default=True,
         description=_(u'If enabled each index operation will cause a commit '
@@ -49,11 +59,55 @@ class ISolrSchema(Interface):
         description=_(u'Number of seconds after which a search request will '
                        'time out. Set to "0" to disable timeouts.'))
 
+    pool_size = Int(title=_(u'Connection pool size'), default=10,
+        description=_(u'Maximum number of connections to the Solr server, '
+                       'which are kept open and shared between all threads '
+                       'of a Zope instance. Set to "0" to open a new '
+                       'connection for every transaction.'))
+
+    batch_size = Int(title=_(u'Update batch size'), default=100,
+        description=_(u'Maximum number of consecutive adds or deletes that '
+                       'will be combined into a single update request. Set '
+                       'to "1" to send every operation separately.'))
+
+    batch_bytes = Int(title=_(u'Update batch bytes'), default=1048576,
+        description=_(u'Maximum size (in bytes) of a combined update '
+                       'request.'))
+
+    update_connections = Int(title=_(u'Parallel update connections'),
+        default=1,
+        description=_(u'Number of connections used to send update requests '
+                       'in parallel, e.g. while reindexing. Updates for the '
+                       'same object always use the same connection, so they '
+                       'are still applied in order.'))
+
+    compression = Bool(title=_(u'Compression'), default=False,
+        description=_(u'Check to gzip large update requests and to accept '
+                       'compressed search responses, which reduces the '
+                       'bandwidth needed between Zope and Solr. The Solr '
+                       'server needs to be set up to handle gzip encoded '
+                       'requests, e.g. using a servlet filter.'))
+
     max_results = Int(title=_(u'Maximum search results'),
         description=_(u'Specify the maximum number of matches to be returned '
                        'when searching. Set to "0" to always return all '
                        'results.'))
 
+    search_cache_size = Int(title=_(u'Search cache size'), default=0,
+        description=_(u'Maximum size (in bytes) of the search responses '
+                       'kept in memory, so that identical queries can be '
+                       'answered without asking Solr again. The cache is '
+                       'cleared on commits and whenever the Solr index has '
+                       'changed. While caching is enabled the effective '
+                       'date used for anonymous searches changes only as '
+                       'often as the cached responses expire (see "Effective '
+                       'date steps"). Use together with "Exclude user" for '
+                       'better hit rates. Set to "0" to disable caching.'))
+
+    search_cache_ttl = Int(title=_(u'Search cache lifetime'), default=60,
+        description=_(u'Number of seconds after which cached search '
+                       'responses expire.'))
+
     required = List(title=_(u'Required query parameters'),
         description = _(u'Specify required query parameters, one per line. '
                          'Searches will only get dispatched to Solr if any '
@@ -83,6 +137,15 @@ class ISolrSchema(Interface):
                          '"review_state portal_type".'),
         value_type = TextLine(), default = [], required = False)
 
+    field_lists = List(title=_(u'Field list profiles'),
+        description = _(u'Specify named lists of fields to be returned '
+                         'with search results, one per line, for example '
+                         '"livesearch: Title Description path_string". '
+                         'Searches can select one of these profiles via the '
+                         '"fl_profile" parameter instead of retrieving all '
+                         'stored fields.'),
+        value_type = TextLine(), default = [], required = False)
+
     slow_query_threshold = Int(title=_(u'Slow query threshold'),
         description=_(u'Specify a threshold (in milliseconds) after which '
                        'queries are considered to be slow causing them to '
@@ -91,7 +154,9 @@ class ISolrSchema(Interface):
     effective_steps = Int(title=_(u'Effective date steps'), default=1,
         description=_(u'Specify the effective date steps in seconds. '
                        'Using 900 seconds (15 minutes) means the effective '
-                       'date sent to Solr changes every 15 minutes.'))
+                       'date sent to Solr changes every 15 minutes. With '
+                       'the search cache enabled, its lifetime is used if '
+                       'that is longer.'))
 
     exclude_user = Bool(title=_(u'Exclude user from allowedRolesAndUsers'),
         description=_(u'Specify whether the user:userid should be excluded '
@@ -111,7 +176,8 @@ class ISolrConnectionManager(Interface):
         """ set connection parameters """
 
     def closeConnection(clearSchema=False):
-        """ close the current connection, if any """
+        """ close the current connection, if any, and optionally make sure
+            the schema is fetched again """
 
     def getConnection():
         """ returns an existing connection or opens one """
@@ -120,6 +186,32 @@ class ISolrConnectionManager(Interface):
         """ returns the currently used schema or fetches it.
             If the schema cannot be fetched None is returned. """
 
+    def getSearchConnection():
+        """ returns a connection to one of the configured replicas for
+            searching or, if there are none, the regular connection """
+
+    def getSearchConnector():
+        """ returns a function for getting a search connection (and a
+            function for handing it back) from other threads, or `None`
+            if solr is not active """
+
+    def releaseSearchConnection(conn, failed=False):
+        """ hand back a connection returned by `getSearchConnection`;
+            replicas with failed connections will not be used again until
+            they are responding again """
+
+    def releaseConnection():
+        """ hand back the current connection to the pool unless it's still
+            needed, i.e. holding requests to be sent """
+
+    def getPoolStatistics():
+        """ returns usage statistics of the connection pool, i.e. the
+            number of hits, misses, waits and reconnects """
+
+    def getCacheStatistics():
+        """ returns usage statistics of the search result cache, i.e. the
+            number of hits, misses, evictions and invalidations """
+
     def setTimeout(timeout, lock=object()):
         """ set the timeout on the current (or to be opened) connection
             to the given value and optionally lock it until explicitly
@@ -158,6 +250,14 @@ class ISearch(Interface):
     def __call__(query, **parameters):
         """ convenience alias for `search` """
 
+    def submit(query, **parameters):
+        """ send a search in the background and return a future, whose
+            `result` method waits for and returns the response """
+
+    def iterate(query, rows=1000, **parameters):
+        """ yield all results of the given query sorted by the unique key,
+            fetching `rows` of them at a time """
+
     def buildQuery(default=None, **args):
         """ helper to build a query for simple use-cases; the query is
             returned as a dictionary which might be string-joined or
@@ -190,6 +290,10 @@ class ISolrMaintenanceView(Interface):
         """ find all contentish objects (meaning all objects derived from one
             of the catalog mixin classes) and (re)indexes them """
 
+    def replay():
+        """ send the update requests spooled while the solr server was
+            unavailable """
+
     def sync(batch=1000):
         """ sync the solr index with the portal catalog;  records contained
             in the catalog but not in solr will be indexed and records not
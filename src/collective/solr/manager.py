@@ -5,6 +5,13 @@ from zope.component import getUtility
 from collective.solr.interfaces import ISolrConnectionConfig
 from collective.solr.interfaces import ISolrConnectionManager
 from collective.solr.solr import SolrConnection
+from collective.solr.pool import getPool
+from collective.solr.balancer import getNodes
+from collective.solr.spool import getSpool
+from collective.solr.breaker import getBreaker
+from collective.solr.schema import getSchemaCache
+from collective.solr.cache import getResultCache
+from collective.solr.exceptions import SolrUnavailableException
 from collective.solr.local import getLocal, setLocal
 from httplib import CannotSendRequest, ResponseNotReady
 from socket import error
@@ -22,16 +29,25 @@ class BaseSolrConnectionConfig(object):
         self.host = None
         self.port = None
         self.base = None
+        self.replicas = []
         self.async = False
         self.auto_commit = True
         self.commit_within = 0
         self.index_timeout = 0
         self.search_timeout = 0
+        self.pool_size = 10
+        self.batch_size = 100
+        self.batch_bytes = 1048576
+        self.update_connections = 1
+        self.compression = False
         self.max_results = 0
+        self.search_cache_size = 0
+        self.search_cache_ttl = 60
         self.required = []
         self.search_pattern = None
         self.facets = []
         self.filter_queries = []
+        self.field_lists = []
         self.slow_query_threshold = 0
         self.effective_steps = 1
         self.exclude_user = False
@@ -40,12 +56,21 @@ class BaseSolrConnectionConfig(object):
 class SolrConnectionConfig(BaseSolrConnectionConfig, Persistent):
 
     max_results = 0             # provide backwards compatibility
+    replicas = ()
     auto_commit = True
+    pool_size = 10
+    batch_size = 100
+    batch_bytes = 1048576
+    update_connections = 1
+    compression = False
     commit_within = 0
+    search_cache_size = 0
+    search_cache_ttl = 60
     required = ()
     search_pattern = None
     facets = ()
     filter_queries = ()
+    field_lists = ()
     slow_query_threshold = 0
     effective_steps = 1
     exclude_user = False
@@ -55,6 +80,19 @@ class SolrConnectionConfig(BaseSolrConnectionConfig, Persistent):
         return 'solr'
 
 
+def openSearchConnection(host, base, size, compress, timeout):
+    """ return a (pooled) connection to the given server set up for
+        searching, which needs to be handed back after use """
+    if size:
+        conn = getPool(host, base, size).checkout()
+    else:
+        conn = SolrConnection(host=host, solrBase=base, persistent=True)
+    conn.compress = compress
+    conn.breaker = getBreaker(host, base)
+    conn.setTimeout(timeout or None)
+    return conn
+
+
 class SolrConnectionManager(object):
     """ a thread-local connection manager for solr """
     implements(ISolrConnectionManager)
@@ -79,10 +117,18 @@ class SolrConnectionManager(object):
         logger.debug('closing connection')
         conn = getLocal('connection')
         if conn is not None:
-            conn.close()
+            pool = getLocal('pool')
+            if pool is not None:
+                pool.checkin(conn)
+            else:
+                conn.close()
             setLocal('connection', None)
+            setLocal('pool', None)
         if clearSchema:
-            setLocal('schema', None)
+            config = getUtility(ISolrConnectionConfig)
+            if config.host is not None:
+                host = '%s:%d' % (config.host, config.port)
+                getSchemaCache(host, config.base).clear()
 
     def getConnection(self):
         """ returns an existing connection or opens one """
@@ -92,24 +138,150 @@ class SolrConnectionManager(object):
         conn = getLocal('connection')
         if conn is None and config.host is not None:
             host = '%s:%d' % (config.host, config.port)
-            logger.debug('opening connection to %s', host)
-            conn = SolrConnection(host=host, solrBase=config.base,
-                persistent=True)
+            size = getattr(config, 'pool_size', 0)
+            if size:
+                pool = getPool(host, config.base, size)
+                conn = pool.checkout()
+                setLocal('pool', pool)
+            else:
+                logger.debug('opening connection to %s', host)
+                conn = SolrConnection(host=host, solrBase=config.base,
+                    persistent=True)
+            conn.batchSize = getattr(config, 'batch_size', 0) or 1
+            conn.batchBytes = getattr(config, 'batch_bytes', 0) or 1
+            conn.compress = getattr(config, 'compression', False)
+            conn.senders = getattr(config, 'update_connections', 1) or 1
+            conn.spool = getSpool(host, config.base)
+            conn.breaker = getBreaker(host, config.base)
+            conn.cache = getResultCache(host, config.base,
+                getattr(config, 'search_cache_size', 0),
+                getattr(config, 'search_cache_ttl', 0))
+            schema = getSchemaCache(host, config.base).schema
+            if schema is not None:
+                conn.uniqueKey = schema.get('uniqueKey', None)
             setLocal('connection', conn)
         return conn
 
+    def getReplicas(self):
+        """ returns the list of configured replicas as `host:port` """
+        config = getUtility(ISolrConnectionConfig)
+        replicas = []
+        for replica in getattr(config, 'replicas', None) or ():
+            if not ':' in replica:
+                replica = '%s:%d' % (replica, config.port)
+            replicas.append(str(replica))
+        return replicas
+
+    def getSearchConnection(self):
+        """ returns a connection to one of the configured replicas or, if
+            there are none (or all of them failed), the regular connection """
+        config = getUtility(ISolrConnectionConfig)
+        replicas = self.getReplicas()
+        if not config.active or not replicas:
+            return self.getConnection()
+        host = getNodes(replicas, config.base).choose()
+        if host is None:
+            logger.warning('no solr replica available, using %s', config.host)
+            return self.getConnection()
+        return openSearchConnection(host, config.base,
+            getattr(config, 'pool_size', 0),
+            getattr(config, 'compression', False), config.search_timeout)
+
+    def getSearchConnector(self):
+        """ returns a function, which can be called from other threads to
+            get a connection for searching (to one of the replicas or the
+            regular server) along with a function for handing it back;  if
+            solr isn't active `None` is returned """
+        config = getUtility(ISolrConnectionConfig)
+        if not config.active or config.host is None:
+            return None
+        replicas = self.getReplicas()
+        nodes = replicas and getNodes(replicas, config.base) or None
+        master = '%s:%d' % (config.host, config.port)
+        base = config.base
+        size = getattr(config, 'pool_size', 0)
+        compress = getattr(config, 'compression', False)
+        timeout = config.search_timeout
+        def connect():
+            host = nodes is not None and nodes.choose() or master
+            conn = openSearchConnection(host, base, size, compress, timeout)
+            def release(failed=False):
+                if failed:
+                    if nodes is not None:
+                        nodes.eject(host)
+                    conn.close()
+                if size:
+                    getPool(host, base, size).checkin(conn)
+                else:
+                    conn.close()
+            return conn, release
+        return connect
+
+    def releaseSearchConnection(self, conn, failed=False):
+        """ hand back a connection returned by `getSearchConnection`, ejecting
+            its replica if the connection failed;  returns `True` for
+            connections to replicas, i.e. if the search can be retried """
+        if conn is getLocal('connection'):
+            self.releaseConnection()
+            return False
+        config = getUtility(ISolrConnectionConfig)
+        replicas = self.getReplicas()
+        if failed:
+            getNodes(replicas, config.base).eject(conn.host)
+            conn.close()
+        size = getattr(config, 'pool_size', 0)
+        if size:
+            getPool(conn.host, conn.solrBase, size).checkin(conn)
+        else:
+            conn.close()
+        self.releaseConnection()
+        return conn.host in replicas
+
+    def releaseConnection(self):
+        """ hand back the current (pooled) connection unless it's holding
+            requests still to be sent or its timeout is locked;  otherwise
+            threads only searching would keep it checked out forever """
+        conn = getLocal('connection')
+        if conn is not None and getLocal('pool') is not None and \
+                not conn.xmlbody and not self.lock:
+            self.closeConnection()
+
+    def getPoolStatistics(self):
+        """ returns usage statistics of the connection pool """
+        config = getUtility(ISolrConnectionConfig)
+        if config.host is None or not getattr(config, 'pool_size', 0):
+            return {}
+        host = '%s:%d' % (config.host, config.port)
+        return getPool(host, config.base, config.pool_size).statistics()
+
+    def getCacheStatistics(self):
+        """ returns usage statistics of the search result cache """
+        config = getUtility(ISolrConnectionConfig)
+        if config.host is None:
+            return {}
+        host = '%s:%d' % (config.host, config.port)
+        cache = getResultCache(host, config.base,
+            getattr(config, 'search_cache_size', 0),
+            getattr(config, 'search_cache_ttl', 0))
+        if cache is None:
+            return {}
+        return cache.statistics()
+
     def getSchema(self):
-        """ returns the currently used schema or fetches it """
-        schema = getLocal('schema')
-        if schema is None:
-            conn = self.getConnection()
-            if conn is not None:
-                logger.debug('getting schema from solr')
-                try:
-                    schema = conn.getSchema()
-                    setLocal('schema', schema)
-                except (error, CannotSendRequest, ResponseNotReady):
-                    logger.exception('exception while getting schema')
+        """ returns the currently used schema or fetches it;  the schema
+            is cached process-wide and revalidated from time to time """
+        schema = None
+        conn = self.getConnection()
+        if conn is not None:
+            cache = getSchemaCache(conn.host, conn.solrBase)
+            try:
+                schema = cache.get(conn)
+            except SolrUnavailableException:
+                logger.debug('solr is unavailable, not getting schema')
+            except (error, CannotSendRequest, ResponseNotReady):
+                logger.exception('exception while getting schema')
+            if schema is not None:
+                conn.uniqueKey = schema.get('uniqueKey', None)
         return schema
 
     def setTimeout(self, timeout, lock=marker):
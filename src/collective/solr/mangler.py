@@ -3,6 +3,7 @@ from AccessControl import getSecurityManager
 from DateTime import DateTime
 
 from collective.solr.interfaces import ISolrConnectionConfig
+from collective.solr.parser import SolrSchema, epiIndexes
 from collective.solr.queryparser import quote
 from collective.solr.utils import isSimpleTerm
 from collective.solr.utils import isSimpleSearch
@@ -37,6 +38,18 @@ def iso8601date(value):
     return value
 
 
+def effectiveSteps(config):
+    """ return the steps (in seconds) the effective date used to filter
+        out inactive content is rounded down to;  with the search result
+        cache enabled it's rounded to (at least) the cache's lifetime, as
+        otherwise anonymous queries would differ all the time;  the cached
+        responses are that old anyway, so the results are the same """
+    steps = getattr(config, 'effective_steps', 1) or 1
+    if getattr(config, 'search_cache_size', 0):
+        steps = max(steps, getattr(config, 'search_cache_ttl', 0) or 1)
+    return steps
+
+
 def mangleQuery(keywords, config, schema):
     """ translate / mangle query parameters to replace zope specifics
         with equivalent constructs for solr """
@@ -62,14 +75,10 @@ def mangleQuery(keywords, config, schema):
             del keywords[key]
 
     # find EPI indexes
-    if schema:
-        epi_indexes = {}
-        for name in schema.keys():
-            parts = name.split('_')
-            if parts[-1] in ['string', 'depth', 'parents']:
-                count = epi_indexes.get(parts[0], 0)
-                epi_indexes[parts[0]] = count + 1
-        epi_indexes = [k for k, v in epi_indexes.items() if v == 3]
+    if isinstance(schema, SolrSchema):
+        epi_indexes = schema.epiIndexes
+    elif schema:
+        epi_indexes = epiIndexes(schema.keys())
     else:
         epi_indexes = ['path']
 
@@ -110,7 +119,7 @@ def mangleQuery(keywords, config, schema):
                 del args['depth']
         elif key == 'effectiveRange':
             if isinstance(value, DateTime):
-                steps = getattr(config, 'effective_steps', 1)
+                steps = effectiveSteps(config)
                 if steps > 1:
                     value = DateTime(value.timeTime() // steps * steps)
                 value = iso8601date(value)
@@ -164,9 +173,12 @@ def extractQueryParameters(args):
     if limit:
         params['rows'] = int(limit)
     for key, value in args.items():
-        if key in ('fq', 'fl', 'facet'):
+        if key in ('fq', 'fl', 'fl_profile', 'facet'):
             params[key] = value
             del args[key]
+        elif key == 'metadata_columns':     # alias for the field list
+            params.setdefault('fl', value)
+            del args[key]
         elif key.startswith('facet.') or key.startswith('facet_'):
             name = lambda facet: facet.split(':', 1)[0]
             if isinstance(value, list):
@@ -183,6 +195,8 @@ def extractQueryParameters(args):
         elif key == 'b_size':
             params['rows'] = int(value)
             del args[key]
+    if args.pop('count_only', False):   # only the number of results is
+        params['rows'] = 0              # needed, e.g. for `len(...)`
     return params
 
 
@@ -204,6 +218,40 @@ def cleanupQueryParameters(args, schema):
     return args
 
 
+def fieldListProfiles(config):
+    """ return the configured field lists by profile name """
+    profiles = {}
+    for line in getattr(config, 'field_lists', None) or ():
+        if ':' in line:
+            name, fields = line.split(':', 1)
+            profiles[name.strip()] = fields.replace(',', ' ').split()
+    return profiles
+
+
+def fieldListParameter(params, config, schema):
+    """ set up the list of fields to be returned with the results, i.e. the
+        `fl` parameter, from the given field list or profile;  the set of
+        requested fields is returned or `None` for all stored fields """
+    fields = params.pop('fl', None)
+    profile = params.pop('fl_profile', None)
+    if not fields and profile:
+        fields = fieldListProfiles(config).get(profile, None)
+    if isinstance(fields, basestring):
+        fields = fields.replace(',', ' ').split()
+    fields = set(fields or ())
+    if not fields or '*' in fields:
+        fields.update(('*', 'score'))
+        params['fl'] = ' '.join(sorted(fields))
+        return None
+    # the unique key, path and score are needed for the flares to work
+    fields.add('score')
+    for name in getattr(schema, 'uniqueKey', None), 'path_string':
+        if name and name in schema:
+            fields.add(name)
+    params['fl'] = ' '.join(sorted(fields))
+    return fields
+
+
 def optimizeQueryParameters(query, params):
     """ optimize query parameters by using filter queries for
         configured indexes """
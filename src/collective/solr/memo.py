@@ -0,0 +1,112 @@
+from logging import getLogger
+from threading import Lock
+from zope.annotation.interfaces import IAnnotations
+from zope.component import getSiteManager
+
+logger = getLogger('collective.solr.memo')
+
+
+class SearchMemo(object):
+    """ the responses of the searches made while handling a request, so
+        that repeated queries, e.g. by several portlets, are answered
+        without asking solr again;  the searches prefetched for the
+        request are kept here as well """
+
+    def __init__(self):
+        self.responses = {}
+        self.futures = {}           # prefetched searches, see `prefetch`
+        self.queries = 0
+        self.duplicates = 0
+        self.prefetched = 0
+        self.now = None             # the effective date of all searches
+
+    def effective(self, value):
+        """ return the date used to filter out inactive content for all
+            searches of the request, i.e. the first one given;  the
+            catalog adds the current time to every query, which would
+            otherwise make them all differ """
+        if self.now is None:
+            self.now = value
+        return self.now
+
+    def get(self, key):
+        """ return a copy of the response for the given key or `None` """
+        self.queries += 1
+        count('queries')
+        response = self.responses.get(key, None)
+        if response is None:
+            return None
+        self.duplicates += 1
+        count('duplicates')
+        logger.debug('reusing response for duplicate search %r', key)
+        return response.copy()
+
+    def prefetch(self, key):
+        """ return the prefetched search for the given key or `None` """
+        future = self.futures.pop(key, None)
+        if future is not None:
+            self.prefetched += 1
+            count('prefetched')
+        return future
+
+    def set(self, key, response):
+        """ remember the given response and return a copy of it, which can
+            be modified (i.e. wrapped and padded) by the caller """
+        self.responses[key] = response
+        return response.copy()
+
+    def clear(self):
+        """ forget all responses, e.g. after the index has been changed """
+        self.responses.clear()
+        self.futures.clear()
+
+    def statistics(self):
+        """ return the number of searches, the number of duplicates, i.e.
+            the number of requests to solr that were avoided, and the number
+            of searches answered by prefetched responses """
+        return dict(queries=self.queries, duplicates=self.duplicates,
+            prefetched=self.prefetched)
+
+
+def getSearchMemo(request=None, create=False):
+    """ return the search memo of the given (or current) request, if it
+        can hold one, optionally creating it """
+    if request is None:
+        request = getattr(getSiteManager(), 'REQUEST', None)
+    annotations = IAnnotations(request, None)
+    if annotations is None:
+        return None
+    memo = annotations.get('collective.solr.memo', None)
+    if memo is None and create:
+        memo = annotations['collective.solr.memo'] = SearchMemo()
+    return memo
+
+
+def forgetSearches(request=None):
+    """ clear the search memo of the given (or current) request """
+    memo = getSearchMemo(request)
+    if memo is not None:
+        memo.clear()
+
+
+# totals of all requests handled by this process
+totals = dict(queries=0, duplicates=0, prefetched=0)
+totalsLock = Lock()
+
+
+def count(name):
+    totalsLock.acquire()
+    try:
+        totals[name] += 1
+    finally:
+        totalsLock.release()
+
+
+def statistics():
+    """ return the number of searches and the number of duplicates, for
+        which the memo avoided asking solr, since the process was started """
+    totalsLock.acquire()
+    try:
+        return dict(totals)
+    finally:
+        totalsLock.release()
@@ -17,15 +17,22 @@ except ImportError:
     HAS_EXPCAT = False
 
 
-def searchResults(self, REQUEST=None, **kw):
-    """ based on the version in `CMFPlone/CatalogTool.py` """
+def catalogArguments(catalog, kw):
+    """ add the arguments restricting the results to those the current
+        user may see like `searchResults` does """
     kw = kw.copy()
     only_active = not kw.get('show_inactive', False)
-    user = _getAuthenticatedUser(self)
-    kw['allowedRolesAndUsers'] = self._listAllowedRolesAndUsers(user)
-    if only_active and not _checkPermission(AccessInactivePortalContent, self):
+    user = _getAuthenticatedUser(catalog)
+    kw['allowedRolesAndUsers'] = catalog._listAllowedRolesAndUsers(user)
+    if only_active and \
+            not _checkPermission(AccessInactivePortalContent, catalog):
         kw['effectiveRange'] = DateTime()
+    return kw
+
 
+def searchResults(self, REQUEST=None, **kw):
+    """ based on the version in `CMFPlone/CatalogTool.py` """
+    kw = catalogArguments(self, kw)
     adapter = queryAdapter(self, ISearchDispatcher)
     if adapter is not None:
         return adapter(REQUEST, **kw)
@@ -43,13 +50,13 @@ def patchCatalogTool():
 if HAS_EXPCAT:
     def lazyExpCatAdd(self, other):
         if isinstance(other, SolrResponse):
-            other = lazy.LazyCat([list(other)])
+            other = lazy.LazyCat([other.results()])
         return lazy.Lazy._solr_original__add__(self, other)
 
 
 def lazyAdd(self, other):
     if isinstance(other, SolrResponse):
-        other = LazyCat([list(other)])
+        other = LazyCat([other.results()])
     return Lazy._solr_original__add__(self, other)
 
 
@@ -1,3 +1,4 @@
+from bisect import bisect_right, insort
 from datetime import datetime
 from StringIO import StringIO
 
@@ -7,6 +8,11 @@ from zope.interface import implements
 from collective.solr.interfaces import ISolrFlare
 from collective.solr.iterparse import iterparse
 
+try:
+    from simplejson import load, loads
+except ImportError:
+    from json import load, loads
+
 
 class AttrDict(dict):
     """ a dictionary with attribute access """
@@ -21,8 +27,259 @@ class AttrDict(dict):
             raise AttributeError(name)
 
 
-class SolrFlare(AttrDict):
-    """ a sol(a)r brain, i.e. a data container for search results """
+class DeferredValue(object):
+    """ a raw value, which is only converted when it's first accessed """
+
+    __slots__ = ('value', 'convert')
+
+    def __init__(self, value, convert):
+        self.value = value
+        self.convert = convert
+
+    def __reduce__(self):
+        return DeferredValue, (self.value, self.convert)
+
+    def __repr__(self):
+        return '<DeferredValue %r>' % self.value
+
+
+def resolve(value):
+    """ convert deferred values, also when contained in a list """
+    if isinstance(value, DeferredValue):
+        return value.convert(value.value)
+    elif isinstance(value, list) and value and \
+            isinstance(value[0], DeferredValue):
+        return [resolve(item) for item in value]
+    return value
+
+
+class FlareFields(object):
+    """ the names of the fields of a set of flares, mapping them to the
+        positions of their values;  it's shared by all flares of a response,
+        so that each flare only needs to keep the list of its values;  it
+        is only extended while parsing, flares adding other fields later on
+        get a copy of their own """
+
+    __slots__ = ('names', 'positions', 'defaults')
+
+    def __init__(self):
+        self.names = []
+        self.positions = {}
+        self.defaults = {}      # values of fields missing from a flare
+
+    def position(self, name):
+        """ return the position of the given field, adding it if needed """
+        pos = self.positions.get(name)
+        if pos is None:
+            pos = self.positions[name] = len(self.names)
+            self.names.append(name)
+        return pos
+
+    def copy(self):
+        """ return a copy, to which fields can be added independently """
+        fields = FlareFields()
+        fields.names.extend(self.names)
+        fields.positions.update(self.positions)
+        fields.defaults = self.defaults
+        return fields
+
+
+absent = object()       # marks fields not set for a particular flare
+
+
+class FlareDict(object):
+    """ a compact mapping with attribute access holding the values of
+        fields stored in a (shared) `FlareFields` index;  deferred values
+        get converted when accessed and the converted value is kept, and
+        fields without a value fall back to the index' `defaults`;  apart
+        from not being a `dict` it provides the same api """
+
+    __slots__ = ('_fields', '_values')
+    __hash__ = None
+
+    def __init__(self, data=None, fields=None, **kw):
+        if fields is None:
+            fields = FlareFields()
+        self._fields = fields
+        self._values = []
+        if data is not None:
+            self.update(data)
+        if kw:
+            self.update(kw)
+
+    def __getitem__(self, name):
+        pos = self._fields.positions.get(name)
+        values = self._values
+        if pos is None or pos >= len(values) or values[pos] is absent:
+            defaults = self._fields.defaults
+            if name in defaults:
+                return defaults[name]
+            raise KeyError(name)
+        value = values[pos]
+        if isinstance(value, (DeferredValue, list)):
+            converted = resolve(value)
+            if converted is not value:
+                values[pos] = converted
+            return converted
+        return value
+
+    def __setitem__(self, name, value):
+        fields = self._fields
+        if name not in fields.positions:    # copy the shared index on write
+            self._fields = fields.copy()
+        self._add(name, value)
+
+    def _add(self, name, value):
+        """ set the given value, adding the field to the (shared) index if
+            necessary, which is only safe while parsing the response """
+        pos = self._fields.position(name)
+        values = self._values
+        if pos >= len(values):
+            values.extend([absent] * (pos + 1 - len(values)))
+        values[pos] = value
+
+    def __delitem__(self, name):
+        pos = self._position(name)
+        if pos is None:
+            raise KeyError(name)
+        self._values[pos] = absent
+
+    def __getattr__(self, name):
+        """ look up attributes in the mapping """
+        if name in FlareDict.__slots__:     # not initialized yet
+            raise AttributeError(name)
+        marker = []
+        value = self.get(name, marker)
+        if value is not marker:
+            return value
+        else:
+            raise AttributeError(name)
+
+    def _position(self, name):
+        """ return the position of the field's value or `None` if unset """
+        pos = self._fields.positions.get(name)
+        if pos is not None and pos < len(self._values) and \
+                self._values[pos] is not absent:
+            return pos
+        return None
+
+    def __contains__(self, name):
+        return self._position(name) is not None or \
+            name in self._fields.defaults
+
+    has_key = __contains__
+
+    def get(self, name, default=None):
+        if name in self:
+            return self[name]
+        return default
+
+    def setdefault(self, name, default=None):
+        if name not in self:
+            self[name] = default
+        return self[name]
+
+    def pop(self, name, *default):
+        if name not in self and default:
+            return default[0]
+        value = self[name]
+        if self._position(name) is not None:
+            del self[name]
+        return value
+
+    def popitem(self):
+        for name in self.iterkeys():
+            if self._position(name) is not None:
+                return name, self.pop(name)
+        raise KeyError('popitem(): dictionary is empty')
+
+    def clear(self):
+        self._values = []
+
+    @classmethod
+    def fromkeys(cls, names, value=None):
+        return cls(dict.fromkeys(names, value))
+
+    def iterkeys(self):
+        for name, value in zip(self._fields.names, self._values):
+            if value is not absent:
+                yield name
+        for name in self._fields.defaults:
+            if self._position(name) is None:
+                yield name
+
+    __iter__ = iterkeys
+
+    def keys(self):
+        return list(self.iterkeys())
+
+    def iteritems(self):
+        for name in self.keys():
+            yield name, self[name]
+
+    def items(self):
+        return list(self.iteritems())
+
+    def itervalues(self):
+        for name in self.keys():
+            yield self[name]
+
+    def values(self):
+        return list(self.itervalues())
+
+    def update(self, data=(), **kw):
+        if hasattr(data, 'keys'):
+            data = [(name, data[name]) for name in data.keys()]
+        for name, value in data:
+            self[name] = value
+        for name, value in kw.items():
+            self[name] = value
+
+    def viewkeys(self):
+        return self.keys()
+
+    def viewitems(self):
+        return self.items()
+
+    def viewvalues(self):
+        return self.values()
+
+    def copy(self, fields=None):
+        """ return a copy sharing the field index or using the given one,
+            which needs to be a copy of it """
+        if fields is None:
+            fields = self._fields
+        flare = SolrFlare(fields=fields)
+        flare._values[:] = self._values
+        return flare
+
+    def __len__(self):
+        if self._fields.defaults:
+            return len(self.keys())
+        return len(self._values) - self._values.count(absent)
+
+    def __eq__(self, other):
+        if not isinstance(other, (dict, FlareDict)):
+            return NotImplemented
+        return dict(self.items()) == dict(other.items())
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        if equal is NotImplemented:
+            return equal
+        return not equal
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def __reduce__(self):
+        state = getattr(self, '__dict__', None) or None
+        return self.__class__, (dict(self.items()),), state
+
+
+class SolrFlare(FlareDict):
+    """ a sol(a)r brain, i.e. a data container for search results;  unlike
+        `FlareDict` it allows setting attributes, e.g. via `alsoProvides` """
     implements(ISolrFlare)
 
     __allow_access_to_unprotected_subobjects__ = True
@@ -31,6 +288,195 @@ class SolrFlare(AttrDict):
 class SolrResults(list):
     """ a list of results returned from solr, i.e. sol(a)r flares """
 
+    def copy(self, response):
+        """ return a copy holding copies of the flares, which use the field
+            index of the given response, see `SolrResponse.copy` """
+        fields = response.flareFields
+        results = SolrResults([isinstance(flare, FlareDict) and
+            flare.copy(fields) or flare for flare in self])
+        results.__dict__.update(self.__dict__)
+        return results
+
+
+class Packed(tuple):
+    """ the fields of a `<doc>` element as nested `(tag, name, value)`
+        tuples, where the value is the element's text or, for `<arr>` and
+        `<lst>` elements, again a tuple of its children """
+
+    __slots__ = ()
+
+
+def pack(elem):
+    """ return the compact form of the children of the given element """
+    return tuple([(child.tag, child.get('name'), child.tag in nested and
+        pack(child) or child.text) for child in elem])
+
+
+def decoding(name):
+    """ return the given `list` method, but decoding all results first """
+    method = getattr(list, name)
+    def wrapper(self, *args, **kw):
+        self.decodeAll()
+        return method(self, *args, **kw)
+    wrapper.__name__ = name
+    return wrapper
+
+
+class LazySolrResults(SolrResults):
+    """ a list of results holding the `<doc>` elements in compact form,
+        see `Packed`, which only get converted into flares (and then
+        passed through the optional `wrapper` function) when accessed """
+
+    wrapper = None
+
+    def __init__(self, decode):
+        super(LazySolrResults, self).__init__()
+        self.decode = decode
+
+    def add(self, elem):
+        """ add a `<doc>` element, which is kept in compact form """
+        list.append(self, Packed(pack(elem)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[idx] for idx in range(*index.indices(len(self)))]
+        item = list.__getitem__(self, index)
+        if isinstance(item, Packed):
+            item = self.decode(item)
+            if self.wrapper is not None:
+                item = self.wrapper(item)
+            list.__setitem__(self, index, item)
+        return item
+
+    def __getslice__(self, start, stop):
+        return self[max(0, start):max(0, stop):]
+
+    def __iter__(self):
+        for idx in xrange(len(self)):
+            yield self[idx]
+
+    def pending(self):
+        """ return the number of results that haven't been decoded yet """
+        return len([item for item in list.__iter__(self)
+            if isinstance(item, Packed)])
+
+    def decodeAll(self):
+        """ decode all results, e.g. before searching or sorting them """
+        if self.pending():
+            for idx in xrange(len(self)):
+                self[idx]
+
+    # other methods accessing the results need them decoded
+    for name in ('__contains__', '__reversed__', '__add__', '__mul__',
+            '__rmul__', '__eq__', '__ne__', '__lt__', '__le__', '__gt__',
+            '__ge__', '__repr__', 'count', 'index', 'pop', 'remove', 'sort',
+            'reverse'):
+        locals()[name] = decoding(name)
+    del name
+
+    def copy(self, response):
+        """ return a copy decoding the results using the given response;
+            results already decoded are copied like with `SolrResults` """
+        results = LazySolrResults(response.decode)
+        fields = response.flareFields
+        for item in list.__iter__(self):
+            if isinstance(item, FlareDict):
+                item = item.copy(fields)
+            list.append(results, item)
+        for name, value in self.__dict__.items():
+            if name not in ('decode', 'wrapper'):
+                setattr(results, name, value)
+        return results
+
+
+class VirtualResults(object):
+    """ a sequence of all `numFound` results of a query, of which only
+        the window starting at `start` has actually been fetched;  other
+        items are `None` unless a `fetch` function is given, in which case
+        they get fetched when accessed by index in windows of `size` (but
+        at least `window`) results, i.e. `fetch(start, rows)` is called and
+        should return a list of flares;  to keep templates from sending
+        lots of queries at most `fetches` windows are fetched, and
+        iterating doesn't fetch anything;  the optional `wrapper` function
+        is applied to each result once, when it's first accessed """
+
+    window = 50             # the minimum number of results to fetch
+    fetches = 10            # the maximum number of windows to fetch
+
+    def __init__(self, results, start=0, fetch=None, size=None, wrapper=None):
+        self.results = results
+        self.length = max(int(getattr(results, 'numFound', 0)), start +
+            len(results))
+        self.first = start
+        self.fetch = fetch
+        self.size = size or len(results) or 10
+        self.wrapper = wrapper
+        self.wrapped = set()        # the indexes of the wrapped results
+        self.windows = {start: results}
+        self.starts = [start]
+        self.fetched = 0
+
+    def __getattr__(self, name):
+        """ provide `numFound`, `maxScore` etc of the initial window """
+        if name == 'results':
+            raise AttributeError(name)
+        return getattr(self.results, name)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[idx] for idx in xrange(*index.indices(self.length))]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError(index)
+        return self.get(index)
+
+    def get(self, index, fetch=True):
+        """ return the result at the given (positive) index, fetching it if
+            necessary and allowed """
+        start = self.starts[bisect_right(self.starts, index) - 1]
+        window = self.windows[start]
+        if not start <= index < start + len(window):
+            if not fetch:
+                return None
+            start, window = self.load(index)
+            if window is None or index >= start + len(window):
+                return None
+        item = window[index - start]
+        if self.wrapper is not None and index not in self.wrapped:
+            self.wrapped.add(index)
+            item = window[index - start] = self.wrapper(item)
+        return item
+
+    def load(self, index):
+        """ fetch the window of results containing the given index;  the
+            windows are aligned to the initial one like batches would be """
+        if self.fetch is None or self.fetched >= self.fetches:
+            return None, None
+        start = self.first + (index - self.first) // self.size * self.size
+        end = min(start + max(self.size, self.window), self.length)
+        following = bisect_right(self.starts, start)
+        if following < len(self.starts):    # don't fetch results twice
+            end = min(end, self.starts[following])
+        start = max(start, 0)
+        if self.windows.get(start):     # fetched, but shorter than expected
+            return None, None
+        self.fetched += 1
+        window = self.fetch(start, end - start)
+        if start not in self.windows:   # an empty one, e.g. for `rows=0`,
+            insort(self.starts, start)  # is replaced
+        self.windows[start] = window
+        return start, window
+
+    def __iter__(self):
+        """ iterate over the results, but without fetching missing ones,
+            which are `None` instead """
+        for idx in xrange(self.length):
+            yield self.get(idx, fetch=False)
+
 
 def parseDate(value):
     """ use `DateTime` to parse a date, but take care of solr 1.4
@@ -78,6 +524,8 @@ def setter(item, name, value):
     """ sets the named value on item respecting its type """
     if isinstance(item, list):
         item.append(value)      # name is ignored for lists
+    elif isinstance(item, FlareDict):
+        item._add(name, value)
     elif isinstance(item, dict):
         item[name] = value
     else:                       # object is assumed...
@@ -89,26 +537,96 @@ class SolrResponse(object):
 
     __allow_access_to_unprotected_subobjects__ = True
 
-    def __init__(self, data=None, unmarshallers=unmarshallers):
+    # types only converted when accessed if contained in result documents
+    deferred = ('date',)
+
+    def __init__(self, data=None, unmarshallers=unmarshallers, lazy=False):
         self.unmarshallers = unmarshallers
+        self.lazy = lazy
+        self.flareFields = FlareFields()    # shared by all result documents
         if data is not None:
             self.parse(data)
 
     def parse(self, data):
-        """ parse a solr response contained in a string or file-like object """
+        """ parse a solr response contained in a string or file-like object;
+            in lazy mode the documents are only decoded when accessed """
         if isinstance(data, basestring):
             data = StringIO(data)
         stack = [self]      # the response object is the outmost container
         elements = iterparse(data, events=('start', 'end'))
+        lazy = self.lazy
+        inside = None       # the document currently skipped in lazy mode
+        result = None       # the `<result>` element in lazy mode
+        docs = 0            # the nesting level of (eagerly parsed) documents
+        deferred = self.deferred
         for action, elem in elements:
+            if inside is not None:
+                if action == 'end' and elem is inside:
+                    stack[-1].add(elem)
+                    del result[:]       # only the compact form is kept
+                    inside = None
+                continue
+            tag = elem.tag
+            if action == 'start':
+                if lazy and tag == 'doc':
+                    inside = elem
+                elif tag in nested:
+                    if tag == 'doc':
+                        docs += 1
+                    if lazy and tag == 'result':
+                        result = elem
+                        data = LazySolrResults(self.decode)
+                    else:
+                        data = self.create(tag)
+                    for key, value in elem.attrib.items():
+                        if not key == 'name':   # set extra attributes
+                            setattr(data, key, value)
+                    stack.append(data)
+            elif action == 'end':
+                if tag in nested:
+                    if tag == 'doc':
+                        docs -= 1
+                    data = stack.pop()
+                    setter(stack[-1], elem.get('name'), data)
+                elif tag in self.unmarshallers:
+                    if docs and tag in deferred:
+                        data = DeferredValue(elem.text,
+                            self.unmarshallers[tag])
+                    else:
+                        data = self.unmarshallers[tag](elem.text)
+                    setter(stack[-1], elem.get('name'), data)
+        return self
+
+    def stream(self, data):
+        """ parse a solr response like `parse`, but yield the result
+            documents one at a time instead of collecting them in a list;
+            processed elements are discarded right away, so that memory use
+            doesn't depend on the number of results """
+        if isinstance(data, basestring):
+            data = StringIO(data)
+        stack = [self]      # the response object is the outmost container
+        result = None       # the `<result>` element while inside of it
+        for action, elem in iterparse(data, events=('start', 'end')):
             tag = elem.tag
+            if result is not None:
+                if action == 'end':
+                    if elem is result:
+                        result = None
+                        data = stack.pop()
+                        setter(stack[-1], elem.get('name'), data)
+                    elif tag == 'doc':
+                        yield self.unmarshall(elem)
+                        del result[:]       # drop the processed document
+                continue
             if action == 'start':
                 if tag in nested:
-                    data = nested[tag]()
+                    data = self.create(tag)
                     for key, value in elem.attrib.items():
                         if not key == 'name':   # set extra attributes
                             setattr(data, key, value)
                     stack.append(data)
+                    if tag == 'result':
+                        result = elem
             elif action == 'end':
                 if tag in nested:
                     data = stack.pop()
@@ -116,12 +634,57 @@ class SolrResponse(object):
                 elif tag in self.unmarshallers:
                     data = self.unmarshallers[tag](elem.text)
                     setter(stack[-1], elem.get('name'), data)
-        return self
+
+    def create(self, tag):
+        """ return a new container for the given nesting tag """
+        if tag == 'doc':
+            return SolrFlare(fields=self.flareFields)
+        return nested[tag]()
+
+    def unmarshall(self, elem):
+        """ convert the given (parsed) element of a document into its value,
+            deferring the conversion of the types listed in `deferred` """
+        tag = elem.tag
+        if tag in nested:
+            data = self.create(tag)
+            for child in elem:
+                if child.tag in nested or child.tag in self.unmarshallers:
+                    setter(data, child.get('name'), self.unmarshall(child))
+            return data
+        elif tag in self.deferred:
+            return DeferredValue(elem.text, self.unmarshallers[tag])
+        return self.unmarshallers[tag](elem.text)
+
+    def decode(self, packed, tag='doc'):
+        """ convert a `<doc>` element retained in compact form in lazy mode
+            into a flare, see `pack` """
+        data = self.create(tag)
+        for tag, name, value in packed:
+            if tag in nested:
+                setter(data, name, self.decode(value, tag))
+            elif tag in self.deferred:
+                setter(data, name, DeferredValue(value,
+                    self.unmarshallers[tag]))
+            elif tag in self.unmarshallers:
+                setter(data, name, self.unmarshallers[tag](value))
+        return data
 
     def results(self):
         """ return only the list of results, i.e. a `SolrResults` instance """
         return getattr(self, 'response', [])
 
+    def copy(self):
+        """ return a copy, whose results can be modified (e.g. wrapped) and
+            decoded independently;  other data like the facet counts is
+            shared and should therefore not be modified """
+        response = self.__class__.__new__(self.__class__)
+        response.__dict__.update(self.__dict__)
+        response.flareFields = self.flareFields.copy()
+        results = self.results()
+        if isinstance(results, SolrResults):
+            response.response = results.copy(response)
+        return response
+
     def __len__(self):
         return len(self.results())
 
@@ -129,6 +692,79 @@ class SolrResponse(object):
         return self.results()[index]
 
 
+def unmarshallJSON(value, unmarshallers=unmarshallers, defer=False,
+        date=False):
+    """ convert a decoded json value the same way the xml unmarshallers
+        would, i.e. return plain strings for ascii data and parse dates,
+        which json can't tell apart from strings, if `date` is set;  with
+        `defer` set parsing dates is postponed until they're accessed """
+    if isinstance(value, unicode):
+        if date:
+            value = str(value)      # `DateTime` parses strings much faster
+            if defer:
+                return DeferredValue(value, unmarshallers['date'])
+            return unmarshallers['date'](value)
+        try:
+            return value.encode('ascii')
+        except UnicodeEncodeError:
+            return value
+    elif isinstance(value, list):
+        return [unmarshallJSON(item, unmarshallers, defer, date)
+            for item in value]
+    elif isinstance(value, dict):
+        return dict([(unmarshallJSON(key, unmarshallers),
+            unmarshallJSON(item, unmarshallers))
+            for key, item in value.iteritems()])
+    return value
+
+
+class SolrJSONResponse(SolrResponse):
+    """ a solr search response in json format (`wt=json`), which needs to
+        be requested with `json.nl=map` for named lists to become dicts;
+        json has no type for dates, so the schema is needed to tell which
+        fields hold dates -- without one they're returned as strings """
+
+    def __init__(self, data=None, unmarshallers=unmarshallers, lazy=False,
+            schema=None):
+        self.schema = schema
+        super(SolrJSONResponse, self).__init__(data, unmarshallers, lazy)
+
+    def parse(self, data):
+        """ parse a solr response contained in a string or file-like object """
+        if isinstance(data, basestring):
+            data = loads(data)
+        else:
+            data = load(data)
+        unmarshallers = self.unmarshallers
+        defer = 'date' in self.deferred
+        schema = self.schema
+        names = {}      # the names and date flags of the fields seen so far
+        for name, value in data.iteritems():
+            if name == 'response':
+                results = SolrResults()
+                for key, item in value.iteritems():
+                    if key == 'docs':
+                        for doc in item:
+                            flare = SolrFlare(fields=self.flareFields)
+                            add = flare._add
+                            for field, item in doc.iteritems():
+                                info = names.get(field)
+                                if info is None:
+                                    info = names[field] = str(field), \
+                                        schema is not None and \
+                                        schema.isDate(field)
+                                add(info[0], unmarshallJSON(item,
+                                    unmarshallers, defer, info[1]))
+                            results.append(flare)
+                    else:               # keep attributes as with xml
+                        setattr(results, str(key), str(item))
+                value = results
+            else:
+                value = unmarshallJSON(value, unmarshallers)
+            setattr(self, str(name), value)
+        return self
+
+
 class SolrField(AttrDict):
     """ a schema field representation """
 
@@ -148,14 +784,19 @@ class AttrStr(str):
         self.__dict__.update(kw)
 
 
+# the classes of fields holding dates
+dateClasses = frozenset(['solr.DateField', 'solr.TrieDateField'])
+
+
 class SolrSchema(AttrDict):
     """ a solr schema parser:  the xml schema is partially parsed and the
         information collected is later on used both for indexing items as
         well as buiding search queries;  for the time being we are mostly
         interested in explicitly defined fields and their data types, so
-        all <analyzer> (tokenizers, filters) and <dynamicField> information
-        is ignored;  some of the other fields relevant to the implementation,
-        like <uniqueKey>, <solrQueryParser> or <defaultSearchField>, are also
+        all <analyzer> (tokenizers, filters) information is ignored, while
+        <dynamicField> information is only used to look up field types;
+        some of the other fields relevant to the implementation, like
+        <uniqueKey>, <solrQueryParser> or <defaultSearchField>, are also
         parsed and provided, all others are ignored """
 
     def __init__(self, data=None):
@@ -168,11 +809,17 @@ class SolrSchema(AttrDict):
         if isinstance(data, basestring):
             data = StringIO(data)
         self['requiredFields'] = required = []
+        self.__dict__['dynamicFields'] = dynamic = []
         types = {}
         for action, elem in iterparse(data):
             name = elem.get('name')
             if elem.tag == 'fieldType':
                 types[name] = elem.attrib
+            elif elem.tag == 'dynamicField':
+                field = SolrField(types[elem.get('type')])
+                field.update(elem.attrib)
+                field['class_'] = field['class']
+                dynamic.append(field)
             elif elem.tag == 'field':
                 field = SolrField(types[elem.get('type')])
                 field.update(elem.attrib)
@@ -187,17 +834,120 @@ class SolrSchema(AttrDict):
                 self[elem.tag] = elem.text
             elif elem.tag == 'solrQueryParser':
                 self[elem.tag] = AttrStr(elem.text, **elem.attrib)
+        self.tables()
+
+    def __setitem__(self, name, value):
+        super(SolrSchema, self).__setitem__(name, value)
+        self.__dict__.pop('_tables', None)      # rebuild lookup tables
+
+    def __delitem__(self, name):
+        super(SolrSchema, self).__delitem__(name)
+        self.__dict__.pop('_tables', None)
+
+    def update(self, *args, **kw):
+        super(SolrSchema, self).update(*args, **kw)
+        self.__dict__.pop('_tables', None)
+
+    def tables(self):
+        """ return the lookup tables derived from the fields, which are
+            built once after parsing (or modifying) the schema """
+        tables = self.__dict__.get('_tables')
+        if tables is None:
+            fields = tuple([field for field in self.values()
+                if isinstance(field, SolrField)])
+            def names(flag):
+                return frozenset([field.name for field in fields
+                    if field.get(flag, False)])
+            tables = self.__dict__['_tables'] = dict(
+                fields=fields,
+                names=frozenset([field.name for field in fields]),
+                stored=names('stored'),
+                indexed=names('indexed'),
+                multiValued=names('multiValued'),
+                required=frozenset(self.get('requiredFields', ())),
+                dates=frozenset([field.name for field in fields
+                    if field.get('class_') in dateClasses]),
+                epi=epiIndexes(self.keys()),
+                converters={})
+        return tables
 
     @property
     def fields(self):
         """ return list of all fields the schema consists of """
-        for name, field in self.items():
-            if isinstance(field, SolrField):
-                yield field
+        return self.tables()['fields']
+
+    @property
+    def fieldNames(self):
+        """ return the set of names of all fields """
+        return self.tables()['names']
 
     @property
     def stored(self):
         """ return names of all stored fields, a.k.a. metadata """
-        for field in self.fields:
-            if field.stored:
-                yield field.name
+        return self.tables()['stored']
+
+    @property
+    def indexed(self):
+        """ return names of all indexed fields """
+        return self.tables()['indexed']
+
+    @property
+    def multiValued(self):
+        """ return names of all multi-valued fields """
+        return self.tables()['multiValued']
+
+    @property
+    def required(self):
+        """ return names of all required fields """
+        return self.tables()['required']
+
+    @property
+    def epiIndexes(self):
+        """ return names of all extended path indexes """
+        return self.tables()['epi']
+
+    def lookup(self, name):
+        """ return the field of the given name, which can also be defined
+            by a <dynamicField> pattern, or `None` """
+        field = self.get(name, None)
+        if isinstance(field, SolrField):
+            return field
+        for field in self.__dict__.get('dynamicFields', ()):
+            pattern = field.name
+            if pattern.startswith('*') and name.endswith(pattern[1:]) or \
+                    pattern.endswith('*') and name.startswith(pattern[:-1]):
+                return field
+        return None
+
+    def isDate(self, name):
+        """ check if the field of the given name holds dates """
+        if name in self.tables()['dates']:
+            return True
+        field = self.lookup(name)
+        return field is not None and field.get('class_') in dateClasses
+
+    def converters(self, handlers):
+        """ return a mapping of field names to the handler registered for
+            the field's class in the given mapping (or `None`) along with
+            the separator to be used for joining sequences (or `None` for
+            multi-valued fields); it is built once for every mapping, which
+            is kept along with the result, so its id can't be reused """
+        converters = self.tables()['converters']
+        entry = converters.get(id(handlers))
+        if entry is None or entry[0] is not handlers:
+            entry = converters[id(handlers)] = handlers, dict([(field.name, (
+                handlers.get(field.class_, None),
+                not field.multiValued and field.get('separator', ' ') or None))
+                for field in self.fields])
+        return entry[1]
+
+
+def epiIndexes(names):
+    """ return the names of extended path indexes, i.e. the ones for which
+        `*_string`, `*_depth` and `*_parents` fields exist """
+    counts = {}
+    for name in names:
+        parts = name.split('_')
+        if parts[-1] in ['string', 'depth', 'parents']:
+            counts[parts[0]] = counts.get(parts[0], 0) + 1
+    return tuple([name for name, count in counts.items() if count == 3])
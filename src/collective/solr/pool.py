@@ -0,0 +1,164 @@
+from logging import getLogger
+from select import select
+from socket import error
+from threading import Condition, RLock
+from time import time
+from weakref import WeakKeyDictionary
+
+from collective.solr.solr import SolrConnection
+
+logger = getLogger('collective.solr.pool')
+
+
+def isAlive(conn):
+    """ check if the (idle) socket of a pooled connection is still usable;
+        an idle keep-alive connection becoming readable means the server
+        has closed it (or sent unexpected data), so it must not be reused """
+    sock = getattr(conn.conn, 'sock', None)
+    if sock is None:
+        return True         # a new socket will be opened on the next request
+    fileno = getattr(sock, 'fileno', None)
+    if fileno is None:
+        return True
+    try:
+        readable, writable, failed = select([sock], [], [sock], 0)
+    except (error, ValueError):
+        return False
+    return not (readable or failed)
+
+
+class SolrConnectionPool(object):
+    """ a process-wide pool of persistent connections to one solr server;
+        connections are checked out for the duration of a transaction and
+        checked back in afterwards instead of being closed, so consecutive
+        transactions (and threads) can reuse already established sockets """
+
+    def __init__(self, host, base, size=10, idle=60, timeout=10):
+        self.host = host
+        self.base = base
+        self.size = size            # maximum number of connections
+        self.idle = idle            # seconds after which idle ones get closed
+        self.timeout = timeout      # seconds to wait for a free connection
+        self.connections = []       # idle connections with their timestamps
+        self.busy = WeakKeyDictionary()
+        self.condition = Condition(RLock())
+        self.stats = dict(hits=0, misses=0, waits=0, reconnects=0,
+            evictions=0, overflows=0)
+
+    def __len__(self):
+        return len(self.connections) + len(self.busy)
+
+    def create(self):
+        """ open a new connection to the solr server """
+        logger.debug('opening connection to %s', self.host)
+        return SolrConnection(host=self.host, solrBase=self.base,
+            persistent=True)
+
+    def evict(self, now=None):
+        """ close all connections which have been idle for too long """
+        if now is None:
+            now = time()
+        keep = []
+        for conn, last in self.connections:
+            if self.idle and now - last > self.idle:
+                logger.debug('evicting idle connection %r', conn)
+                conn.close()
+                self.stats['evictions'] += 1
+            else:
+                keep.append((conn, last))
+        self.connections[:] = keep
+
+    def checkout(self):
+        """ return an idle connection from the pool or open a new one """
+        self.condition.acquire()
+        try:
+            self.evict()
+            if not self.connections and len(self) >= self.size:
+                self.stats['waits'] += 1
+                logger.debug('waiting for a free connection to %s', self.host)
+                deadline = time() + self.timeout
+                while not self.connections and len(self) >= self.size:
+                    remaining = deadline - time()
+                    if remaining <= 0:
+                        break
+                    # connections held by threads that have ended are only
+                    # released via garbage collection, so don't wait forever
+                    self.condition.wait(min(remaining, 1.0))
+            if self.connections:
+                conn, last = self.connections.pop()
+                self.stats['hits'] += 1
+                if not isAlive(conn):
+                    logger.debug('reconnecting stale connection %r', conn)
+                    conn.close()        # re-opened on the next request
+                    self.stats['reconnects'] += 1
+            else:
+                if len(self) >= self.size:
+                    logger.warning('connection pool for %s exhausted, '
+                        'opening extra connection', self.host)
+                    self.stats['overflows'] += 1
+                self.stats['misses'] += 1
+                conn = self.create()
+            self.busy[conn] = conn.reconnects
+            return conn
+        finally:
+            self.condition.release()
+
+    def checkin(self, conn):
+        """ return a connection to the pool, closing it if the pool is full
+            already or the connection was still holding pending requests """
+        self.condition.acquire()
+        try:
+            reconnects = self.busy.pop(conn, conn.reconnects)
+            self.stats['reconnects'] += conn.reconnects - reconnects
+            if conn.xmlbody:
+                logger.warning('discarding %d pending request(s) on %r',
+                    len(conn.xmlbody), conn)
+                conn.abort()
+            if len(self) < self.size:
+                self.connections.append((conn, time()))
+            else:
+                conn.close()
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def clear(self):
+        """ close all idle connections """
+        self.condition.acquire()
+        try:
+            for conn, last in self.connections:
+                conn.close()
+            del self.connections[:]
+        finally:
+            self.condition.release()
+
+    def statistics(self):
+        """ return usage statistics of the pool """
+        self.condition.acquire()
+        try:
+            stats = dict(self.stats)
+            stats.update(size=self.size, idle=len(self.connections),
+                busy=len(self.busy))
+            return stats
+        finally:
+            self.condition.release()
+
+
+# the pools need to be shared by all threads (and zodb connections, which
+# each hold their own copy of the connection manager), so they're kept
+# on module level, keyed by solr server
+pools = {}
+poolsLock = RLock()
+
+
+def getPool(host, base, size=10):
+    """ return the connection pool for the given solr server """
+    poolsLock.acquire()
+    try:
+        pool = pools.get((host, base), None)
+        if pool is None:
+            pool = pools[host, base] = SolrConnectionPool(host, base, size)
+        pool.size = size
+        return pool
+    finally:
+        poolsLock.release()
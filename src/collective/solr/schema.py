@@ -0,0 +1,156 @@
+from logging import getLogger
+from cPickle import dump, load, HIGHEST_PROTOCOL
+from hashlib import md5
+from httplib import HTTPException
+from os import rename
+from os.path import exists, join
+from socket import error
+from threading import Lock
+from time import time
+
+from collective.solr.solr import SolrException
+from collective.solr.parser import SolrSchema
+from collective.solr.spool import clientHome
+
+logger = getLogger('collective.solr.schema')
+
+
+class SolrSchemaCache(object):
+    """ the parsed schema of a solr server shared by all threads;  after
+        `ttl` seconds it is revalidated using the `ETag`/`Last-Modified`
+        headers and the hash of its contents, and a snapshot is kept on
+        disk, so that it's available right away after restarts """
+
+    def __init__(self, path=None, ttl=300):
+        self.path = path            # the snapshot file, if any
+        self.ttl = ttl              # seconds until the schema is revalidated
+        self.lock = Lock()
+        self.generation = 0         # incremented whenever it's cleared
+        self.clear()
+
+    def clear(self):
+        """ forget the current schema, so that it gets fetched again """
+        self.lock.acquire()
+        try:
+            self.schema = None
+            self.hash = None
+            self.etag = None
+            self.modified = None
+            self.checked = 0        # the time of the last (re)validation
+            self.loaded = False     # whether the snapshot was tried already
+            self.generation += 1
+        finally:
+            self.lock.release()
+
+    def get(self, conn):
+        """ return the schema, fetching or revalidating it if necessary """
+        self.lock.acquire()
+        try:
+            if self.schema is None and not self.loaded:
+                self.load()
+            now = time()
+            if self.schema is None:     # other threads need to wait...
+                response = conn.getSchemaFile(self.etag, self.modified)
+                self.refresh(conn, response, now)
+                return self.schema
+            if now - self.checked < self.ttl:
+                return self.schema
+            self.checked = now          # ...but only one thread revalidates
+            schema = self.schema
+            etag, modified = self.etag, self.modified
+            generation = self.generation
+        finally:
+            self.lock.release()
+        try:        # the request is sent without holding the lock...
+            response = conn.getSchemaFile(etag, modified)
+        except (SolrException, HTTPException, error):
+            logger.warning('could not revalidate schema, keeping the '
+                'current one', exc_info=True)
+            return schema
+        self.lock.acquire()
+        try:        # ...but the schema is only replaced while holding it
+            if generation == self.generation:   # unless it was cleared
+                self.refresh(conn, response, now)
+            return self.schema or schema
+        finally:
+            self.lock.release()
+
+    def refresh(self, conn, response, now):
+        """ use the schema file from the given response to a conditional
+            request unless it's unchanged;  the lock needs to be held """
+        xml, etag, modified = response
+        self.checked = now
+        if xml is None:
+            logger.debug('schema not modified')
+            return
+        xml = xml.strip()
+        digest = md5(xml).hexdigest()
+        if digest == self.hash and self.schema is not None:
+            logger.debug('schema unchanged')
+        else:
+            logger.info('using new schema from %s', conn.host)
+            self.schema = SolrSchema(xml)
+            self.hash = digest
+            self.save(xml, etag, modified)
+        self.etag = etag
+        self.modified = modified
+
+    def load(self):
+        """ use the snapshot of the schema, if there is one """
+        self.loaded = True
+        if self.path is None or not exists(self.path):
+            return
+        try:
+            snapshot = open(self.path, 'rb')
+            try:
+                data = load(snapshot)
+            finally:
+                snapshot.close()
+            self.schema = SolrSchema(data['xml'])
+        except Exception:
+            logger.exception('could not load schema snapshot %s', self.path)
+            return
+        self.hash = md5(data['xml']).hexdigest()
+        self.etag = data['etag']
+        self.modified = data['modified']
+        self.checked = 0            # revalidate on the next access
+        logger.info('using schema snapshot %s', self.path)
+
+    def save(self, xml, etag, modified):
+        """ write a snapshot of the schema to disk """
+        if self.path is None:
+            return
+        data = dict(xml=xml, etag=etag, modified=modified)
+        temp = self.path + '.tmp'
+        try:
+            snapshot = open(temp, 'wb')
+            try:
+                dump(data, snapshot, HIGHEST_PROTOCOL)
+            finally:
+                snapshot.close()
+            rename(temp, self.path)
+        except (IOError, OSError):
+            logger.exception('could not write schema snapshot %s', self.path)
+
+
+# like the connection pools the schemas are shared process-wide
+schemas = {}
+schemasLock = Lock()
+
+
+def getSchemaCache(host, base):
+    """ return the schema cache for the given solr server """
+    schemasLock.acquire()
+    try:
+        cache = schemas.get((host, base), None)
+        if cache is None:
+            path = None
+            home = clientHome()
+            if home is not None:
+                name = 'solr-schema-%s%s.pickle' % (host, base)
+                name = name.replace(':', '-').replace('/', '-')
+                path = join(home, name)
+            cache = schemas[host, base] = SolrSchemaCache(path)
+        return cache
+    finally:
+        schemasLock.release()
@@ -1,4 +1,8 @@
+import sys
 from logging import getLogger
+from httplib import HTTPException
+from socket import error
+from threading import Thread
 from time import time
 from zope.interface import implements
 from zope.component import queryUtility
@@ -8,7 +12,10 @@ from collective.solr.interfaces import ISolrConnectionConfig
 from collective.solr.interfaces import ISolrConnectionManager
 from collective.solr.interfaces import ISearch
 from collective.solr.parser import SolrResponse
+from collective.solr.parser import SolrJSONResponse
 from collective.solr.exceptions import SolrInactiveException
+from collective.solr.exceptions import SolrUnavailableException
+from collective.solr.cache import getResultCache
 from collective.solr.queryparser import quote
 from collective.solr.utils import isWildCard
 from collective.solr.utils import prepare_wildcard
@@ -17,6 +24,116 @@ from collective.solr.utils import prepare_wildcard
 logger = getLogger('collective.solr.search')
 
 
+class MeasuredResponse(object):
+    """ wrapper for http responses counting the bytes read from them while
+        they're being parsed;  the size is only known (i.e. not `None`)
+        once the response has been read completely """
+
+    def __init__(self, response):
+        self.response = response
+        self.count = 0
+        self.complete = False
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def read(self, amt=None):
+        data = self.response.read(amt)
+        self.count += len(data)
+        if amt is None or not data:
+            self.complete = True
+        return data
+
+    @property
+    def size(self):
+        if self.complete:
+            return self.count
+        return None
+
+
+def parse(response, parameters, measure=False, schema=None):
+    """ parse the response to a search using the given parameters and
+        return it along with its size, if `measure` is set and the size
+        could be determined;  the response is streamed while parsing,
+        and the schema is needed for json responses """
+    if measure:
+        response = MeasuredResponse(response)
+    if parameters.get('wt') == 'json':
+        results = SolrJSONResponse(response, schema=schema)
+    else:
+        results = SolrResponse(response, lazy=True)
+    response.close()
+    return results, measure and response.size or None
+
+
+class SearchFuture(object):
+    """ a search sent to solr from a background thread;  the response is
+        only waited for when `result` is called, and if the search failed
+        it's repeated in the calling thread, so that errors are handled
+        (or raised) as usual """
+
+    def __init__(self, search, query, parameters, connect, cache=None,
+            schema=None):
+        self.search = search
+        self.query = query
+        self.parameters = parameters
+        self.cache = cache
+        self.schema = schema
+        self.results = None
+        self.error = None
+        self.thread = None
+        if cache is not None:
+            self.key = cache.key(query, parameters)
+            self.generation = cache.generation
+            self.results = cache.get(self.key)
+        if self.results is None:
+            self.thread = Thread(target=self.run, args=(connect,),
+                name='collective.solr search')
+            self.thread.setDaemon(True)
+            self.thread.start()
+
+    def run(self, connect):
+        """ send the search and parse the response;  as this is done in a
+            background thread, no (local) components may be used here """
+        try:
+            conn, release = connect()
+            failed = False
+            try:
+                response = conn.search(q=self.query, **self.parameters)
+                cache = self.cache
+                results, size = parse(response, self.parameters,
+                    cache is not None, self.schema)
+                if cache is not None:
+                    cache.set(self.key, results, size, self.generation, conn)
+                    results = results.copy()
+            except (error, HTTPException):
+                failed = True
+                raise
+            finally:
+                release(failed)
+            self.results = results
+        except Exception:
+            self.error = sys.exc_info()
+
+    def done(self):
+        """ check if the response has been received already """
+        return self.thread is None or not self.thread.isAlive()
+
+    def result(self):
+        """ wait for the response and return it """
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+            if self.error is not None:
+                logger.warning('background search failed, searching again: '
+                    '%r (%r)', self.query, self.parameters,
+                    exc_info=self.error)
+                self.error = None
+                self.results = self.search.search(self.query,
+                    **self.parameters)
+        return self.results
+
+
 class Search(object):
     """ a search utility for solr """
     implements(ISearch)
@@ -29,15 +146,10 @@ class Search(object):
             self.manager = queryUtility(ISolrConnectionManager)
         return self.manager
 
-    def search(self, query, **parameters):
-        """ perform a search with the given querystring and parameters """
-        start = time()
+    def prepare(self, query, parameters):
+        """ apply default values to the given parameters and return the
+            query as a string """
         config = queryUtility(ISolrConnectionConfig)
-        manager = self.getManager()
-        manager.setSearchTimeout()
-        connection = manager.getConnection()
-        if connection is None:
-            raise SolrInactiveException
         if not 'rows' in parameters:
             parameters['rows'] = config.max_results or ''
             logger.info('falling back to "max_results" (%d) without a "rows" '
@@ -47,14 +159,78 @@ class Search(object):
         logger.debug('searching for %r (%r)', query, parameters)
         if 'sort' in parameters:    # issue warning for unknown sort indices
             index, order = parameters['sort'].split()
-            schema = manager.getSchema() or {}
+            schema = self.getManager().getSchema() or {}
             field = schema.get(index, None)
             if field is None or not field.stored:
                 logger.warning('sorting on non-stored attribute "%s"', index)
-        response = connection.search(q=query, **parameters)
-        results = SolrResponse(response)
-        response.close()
-        manager.setTimeout(None)
+        return query
+
+    def getSchema(self, parameters):
+        """ return the schema needed to parse the response to a search with
+            the given parameters, i.e. to convert the values of json
+            responses, or `None` """
+        if parameters.get('wt') == 'json':
+            return self.getManager().getSchema()
+        return None
+
+    def getCache(self):
+        """ return the search result cache or `None` if it's disabled """
+        config = queryUtility(ISolrConnectionConfig)
+        if not getattr(config, 'search_cache_size', 0):
+            return None
+        return getResultCache('%s:%d' % (config.host, config.port),
+            config.base, config.search_cache_size,
+            getattr(config, 'search_cache_ttl', 0))
+
+    def search(self, query, **parameters):
+        """ perform a search with the given querystring and parameters """
+        start = time()
+        config = queryUtility(ISolrConnectionConfig)
+        manager = self.getManager()
+        manager.setSearchTimeout()
+        connection = manager.getSearchConnection()
+        if connection is None:
+            raise SolrInactiveException
+        query = self.prepare(query, parameters)
+        cache = self.getCache()
+        if cache is not None:
+            key = cache.key(query, parameters)
+            generation = cache.generation
+            results = cache.get(key)
+            if results is not None:
+                logger.debug('using cached results for %r (%r)', query,
+                    parameters)
+                manager.setTimeout(None)
+                manager.releaseSearchConnection(connection)
+                return results
+        failed = False
+        try:
+            while True:
+                try:
+                    response = connection.search(q=query, **parameters)
+                    break
+                except (error, HTTPException):
+                    # retry on another replica, if the failed one was one
+                    # of them (it's handed back as failed in any case)
+                    retry = manager.releaseSearchConnection(connection, True)
+                    connection = None
+                    if not retry:
+                        raise
+                    connection = manager.getSearchConnection()
+                    if connection is None:
+                        raise SolrInactiveException
+            results, size = parse(response, parameters, cache is not None,
+                self.getSchema(parameters))
+            if cache is not None:
+                cache.set(key, results, size, generation, connection)
+                results = results.copy()
+        except (error, HTTPException):
+            failed = True
+            raise
+        finally:
+            manager.setTimeout(None)
+            if connection is not None:
+                manager.releaseSearchConnection(connection, failed)
         elapsed = (time() - start) * 1000
         slow = config.slow_query_threshold
         if slow and elapsed >= slow:
@@ -62,8 +238,41 @@ class Search(object):
                 results.responseHeader['QTime'], elapsed, query, parameters)
         return results
 
+    def submit(self, query, **parameters):
+        """ send the given query to solr from a background thread and
+            return a `SearchFuture`, whose `result` method waits for the
+            response;  this allows to run several searches in parallel """
+        connect = self.getManager().getSearchConnector()
+        if connect is None:
+            raise SolrInactiveException
+        query = self.prepare(query, parameters)
+        return SearchFuture(self, query, parameters, connect, self.getCache(),
+            self.getSchema(parameters))
+
     __call__ = search
 
+    def iterate(self, query, rows=1000, **parameters):
+        """ yield all results of the given query sorted by the unique key
+            and fetched `rows` at a time, see `SolrConnection.iterate`;
+            unlike paging via `start` this works for any number of
+            results, e.g. for exports """
+        manager = self.getManager()
+        schema = manager.getSchema()
+        if schema is None:
+            raise SolrUnavailableException('unable to fetch schema')
+        key = schema.uniqueKey
+        connection = manager.getSearchConnection()
+        if connection is None:
+            raise SolrInactiveException
+        if isinstance(query, dict):
+            query = ' '.join(query.values())
+        logger.debug('iterating over %r (%r)', query, parameters)
+        try:
+            for flare in connection.iterate(key, rows, q=query, **parameters):
+                yield flare
+        finally:
+            manager.releaseSearchConnection(connection)
+
     def buildQuery(self, default=None, **args):
         """ helper to build a querystring for simple use-cases """
         logger.debug('building query for "%r", %r', default, args)
@@ -69,8 +69,10 @@ searchterms = url_quote_plus(r)
 site_encoding = context.plone_utils.getSiteEncoding()
 if path is None:
     path = getNavigationRoot(context)
+# only the fields needed below are retrieved, see the "livesearch" field
+# list profile in the solr settings
 results = catalog(SearchableText=r, portal_type=friendly_types, path=path,
-    sort_limit=limit)
+    sort_limit=limit, fl_profile='livesearch')
 
 searchterm_query = '?searchterm=%s'%url_quote_plus(q)
 
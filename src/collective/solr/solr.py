@@ -31,10 +31,13 @@ import sys
 import httplib
 import socket
 from elementtree.ElementTree import fromstring
-from xml.sax.saxutils import escape
 import codecs
 import urllib
-from collective.solr.parser import SolrSchema
+import zlib
+from re import compile, escape
+from threading import Thread
+from collective.solr.exceptions import SolrUnavailableException
+from collective.solr.parser import SolrSchema, SolrResponse
 from collective.solr.timeout import HTTPConnectionWithTimeout
 from collective.solr.utils import translation_map
 
@@ -58,8 +61,115 @@ class SolrException(Exception):
         return 'HTTP code=%s, reason=%s' % (self.httpcode, self.reason)
 
 
+def escapeXML(value, translation_map=translation_map):
+    """ return the given value as an utf-8 encoded string suitable for xml
+        character data;  control characters other than tab, new-line and
+        carriage-return are replaced by spaces """
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    elif not isinstance(value, str):
+        value = str(value)
+    value = value.translate(translation_map)
+    # `str.replace` is much faster than a regular expression substitution,
+    # even with three passes, and the checks let most values skip them
+    if '&' in value:
+        value = value.replace('&', '&amp;')
+    if '<' in value:
+        value = value.replace('<', '&lt;')
+    if '>' in value:
+        value = value.replace('>', '&gt;')
+    return value
+
+
+deleteById = compile(r'^<delete><id>(.*)</id></delete>$').match
+addByIds = {}
+
+
+def requestId(request, key=None):
+    """ return the id of the document an update request refers to, if
+        any;  adds are only recognized if the unique key is given """
+    match = deleteById(request)
+    if match is None and key is not None and request.startswith('<add'):
+        addById = addByIds.get(key, None)
+        if addById is None:
+            addById = addByIds[key] = compile(r'(?s)^<add[^>]*><doc[^>]*>'
+                r'.*?<field name="%s"[^>]*>([^<]*)</field>' % escape(key)).match
+        match = addById(request)
+    if match is not None:
+        return match.group(1)
+
+
+# cache of opening `<field>` tags by field name and boost value
+fieldTags = {}
+
+
+def fieldTag(name, boost=None):
+    """ return the (cached) opening tag for the given field """
+    tag = fieldTags.get((name, boost), None)
+    if tag is None:
+        if len(fieldTags) > 1000:       # boost values might be arbitrary
+            fieldTags.clear()
+        key = escapeXML(name).replace('"', '&quot;')
+        if boost is None:
+            tag = '<field name="%s">' % key
+        else:
+            tag = '<field name="%s" boost="%s">' % (key, boost)
+        fieldTags[name, boost] = tag
+    return tag
+
+
+class GzipResponse(object):
+    """ wrapper for gzip-encoded http responses, decompressing the data
+        while it is being read, e.g. by the (iterative) response parser """
+
+    def __init__(self, response, chunk=16384):
+        self.response = response
+        self.chunk = chunk
+        self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self.buffer = ''
+
+    def __getattr__(self, name):
+        return getattr(self.response, name)
+
+    def read(self, amt=None):
+        while amt is None or len(self.buffer) < amt:
+            data = self.response.read(amt and self.chunk)
+            if not data:
+                self.buffer += self.decompressor.flush()
+                break
+            self.buffer += self.decompressor.decompress(data)
+        if amt is None:
+            data, self.buffer = self.buffer, ''
+        else:
+            data, self.buffer = self.buffer[:amt], self.buffer[amt:]
+        return data
+
+
+def gzip(data, level=6):
+    """ return the given data compressed in gzip format """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def quoteKey(value):
+    """ quote a value of the unique key for use in a range query """
+    if isinstance(value, unicode):
+        value = value.encode('utf-8')
+    return '"%s"' % str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
 class SolrConnection:
 
+    batchSize = 100             # maximum number of operations per request
+    batchBytes = 1024 * 1024    # maximum size of a coalesced request
+    compress = False            # use gzip for update requests and responses
+    compressThreshold = 2048    # minimum size of compressed update requests
+    spool = None                # spool for requests that couldn't be sent
+    breaker = None              # circuit breaker for the solr server
+    cache = None                # search result cache to invalidate
+    senders = 1                 # number of connections used for updates
+    uniqueKey = None
+
     def __init__(self, host='localhost:8983', solrBase='/solr',
                  persistent=True, postHeaders={}, timeout=None):
         self.host = host
@@ -96,6 +206,8 @@ class SolrConnection:
 
     def close(self):
         self.conn.close()
+        for conn in getattr(self, 'extra', ()):
+            conn.close()
 
     def __errcheck(self, rsp):
         if rsp.status != 200:
@@ -112,7 +224,39 @@ class SolrConnection:
         logger.debug('setting socket timeout on %r: %s', self, timeout)
         self.conn.setTimeout(timeout)
 
+    def guard(self, func, *args):
+        """ call the given function unless the circuit breaker is open and
+            record its outcome;  responses with status 503 count as failures
+            as do socket and http errors, while other exceptions raised by
+            the function don't tell anything about the server's availability
+            and are therefore not recorded """
+        breaker = self.breaker
+        if breaker is None:
+            return func(*args)
+        if not breaker.allow():
+            raise SolrUnavailableException('solr at %s is unavailable' %
+                self.host)
+        try:
+            response = func(*args)
+        except (socket.error, httplib.HTTPException):
+            breaker.failure()
+            raise
+        except SolrException, e:
+            if e.httpcode == 503:
+                breaker.failure()
+            else:
+                breaker.success()   # solr did answer the request
+            raise
+        except:
+            breaker.cancel()        # make sure half-open breakers can probe
+            raise
+        breaker.success()
+        return response
+
     def doPost(self, url, body, headers):
+        return self.guard(self.__post, url, body, headers)
+
+    def __post(self, url, body, headers):
         try:
             self.conn.request('POST', url, body, headers)
             return self.__errcheck(self.conn.getresponse())
@@ -135,25 +279,193 @@ class SolrConnection:
         logger.debug('storing xml request for later: %r', request)
         self.xmlbody.append(request)
 
+    def batches(self, requests=None):
+        """ group the stored requests, so that consecutive adds (using the
+            same attributes) and consecutive deletes by id can be sent in
+            one request each, limited by `batchSize` and `batchBytes` """
+        if requests is None:
+            requests = self.xmlbody
+        batch, prefix, size = [], None, 0
+        for request in requests:
+            if request.startswith('<add'):
+                head = request[:request.index('>') + 1]
+            elif request.startswith('<delete><id>'):
+                head = '<delete>'
+            else:
+                head = None         # commits etc are always sent separately
+            if batch and (head is None or head != prefix or
+                    len(batch) >= self.batchSize or
+                    size + len(request) > self.batchBytes):
+                yield prefix, batch
+                batch, size = [], 0
+            batch.append(request)
+            prefix = head
+            size += len(request)
+        if batch:
+            yield prefix, batch
+
+    def coalesce(self, head, batch):
+        """ merge a batch of requests into one """
+        if len(batch) == 1:
+            return batch[0]
+        tail = batch[0][batch[0].rindex('</'):]
+        inner = [request[len(head):-len(tail)] for request in batch]
+        return head + ''.join(inner) + tail
+
+    def sendBatch(self, head, batch, responses, failed):
+        """ send a batch of requests;  batches rejected by solr (i.e. with
+            a 4xx status) are split up and sent again in order to only lose
+            the offending document(s), while batches that couldn't be sent
+            or processed for other reasons are added to the given list of
+            failed requests, so they can be spooled """
+        request = self.coalesce(head, batch)
+        try:
+            responses.append(self.doSendXML(request))
+        except SolrException, e:
+            if not 400 <= e.httpcode < 500:    # not the documents' fault
+                logger.exception('exception during request %r', request)
+                failed.extend(batch)
+            elif len(batch) == 1:
+                logger.exception('exception during request %r', request)
+            else:
+                logger.info('batch of %d requests failed, splitting it up',
+                    len(batch))
+                middle = len(batch) // 2
+                for part in batch[:middle], batch[middle:]:
+                    if failed:
+                        failed.extend(part)
+                    else:
+                        self.sendBatch(head, part, responses, failed)
+        except (socket.error, httplib.HTTPException):
+            logger.exception('exception during request %r', request)
+            failed.extend(batch)
+        return len(request)
+
+    def groups(self):
+        """ split the stored requests into runs of adds and deletes by id,
+            which can be sent in parallel, and other requests like commits
+            or deletes by query, which need to be sent in between """
+        if self.senders <= 1 or self.uniqueKey is None:
+            yield False, self.xmlbody
+            return
+        run = []
+        for request in self.xmlbody:
+            if requestId(request, self.uniqueKey) is not None:
+                run.append(request)
+            else:
+                if run:
+                    yield True, run
+                    run = []
+                yield False, [request]
+        if run:
+            yield True, run
+
+    def sender(self, idx):
+        """ return an additional connection for sending updates in parallel,
+            set up like this one except for the spool """
+        extra = self.__dict__.setdefault('extra', [])
+        while len(extra) < idx:
+            conn = SolrConnection(host=self.host, solrBase=self.solrBase,
+                persistent=self.persistent)
+            extra.append(conn)
+        conn = extra[idx - 1]
+        for name in ('batchSize', 'batchBytes', 'compress',
+                'compressThreshold', 'breaker'):
+            setattr(conn, name, getattr(self, name))
+        conn.setTimeout(getattr(self.conn, 'timeout', None))
+        return conn
+
+    def sendRequests(self, requests, responses, failed):
+        """ send the given requests in batches;  returns the number of bytes
+            sent while responses and failed requests are added to the
+            given lists """
+        count = 0
+        for head, batch in self.batches(requests):
+            if failed:
+                failed.extend(batch)
+            else:
+                count += self.sendBatch(head, batch, responses, failed)
+        return count
+
+    def sendParallel(self, requests, responses, failed):
+        """ send the given adds and deletes by id using several connections;
+            all requests for the same document use the same connection, so
+            they're still processed in order """
+        lanes = [[] for idx in range(self.senders)]
+        for request in requests:
+            lane = hash(requestId(request, self.uniqueKey)) % self.senders
+            lanes[lane].append(request)
+        lanes = filter(None, lanes)
+        results = [([], [], [0]) for lane in lanes]
+        def send(conn, lane, result):
+            sent, unsent, count = result
+            try:
+                count[0] = conn.sendRequests(lane, sent, unsent)
+            except Exception:
+                logger.exception('exception while sending %d requests',
+                    len(lane))
+                unsent[:] = lane
+        threads = []
+        for idx, lane in enumerate(lanes[1:]):
+            thread = Thread(target=send,
+                args=(self.sender(idx + 1), lane, results[idx + 1]))
+            thread.start()
+            threads.append(thread)
+        send(self, lanes[0], results[0])
+        for thread in threads:
+            thread.join()
+        count = 0
+        for lane_responses, lane_failed, lane_count in results:
+            responses.extend(lane_responses)
+            failed.extend(lane_failed)
+            count += lane_count[0]
+        return count
+
     def flush(self):
-        """ send out the stored requests to solr """
+        """ send out the stored requests to solr;  requests that couldn't
+            be sent are kept in the spool (if any) to be replayed later;
+            without a spool `SolrUnavailableException` is raised while the
+            circuit breaker is open """
         count = 0
         responses = []
-        for request in self.xmlbody:
-            try:
-                responses.append(self.doSendXML(request))
-            except (SolrException, socket.error):
-                logger.exception('exception during request %r', request)
-            count += len(request)
-        logger.debug('flushed out %d bytes in %d requests',
-            count, len(self.xmlbody))
+        failed = []
+        spool = self.spool
+        breaker = self.breaker
+        if breaker is not None and breaker.isOpen() and self.xmlbody:
+            if spool is None:
+                raise SolrUnavailableException('solr at %s is unavailable, '
+                    'not sending %d request(s)' % (self.host,
+                    len(self.xmlbody)))
+            failed.extend(self.xmlbody)     # don't even try while solr is down
+        elif spool is not None and spool.pending() and \
+                not spool.replay(self, self.uniqueKey):
+            failed.extend(self.xmlbody)     # keep the order of requests
+        else:
+            for parallel, requests in self.groups():
+                if failed:
+                    failed.extend(requests)
+                elif parallel:
+                    count += self.sendParallel(requests, responses, failed)
+                else:
+                    count += self.sendRequests(requests, responses, failed)
+        logger.debug('flushed out %d bytes in %d requests (%d operations)',
+            count, len(responses), len(self.xmlbody))
+        if failed and spool is not None:
+            spool.append(failed)
+        elif failed:
+            logger.error('dropped %d request(s) that could not be sent',
+                len(failed))
         del self.xmlbody[:]
         return responses
 
     def doSendXML(self, request):
+        headers = self.xmlheaders
+        if self.compress and len(request) >= self.compressThreshold:
+            request = gzip(request)
+            headers = dict(headers)
+            headers['Content-Encoding'] = 'gzip'
         try:
-            rsp = self.doPost(self.solrBase+'/update', request,
-                self.xmlheaders)
+            rsp = self.doPost(self.solrBase+'/update', request, headers)
             data = rsp.read()
         finally:
             if not self.persistent:
@@ -168,11 +480,7 @@ class SolrConnection:
         return parsed
 
     def escapeVal(self, val):
-        if isinstance(val, unicode):
-            val = val.encode('utf-8')
-        else:
-            val = str(val)
-        return escape(val.translate(translation_map))
+        return escapeXML(val)
 
     def escapeKey(self, key):
         if isinstance(key, unicode):
@@ -203,17 +511,18 @@ class SolrConnection:
             lst.append('<doc boost="%s">' % boost_values[''])
         else:
             lst.append('<doc>')
+        append = lst.append
         for f, v in fields.items():
-            if f in boost_values:
-                tmpl = '<field name="%s" boost="%s">%%s</field>' % (
-                    self.escapeKey(f), boost_values[f])
-            else:
-                tmpl = '<field name="%s">%%s</field>' % self.escapeKey(f)
+            tag = fieldTag(f, boost_values.get(f, None))
             if isinstance(v, (list, tuple)): # multi-valued
                 for value in v:
-                    lst.append(tmpl % self.escapeVal(value))
+                    append(tag)
+                    append(escapeXML(value))
+                    append('</field>')
             else:
-                lst.append(tmpl % self.escapeVal(v))
+                append(tag)
+                append(escapeXML(v))
+                append('</field>')
         lst.append('</doc>')
         lst.append('</add>')
         xstr = ''.join(lst)
@@ -226,7 +535,11 @@ class SolrConnection:
                     ' waitFlush="false"' or ''}
         xstr = '<%(committype)s%(noflush)s%(nowait)s/>' % data
         self.doUpdateXML(xstr)
-        return self.flush()
+        try:
+            return self.flush()
+        finally:
+            if self.cache is not None:
+                self.cache.invalidate()
 
     def abort(self):
         # solr will support abort/rollback only from version 1.4, so
@@ -238,31 +551,113 @@ class SolrConnection:
         del self.xmlbody[:]
 
     def search(self, **params):
+        if params.get('wt') == 'json':
+            params.setdefault('json.nl', 'map')     # named lists as objects
         request = urllib.urlencode(params, doseq=True)
+        headers = self.formheaders
+        if self.compress:
+            headers = dict(headers)
+            headers['Accept-Encoding'] = 'gzip'
         try:
             response = self.doPost('%s/select' % self.solrBase, request,
-                self.formheaders)
+                headers)
         finally:
             if not self.persistent:
                 self.conn.close()
+        if response.getheader('Content-Encoding', '').lower() == 'gzip':
+            response = GzipResponse(response)
         return response
 
+    def iterate(self, key, rows=1000, parser=None, **params):
+        """ yield the results of a search with the given parameters sorted
+            by the unique key `key`, fetching `rows` documents at a time;
+            instead of increasing the offset each page is searched for
+            starting with the last key seen, so that all pages are equally
+            expensive;  the flares are streamed using the given parser """
+        if parser is None:
+            parser = SolrResponse()
+        filters = params.pop('fq', [])
+        if isinstance(filters, basestring):
+            filters = [filters]
+        fields = params.get('fl', '').replace(',', ' ').split()
+        if fields and key not in fields and '*' not in fields:
+            params['fl'] = ' '.join(fields + [key])
+        rows = max(rows, 2)         # each page repeats the last key
+        params.update(sort='%s asc' % key, rows=rows, start=0)
+        last = None
+        while True:
+            fq = list(filters)
+            if last is not None:    # the range includes the last key...
+                fq.append('%s:[%s TO *]' % (key, quoteKey(last)))
+            response = self.search(fq=fq, **params)
+            count = 0
+            try:
+                for flare in parser.stream(response):
+                    count += 1
+                    value = flare[key]
+                    if value != last:   # ...which was yielded already
+                        last = value
+                        yield flare
+            finally:
+                response.close()
+            if count < rows:
+                break
+
     def getSchema(self):
+        xml, etag, modified = self.getSchemaFile()
+        return SolrSchema(xml.strip())
+
+    def getIndexVersion(self):
+        """ return the version of the index, which changes with every
+            commit, as reported by the luke request handler """
+        return self.guard(self.__getIndexVersion)
+
+    def __getIndexVersion(self):
+        url = '%s/admin/luke?numTerms=0&show=index' % self.solrBase
+        logger.debug('getting index version from: %s', url)
+        try:
+            self.conn.request('GET', url)
+            response = self.conn.getresponse()
+        except (socket.error, httplib.CannotSendRequest,
+            httplib.ResponseNotReady, httplib.BadStatusLine):
+            # see `doPost` method for more info about these exceptions
+            self.__reconnect()
+            self.conn.request('GET', url)
+            response = self.conn.getresponse()
+        response = self.__errcheck(response)
+        index = getattr(SolrResponse(response), 'index', {})
+        return index.get('version', None)
+
+    def getSchemaFile(self, etag=None, modified=None):
+        """ fetch the schema file and return it along with the values of
+            its `ETag` and `Last-Modified` headers;  if these are given and
+            the schema is unchanged `None` is returned instead of the file """
+        return self.guard(self.__getSchemaFile, etag, modified)
+
+    def __getSchemaFile(self, etag, modified):
         schema_urls = ('%s/admin/file/?file=schema.xml',        # solr 1.3
                        '%s/admin/get-file.jsp?file=schema.xml') # solr 1.2
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if modified:
+            headers['If-Modified-Since'] = modified
         for url in schema_urls:
             logger.debug('getting schema from: %s', url % self.solrBase)
             try:
-                self.conn.request('GET', url % self.solrBase)
+                self.conn.request('GET', url % self.solrBase, headers=headers)
                 response = self.conn.getresponse()
             except (socket.error, httplib.CannotSendRequest,
                 httplib.ResponseNotReady, httplib.BadStatusLine):
                 # see `doPost` method for more info about these exceptions
                 self.__reconnect()
-                self.conn.request('GET', url % self.solrBase)
+                self.conn.request('GET', url % self.solrBase, headers=headers)
                 response = self.conn.getresponse()
-            if response.status == 200:
+            if response.status in (200, 304):
                 xml = response.read()
-                return SolrSchema(xml.strip())
+                if response.status == 304:
+                    xml = None
+                return xml, response.getheader('ETag', etag), \
+                    response.getheader('Last-Modified', modified)
             self.__reconnect()          # force a new connection for each url
         self.__errcheck(response)       # raise a solrexception
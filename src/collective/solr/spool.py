@@ -0,0 +1,163 @@
+from logging import getLogger
+from os import fsync, rename
+from os.path import exists, getsize, isdir, join
+from threading import Lock, RLock
+
+from collective.solr.solr import requestId
+
+logger = getLogger('collective.solr.spool')
+
+
+def clientHome():
+    """ return the zope instance's client home directory, if any """
+    try:
+        from App.config import getConfiguration
+    except ImportError:
+        return None
+    home = getattr(getConfiguration(), 'clienthome', None)
+    if home and isdir(home):
+        return home
+
+
+def coalesce(requests, key=None):
+    """ drop all update requests superseded by a later one for the same
+        document as well as all but the last commit;  deletes by id are
+        always recognized, adds only if the unique key is given """
+    seen = set()
+    commit = False
+    result = []
+    for request in reversed(requests):
+        uid = requestId(request, key)
+        if uid is not None:
+            if uid in seen:
+                continue
+            seen.add(uid)
+        elif request.startswith('<commit') or request.startswith('<optimize'):
+            if commit:
+                continue
+            commit = True
+        result.append(request)
+    result.reverse()
+    return result
+
+
+class SolrSpool(object):
+    """ a write-ahead file holding update requests that couldn't be sent
+        to solr, so they can be replayed once it's reachable again """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = RLock()
+
+    def __len__(self):
+        return len(self.read())
+
+    def pending(self):
+        """ check if there are any spooled requests """
+        return exists(self.path) and getsize(self.path) > 0
+
+    def dump(self, path, mode, requests):
+        """ write the given requests to a file and sync it to disk """
+        spool = open(path, mode)
+        try:
+            for request in requests:
+                spool.write('%d\n%s\n' % (len(request), request))
+            spool.flush()
+            fsync(spool.fileno())
+        finally:
+            spool.close()
+
+    def append(self, requests):
+        """ add the given requests to the spool """
+        self.lock.acquire()
+        try:
+            self.dump(self.path, 'ab', requests)
+            logger.warning('spooled %d request(s) to %s', len(requests),
+                self.path)
+        finally:
+            self.lock.release()
+
+    def read(self):
+        """ return the list of spooled requests """
+        self.lock.acquire()
+        try:
+            if not exists(self.path):
+                return []
+            requests = []
+            spool = open(self.path, 'rb')
+            try:
+                while True:
+                    size = spool.readline()
+                    if not size.strip():
+                        break
+                    request = spool.read(int(size))
+                    if len(request) < int(size):
+                        logger.warning('ignoring truncated request in %s',
+                            self.path)
+                        break
+                    requests.append(request)
+                    spool.read(1)           # skip the separating newline
+            finally:
+                spool.close()
+            return requests
+        finally:
+            self.lock.release()
+
+    def write(self, requests):
+        """ replace the contents of the spool with the given requests """
+        self.lock.acquire()
+        try:
+            temp = self.path + '.tmp'
+            self.dump(temp, 'wb', requests)
+            rename(temp, self.path)
+        finally:
+            self.lock.release()
+
+    def replay(self, conn, key=None):
+        """ send the spooled requests in order using the given connection;
+            returns `True` if all of them could be sent, otherwise the
+            remaining ones are kept for the next attempt """
+        self.lock.acquire()
+        try:
+            requests = self.read()
+            if not requests:
+                return True
+            requests = coalesce(requests, key)
+            logger.info('replaying %d spooled request(s)', len(requests))
+            responses = []
+            failed = []
+            for head, batch in conn.batches(requests):
+                if failed:
+                    failed.extend(batch)
+                else:
+                    conn.sendBatch(head, batch, responses, failed)
+            self.write(failed)
+            if failed:
+                logger.warning('%d spooled request(s) could not be replayed',
+                    len(failed))
+            return not failed
+        finally:
+            self.lock.release()
+
+
+# spools are shared process-wide, keyed by solr server
+spools = {}
+spoolsLock = Lock()
+
+
+def getSpool(host, base):
+    """ return the spool for the given solr server or `None` if there's no
+        client home directory to hold the spool file """
+    home = clientHome()
+    if home is None:
+        return None
+    spoolsLock.acquire()
+    try:
+        spool = spools.get((host, base), None)
+        if spool is None:
+            name = 'solr-spool-%s%s.log' % (host, base)
+            name = name.replace(':', '-').replace('/', '-')
+            spool = spools[host, base] = SolrSpool(join(home, name))
+        return spool
+    finally:
+        spoolsLock.release()
@@ -1,35 +1,308 @@
-# simple benchmarking tests for measuring raw xml parsing speed
+# a self-contained benchmark suite timing the hot paths of indexing and
+# searching based on synthetic, plone-like corpora (see `corpus.py`);
+# the results are reported as json, so that releases can be compared
 # usage:
-# $ wget -O parts/test/data.xml 'http://localhost:8983/solr/select/?q=foo&rows=...'
+# $ bin/zopepy -m collective.solr.tests.benchmark [-d 1000] [-r 5] [-o x.json]
 # $ bin/test --tests-pattern=benchmark -v -v
 
+import sys
+from optparse import OptionParser
+from time import time
 from unittest import TestCase, defaultTestLoader
-from collective.solr.parser import SolrResponse
+from xml.sax.saxutils import escape
+from DateTime import DateTime
+from zope.component import getGlobalSiteManager
+
 from collective.solr.iterparse import source
+from collective.solr.parser import SolrResponse, SolrJSONResponse, SolrSchema
+from collective.solr.solr import SolrConnection
+from collective.solr.tests import corpus
+from collective.solr.tests.utils import fakehttp, getData
+from collective.solr.utils import translation_map
+
+try:
+    from simplejson import dumps
+except ImportError:
+    from json import dumps
+
+
+def timed(func, rounds, setup=None):
+    """ call the given function (with the arguments returned by the
+        optional setup function) for the given number of rounds and
+        return the timings in milliseconds """
+    timings = []
+    for idx in range(rounds):
+        args = ()
+        if setup is not None:
+            args = setup()
+        start = time()
+        func(*args)
+        timings.append((time() - start) * 1000)
+    return dict(rounds=rounds, best=min(timings), worst=max(timings),
+        mean=sum(timings) / rounds)
+
+
+class LegacyConnection(SolrConnection):
+    """ the previous implementation of `add`, for comparison """
+
+    def escapeVal(self, val):
+        if isinstance(val, unicode):
+            val = val.encode('utf-8')
+        else:
+            val = str(val)
+        return escape(val.translate(translation_map))
+
+    def add(self, boost_values=None, **fields):
+        within = fields.pop('commitWithin', None)
+        if within:
+            lst = ['<add commitWithin="%s">' % str(within)]
+        else:
+            lst = ['<add>']
+        if boost_values is None:
+            boost_values = {}
+        if '' in boost_values:
+            lst.append('<doc boost="%s">' % boost_values[''])
+        else:
+            lst.append('<doc>')
+        for f, v in fields.items():
+            if f in boost_values:
+                tmpl = '<field name="%s" boost="%s">%%s</field>' % (
+                    self.escapeKey(f), boost_values[f])
+            else:
+                tmpl = '<field name="%s">%%s</field>' % self.escapeKey(f)
+            if isinstance(v, (list, tuple)):
+                for value in v:
+                    lst.append(tmpl % self.escapeVal(value))
+            else:
+                lst.append(tmpl % self.escapeVal(v))
+        lst.append('</doc>')
+        lst.append('</add>')
+        return self.doUpdateXML(''.join(lst))
+
+
+def serialize(factory, docs):
+    """ serialize the given documents using the given connection class
+        and return the resulting requests """
+    conn = factory(host='localhost:8983')
+    for doc in docs:
+        conn.add(boost_values={'Title': 5}, commitWithin=1000, **doc)
+    return conn.xmlbody
+
+
+def benchAdd(docs, rounds, factory=SolrConnection):
+    """ serialize documents using `SolrConnection.add` """
+    data = [corpus.document(idx) for idx in range(docs)]
+    return timed(serialize, rounds, lambda: (factory, data))
+
+
+def benchAddLegacy(docs, rounds):
+    """ serialize documents using the previous implementation of `add` """
+    return benchAdd(docs, rounds, LegacyConnection)
+
+
+def benchFlush(docs, rounds):
+    """ send serialized documents to a (fake) server using `flush` """
+    data = [corpus.document(idx) for idx in range(docs)]
+    response = getData('add_response.txt')
+    def setup():
+        conn = SolrConnection(host='localhost:8983', persistent=True)
+        for doc in data:
+            conn.add(**doc)
+        fakehttp(conn, *[response] * (len(conn.xmlbody) + 1))
+        return conn,
+    def flush(conn):
+        conn.flush()
+    return timed(flush, rounds, setup)
+
 
+def benchParse(docs, rounds):
+    """ parse a search response and access all fields of all results """
+    xml = corpus.response(docs)
+    def parse():
+        for flare in SolrResponse(xml).response:
+            flare.items()
+    return timed(parse, rounds)
 
-print 'Using `iterparse` from `%s`...' % source
 
+def benchParseJSON(docs, rounds):
+    """ parse the same search response in json format and access all
+        fields of all results """
+    json = corpus.json(docs)
+    schema = SolrSchema(corpus.schema())
+    def parse():
+        for flare in SolrJSONResponse(json, schema=schema).response:
+            flare.items()
+    return timed(parse, rounds)
 
-class ParserBenchmarks(TestCase):
 
-    data = open('data.xml', 'r').read()
+def benchParseLazy(docs, rounds):
+    """ parse a search response lazily and access the first 20 results """
+    xml = corpus.response(docs)
+    def parse():
+        for flare in SolrResponse(xml, lazy=True).response[:20]:
+            flare.items()
+    return timed(parse, rounds)
 
-    def test1(self):
-        SolrResponse(self.data)
 
-    def test2(self):
-        SolrResponse(self.data)
+def benchQuery(docs, rounds):
+    """ mangle catalog queries and build solr queries from them """
+    from collective.solr.manager import SolrConnectionConfig
+    from collective.solr.mangler import mangleQuery
+    from collective.solr.search import Search
+    config = SolrConnectionConfig()
+    schema = SolrSchema(corpus.schema())
+    class Manager(object):
+        def getSchema(self):
+            return schema
+    search = Search()
+    search.manager = Manager()
+    now = DateTime()
+    def query():
+        for idx in range(docs):
+            args = dict(SearchableText='foo bar*', Subject='news',
+                portal_type=['Document', 'News Item'],
+                review_state='published', is_folderish=False,
+                path=dict(query='/plone/folder-%d' % (idx % 100), depth=1),
+                effective=dict(query=now, range='max'))
+            mangleQuery(args, config, schema)
+            search.buildQuery(**args)
+    return timed(query, rounds)
 
-    def test3(self):
-        SolrResponse(self.data)
 
-    def test4(self):
-        SolrResponse(self.data)
+def benchResults(docs, rounds):
+    """ search using `solrSearchResults`, which includes wrapping the
+        results as `PloneFlare`s, and access all results """
+    from zope.publisher.browser import TestRequest
+    from collective.solr.dispatcher import solrSearchResults
+    from collective.solr.flare import PloneFlare
+    from collective.solr.interfaces import ISolrConnectionConfig, ISearch
+    from collective.solr.manager import SolrConnectionConfig
+    from collective.solr.manager import SolrConnectionManager
+    from collective.solr.search import Search
+    gsm = getGlobalSiteManager()
+    config = SolrConnectionConfig()
+    gsm.registerUtility(config, ISolrConnectionConfig)
+    gsm.registerAdapter(PloneFlare)
+    manager = SolrConnectionManager(active=True)
+    search = Search()
+    search.manager = manager
+    gsm.registerUtility(search, ISearch)
+    try:
+        fakehttp(manager.getConnection(), corpus.http(corpus.schema()))
+        manager.getSchema()
+        response = corpus.http(corpus.response(docs))
+        def setup():
+            fakehttp(manager.getConnection(), response)
+            return TestRequest(),
+        def query(request):
+            results = solrSearchResults(request, SearchableText='foo',
+                rows=docs, use_solr=True)
+            for flare in results:
+                flare.getPath()
+        return timed(query, rounds, setup)
+    finally:
+        manager.setHost(active=False)
+        gsm.unregisterUtility(search, ISearch)
+        gsm.unregisterAdapter(PloneFlare)
+        gsm.unregisterUtility(config, ISolrConnectionConfig)
 
-    def test5(self):
-        SolrResponse(self.data)
+
+def benchFacets(docs, rounds):
+    """ convert facet counts for display using `convertFacets` """
+    from zope.publisher.browser import TestRequest
+    from collective.solr.browser.facets import convertFacets
+    from collective.solr.vocabularies import I18NFacetTitlesVocabularyFactory
+    gsm = getGlobalSiteManager()
+    vocabulary = I18NFacetTitlesVocabularyFactory()
+    gsm.registerUtility(vocabulary)
+    response = SolrResponse(corpus.response(docs, facet=True))
+    fields = response.facet_counts['facet_fields']
+    def setup():
+        return TestRequest(form={'facet.field': sorted(fields)}),
+    def convert(request):
+        convertFacets(fields, None, request)
+    try:
+        return timed(convert, rounds, setup)
+    finally:
+        gsm.unregisterUtility(vocabulary)
+
+
+benchmarks = [
+    ('add', benchAdd),
+    ('add-legacy', benchAddLegacy),
+    ('flush', benchFlush),
+    ('parse', benchParse),
+    ('parse-json', benchParseJSON),
+    ('parse-lazy', benchParseLazy),
+    ('query', benchQuery),
+    ('results', benchResults),
+    ('facets', benchFacets),
+]
+
+
+def version():
+    """ return the version of the installed package, if available """
+    try:
+        from pkg_resources import get_distribution, DistributionNotFound
+        return get_distribution('collective.solr').version
+    except (ImportError, DistributionNotFound):
+        return None
+
+
+def run(docs=1000, rounds=5, names=()):
+    """ run the given (or all) benchmarks and return the results """
+    results = {}
+    for name, benchmark in benchmarks:
+        if not names or name in names:
+            results[name] = benchmark(docs, rounds)
+    return dict(version=version(), python=sys.version.split()[0],
+        iterparse=source, docs=docs, benchmarks=results)
+
+
+def main(args=None):
+    parser = OptionParser(usage='%prog [options] [benchmark ...]')
+    parser.add_option('-d', '--docs', type='int', default=1000,
+        help='number of documents (or queries) per round [%default]')
+    parser.add_option('-r', '--rounds', type='int', default=5,
+        help='number of rounds for each benchmark [%default]')
+    parser.add_option('-o', '--output', metavar='FILE',
+        help='write the results to the given file instead of stdout')
+    options, names = parser.parse_args(args)
+    results = dumps(run(options.docs, options.rounds, names),
+        indent=2, sort_keys=True)
+    if options.output:
+        output = open(options.output, 'w')
+        try:
+            output.write(results)
+        finally:
+            output.close()
+    else:
+        print results
+
+
+class Benchmarks(TestCase):
+
+    def testLegacySerializer(self):
+        docs = [corpus.document(idx) for idx in range(100)]
+        self.assertEqual(serialize(LegacyConnection, docs),
+            serialize(SolrConnection, docs))
+
+    def testJSONResponse(self):
+        xml = SolrResponse(corpus.response(10)).response
+        json = SolrJSONResponse(corpus.json(10),
+            schema=SolrSchema(corpus.schema())).response
+        self.assertEqual([sorted(flare.keys()) for flare in json],
+            [sorted(flare.keys()) for flare in xml])
+        self.assertEqual([(flare.Title, flare.modified) for flare in json],
+            [(flare.Title, flare.modified) for flare in xml])
+
+    def testBenchmarks(self):
+        print '\n' + dumps(run(), indent=2, sort_keys=True)
 
 
 def test_suite():
     return defaultTestLoader.loadTestsFromName(__name__)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+# synthetic, plone-like corpora (documents, schemas and search responses)
+# of configurable size for benchmarking purposes
+
+from xml.sax.saxutils import escape, quoteattr
+
+try:
+    from simplejson import dumps
+except ImportError:
+    from json import dumps
+
+
+# the fields of a typical plone site's schema: name, type, stored and
+# multi-valued flags (all fields are indexed)
+fields = [
+    ('UID', 'string', True, False),
+    ('id', 'string', True, False),
+    ('getId', 'string', True, False),
+    ('Title', 'text', True, False),
+    ('Description', 'text', True, False),
+    ('SearchableText', 'text', False, False),
+    ('Subject', 'string', True, True),
+    ('allowedRolesAndUsers', 'string', False, True),
+    ('portal_type', 'string', True, False),
+    ('review_state', 'string', True, False),
+    ('path_string', 'string', True, False),
+    ('path_depth', 'integer', True, False),
+    ('path_parents', 'string', False, True),
+    ('getObjPositionInParent', 'integer', True, False),
+    ('is_folderish', 'boolean', True, False),
+    ('created', 'date', True, False),
+    ('modified', 'date', True, False),
+    ('effective', 'date', True, False),
+    ('expires', 'date', True, False),
+    ('Creator', 'string', True, False),
+    ('getIcon', 'string', True, False),
+    ('sortable_title', 'string', True, False),
+    ('Language', 'string', True, False),
+]
+
+types = {
+    'string': 'solr.StrField',
+    'text': 'solr.TextField',
+    'integer': 'solr.IntField',
+    'boolean': 'solr.BoolField',
+    'date': 'solr.DateField',
+}
+
+tags = {
+    'string': 'str',
+    'text': 'str',
+    'integer': 'int',
+    'boolean': 'bool',
+    'date': 'date',
+}
+
+portal_types = ['Document', 'News Item', 'Event', 'Folder', 'File', 'Image']
+review_states = ['published', 'private', 'pending']
+subjects = [u'news', u'events', u'plone', u'python', u'solr', u'm\xfcnchen']
+
+text = (u'Lorem ipsum dolor sit amet, consectetur adipisici elit, '
+    u'sed eiusmod tempor incidunt ut labore et dolore magna aliqua. '
+    u'Ut enim ad minim veniam, quis nostrud exercitation ullamco & '
+    u'laboris nisi ut aliquid ex ea commodi consequat. \xe4\xf6\xfc ')
+
+
+def document(idx, extra=0):
+    """ return index data resembling that of a typical plone document;
+        `extra` additional string fields can be added """
+    folder = 'folder-%d' % (idx % 100)
+    doc = dict(UID='6b4b9e3e2c8f4a4d9c1d%012d' % idx,
+        id='document-%d' % idx, getId='document-%d' % idx,
+        Title=u'Document number %d \u2013 a test' % idx,
+        Description=u'A short description of document %d.' % idx,
+        SearchableText=text * 40,
+        Subject=[subjects[idx % 6], subjects[idx % 5], u'plone'],
+        allowedRolesAndUsers=['Anonymous', 'Manager', 'user$admin'],
+        portal_type=portal_types[idx % 6],
+        review_state=review_states[idx % 3],
+        path_string='/plone/%s/document-%d' % (folder, idx),
+        path_depth=4, path_parents=['/plone', '/plone/' + folder],
+        getObjPositionInParent=idx % 50, is_folderish=False,
+        created='2010-06-10T10:46:03.000Z', modified='2011-01-01T12:00:00.000Z',
+        effective='2010-06-10T10:46:03.000Z', expires='2499-12-31T00:00:00Z',
+        Creator='admin', getIcon='document_icon.png',
+        sortable_title='document number %d' % idx, Language='en')
+    for num in range(extra):
+        doc['extra%d' % num] = 'extra value %d of document %d' % (num, idx)
+    return doc
+
+
+def schema(extra=0):
+    """ return a schema (as it's sent by solr) for the documents returned
+        by `document`, with the given number of `extra` fields """
+    xml = ['<?xml version="1.0" encoding="UTF-8"?>',
+        '<schema name="benchmark" version="1.1"><types>']
+    for name, cls in sorted(types.items()):
+        xml.append('<fieldType name="%s" class="%s" omitNorms="true"/>' % (
+            name, cls))
+    xml.append('</types><fields>')
+    specs = list(fields)
+    specs.extend([('extra%d' % num, 'string', True, False)
+        for num in range(extra)])
+    for name, type, stored, multi in specs:
+        xml.append('<field name="%s" type="%s" indexed="true" stored="%s" '
+            'multiValued="%s" %s/>' % (name, type, str(stored).lower(),
+            str(multi).lower(), name == 'UID' and 'required="true" ' or ''))
+    xml.append('</fields><uniqueKey>UID</uniqueKey>')
+    xml.append('<defaultSearchField>SearchableText</defaultSearchField>')
+    xml.append('<solrQueryParser defaultOperator="AND"/></schema>')
+    return '\n'.join(xml)
+
+
+def value(type, data):
+    """ serialize a value like solr does in its responses """
+    if type == 'boolean':
+        return str(bool(data)).lower()
+    elif isinstance(data, unicode):
+        return escape(data.encode('utf-8'))
+    return escape(str(data))
+
+
+def facets(docs):
+    """ return the facet counts for the first `docs` documents """
+    counts = {}
+    for idx in range(docs):
+        doc = document(idx)
+        for name in 'portal_type', 'review_state', 'Subject', 'path_parents':
+            values = doc[name]
+            if not isinstance(values, list):
+                values = [values]
+            for item in values:
+                field = counts.setdefault(name, {})
+                field[item] = field.get(item, 0) + 1
+    return counts
+
+
+def stored(extra=0):
+    """ return name, type and multi-valued flag of the stored fields """
+    specs = [(name, type, multi) for name, type, store, multi in fields
+        if store]
+    specs.extend([('extra%d' % num, 'string', False)
+        for num in range(extra)])
+    return specs
+
+
+def response(docs=1000, extra=0, facet=False):
+    """ return a solr search response (without http headers) holding the
+        stored fields of `docs` documents, optionally with facet counts """
+    xml = ['<?xml version="1.0" encoding="UTF-8"?><response>',
+        '<lst name="responseHeader"><int name="status">0</int>',
+        '<int name="QTime">3</int><lst name="params">',
+        '<str name="q">+portal_type:Document</str>',
+        '<str name="rows">%d</str></lst></lst>' % docs,
+        '<result name="response" numFound="%d" start="0">' % docs]
+    for idx in range(docs):
+        doc = document(idx, extra)
+        xml.append('<doc>')
+        for name, type, multi in stored(extra):
+            tag = tags[type]
+            if multi:
+                xml.append('<arr name="%s">' % name)
+                for item in doc[name]:
+                    xml.append('<%s>%s</%s>' % (tag, value(type, item), tag))
+                xml.append('</arr>')
+            else:
+                xml.append('<%s name="%s">%s</%s>' % (tag, name,
+                    value(type, doc[name]), tag))
+        xml.append('<float name="score">%f</float>' % (1.0 / (idx + 1)))
+        xml.append('</doc>')
+    xml.append('</result>')
+    if facet:
+        xml.append('<lst name="facet_counts">')
+        xml.append('<lst name="facet_queries"/><lst name="facet_fields">')
+        for name, counts in sorted(facets(docs).items()):
+            xml.append('<lst name="%s">' % name)
+            for item, count in sorted(counts.items()):
+                xml.append('<int name=%s>%d</int>' % (
+                    quoteattr(unicode(item).encode('utf-8')), count))
+            xml.append('</lst>')
+        xml.append('</lst><lst name="facet_dates"/></lst>')
+    xml.append('</response>')
+    return ''.join(xml)
+
+
+def json(docs=1000, extra=0):
+    """ return the search response returned by `response` (without facet
+        counts) in json format, i.e. using `wt=json` """
+    result = []
+    for idx in range(docs):
+        doc = document(idx, extra)
+        data = dict([(name, doc[name]) for name, type, multi in stored(extra)])
+        data['score'] = 1.0 / (idx + 1)
+        result.append(data)
+    header = dict(status=0, QTime=3,
+        params={'q': '+portal_type:Document', 'rows': str(docs)})
+    return dumps(dict(responseHeader=header,
+        response=dict(numFound=docs, start=0, docs=result)))
+
+
+def http(body):
+    """ wrap the given xml in a http response as sent by solr """
+    return 'HTTP/1.1 200 OK\r\nContent-Type: text/xml; charset=utf-8\r\n' \
+        'Content-Length: %d\r\n\r\n%s' % (len(body), body)
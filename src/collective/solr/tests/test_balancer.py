@@ -0,0 +1,88 @@
+from unittest import TestCase
+from zope.component import provideUtility
+
+from collective.solr.balancer import SolrNodes, getNodes, nodes, ping
+from collective.solr.interfaces import ISolrConnectionConfig
+from collective.solr.manager import SolrConnectionConfig
+from collective.solr.manager import SolrConnectionManager
+from collective.solr.tests.utils import fakeServer
+
+
+class NodesTests(TestCase):
+
+    def setUp(self):
+        self.nodes = SolrNodes(['foo:1', 'bar:2', 'baz:3'], '/solr')
+
+    def testRoundRobin(self):
+        chosen = [self.nodes.choose() for idx in range(6)]
+        self.assertEqual(sorted(set(chosen)), ['bar:2', 'baz:3', 'foo:1'])
+        self.assertEqual(chosen[:3], chosen[3:])
+
+    def testEjection(self):
+        self.nodes.eject('foo:1')
+        self.nodes.eject('bar:2')
+        self.assertEqual(self.nodes.healthy(), ['baz:3'])
+        self.assertEqual(set([self.nodes.choose() for idx in range(3)]),
+            set(['baz:3']))
+        self.nodes.eject('baz:3')
+        self.assertEqual(self.nodes.choose(), None)
+        self.nodes.restore('bar:2')
+        self.assertEqual(self.nodes.choose(), 'bar:2')
+
+    def testPing(self):
+        def respond(handler):
+            handler.send_response(200)
+            handler.end_headers()
+            handler.wfile.write('<response/>')
+        thread = fakeServer([respond], port=55555)
+        self.failUnless(ping('localhost:55555', '/solr'))
+        thread.join()
+        self.failIf(ping('localhost:55555', '/solr', timeout=1))
+
+
+class ReplicaManagerTests(TestCase):
+
+    def setUp(self):
+        self.config = SolrConnectionConfig()
+        self.config.replicas = ['replica1:1234', 'replica2']
+        provideUtility(self.config, ISolrConnectionConfig)
+        self.mngr = SolrConnectionManager()
+        self.mngr.setHost(active=True, port=55555)
+
+    def tearDown(self):
+        self.mngr.closeConnection()
+        self.mngr.setHost(active=False)
+        nodes.clear()
+
+    def testReplicas(self):
+        self.assertEqual(self.mngr.getReplicas(),
+            ['replica1:1234', 'replica2:55555'])
+
+    def testSearchConnections(self):
+        first = self.mngr.getSearchConnection()
+        second = self.mngr.getSearchConnection()
+        self.assertEqual(sorted([first.host, second.host]),
+            ['replica1:1234', 'replica2:55555'])
+        self.failUnless(self.mngr.releaseSearchConnection(first))
+        self.failUnless(self.mngr.releaseSearchConnection(second))
+
+    def testFailedReplicas(self):
+        nodes = getNodes(self.mngr.getReplicas(), '/solr')
+        nodes.interval = 3600       # don't probe during the test
+        for idx in range(2):
+            conn = self.mngr.getSearchConnection()
+            self.failUnless(self.mngr.releaseSearchConnection(conn, True))
+        self.assertEqual(nodes.healthy(), [])
+        # without any responding replica the main server is used...
+        conn = self.mngr.getSearchConnection()
+        self.failUnless(conn is self.mngr.getConnection())
+        self.failIf(self.mngr.releaseSearchConnection(conn, True))
+        nodes.restore('replica1:1234')
+        self.assertEqual(self.mngr.getSearchConnection().host,
+            'replica1:1234')
+
+    def testNoReplicas(self):
+        self.config.replicas = []
+        conn = self.mngr.getSearchConnection()
+        self.failUnless(conn is self.mngr.getConnection())
+        self.failIf(self.mngr.releaseSearchConnection(conn))
@@ -0,0 +1,117 @@
+from unittest import TestCase
+from os import remove
+from os.path import exists
+from socket import error
+from tempfile import mktemp
+
+from collective.solr.breaker import CircuitBreaker
+from collective.solr.exceptions import SolrUnavailableException
+from collective.solr.solr import SolrConnection
+from collective.solr.spool import SolrSpool
+from collective.solr.tests.test_spool import UnreachableConnection
+from collective.solr.tests.utils import getData, fakehttp
+
+
+class BreakerTests(TestCase):
+
+    def setUp(self):
+        self.breaker = CircuitBreaker('localhost:8983', threshold=3,
+            cooldown=30)
+
+    def testTrip(self):
+        for idx in range(2):
+            self.breaker.failure(now=100)
+        self.failUnless(self.breaker.allow(now=100))
+        self.breaker.success()          # successes reset the count
+        for idx in range(3):
+            self.failUnless(self.breaker.allow(now=100))
+            self.breaker.failure(now=100)
+        self.failUnless(self.breaker.isOpen(now=101))
+        self.failIf(self.breaker.allow(now=101))
+
+    def testHalfOpen(self):
+        for idx in range(3):
+            self.breaker.failure(now=100)
+        self.failIf(self.breaker.allow(now=129))
+        self.failIf(self.breaker.isOpen(now=131))
+        self.failUnless(self.breaker.allow(now=131))    # the probe...
+        self.failIf(self.breaker.allow(now=131))        # ...is only one
+        self.breaker.failure(now=131)                   # the probe failed
+        self.failIf(self.breaker.allow(now=160))
+        self.failUnless(self.breaker.allow(now=162))
+        self.breaker.success()
+        self.failUnless(self.breaker.allow())
+        self.assertEqual(self.breaker.failures, 0)
+
+    def testCancelledProbe(self):
+        for idx in range(3):
+            self.breaker.failure(now=100)
+        self.failUnless(self.breaker.allow(now=131))
+        self.breaker.cancel()                           # no outcome...
+        self.assertEqual(self.breaker.failures, 3)
+        self.failUnless(self.breaker.allow(now=131))    # ...so probe again
+
+
+class ConnectionBreakerTests(TestCase):
+
+    def setUp(self):
+        self.conn = SolrConnection(host='localhost:8983', persistent=True)
+        self.conn.breaker = CircuitBreaker('localhost:8983', threshold=2)
+        self.conn.spool = self.spool = SolrSpool(mktemp(suffix='.log'))
+        self.http = self.conn.conn
+
+    def tearDown(self):
+        if exists(self.spool.path):
+            remove(self.spool.path)
+
+    def testFastFailure(self):
+        self.conn.conn = UnreachableConnection()
+        for idx in range(2):
+            self.assertRaises(error,
+                self.conn.search, q='foo')
+        self.conn.conn = self.http
+        fakehttp(self.conn, getData('search_response.txt'))
+        # no request is attempted while the breaker is open
+        self.assertRaises(SolrUnavailableException, self.conn.search, q='foo')
+        self.assertRaises(SolrUnavailableException, self.conn.getSchema)
+        self.conn.breaker.opened -= 30      # after the cool-down...
+        self.conn.search(q='foo')           # ...a probe succeeds
+        self.failIf(self.conn.breaker.isOpen())
+
+    def testUnrelatedErrors(self):
+        def fail():
+            raise ValueError('not related to solr')
+        breaker = self.conn.breaker
+        breaker.failure()
+        self.assertRaises(ValueError, self.conn.guard, fail)
+        self.assertEqual(breaker.failures, 1)   # no success recorded
+        breaker.failure()
+        self.failUnless(breaker.isOpen())
+        breaker.opened -= 30
+        self.assertRaises(ValueError, self.conn.guard, fail)
+        self.failUnless(breaker.opened is not None)
+        self.failUnless(breaker.allow())        # the next probe may try
+
+    def testFlushWhileOpenWithoutSpool(self):
+        self.conn.spool = None
+        self.conn.breaker.failure()
+        self.conn.breaker.failure()
+        output = fakehttp(self.conn)
+        self.conn.delete('1')
+        self.assertRaises(SolrUnavailableException, self.conn.flush)
+        self.assertEqual(len(self.conn.xmlbody), 1)     # left to the caller
+        self.conn.abort()
+        self.assertEqual(len(output), 0)
+
+    def testSpoolWhileOpen(self):
+        self.conn.conn = UnreachableConnection()
+        for idx in range(2):
+            self.conn.delete(str(idx))
+            self.conn.flush()
+        self.failUnless(self.conn.breaker.isOpen())
+        self.conn.conn = self.http
+        output = fakehttp(self.conn)        # any request would fail now
+        self.conn.delete('2')
+        self.assertEqual(self.conn.flush(), [])
+        self.assertEqual(len(self.conn.spool), 3)
+        self.assertEqual(len(output), 0)
@@ -0,0 +1,185 @@
+from unittest import TestCase
+from socket import error
+from StringIO import StringIO
+
+from DateTime import DateTime
+
+from collective.solr.cache import SolrResultCache, getResultCache, caches
+from collective.solr.manager import SolrConnectionConfig
+from collective.solr.mangler import mangleQuery
+from collective.solr.parser import SolrResponse, SolrSchema
+from collective.solr.search import Search, parse
+from collective.solr.solr import SolrConnection, GzipResponse, gzip
+from collective.solr.tests import corpus
+from collective.solr.tests.utils import getData, fakehttp
+
+
+class FakeConnection(object):
+    """ a connection reporting the given index versions (or exceptions) """
+
+    host = 'localhost:8983'
+
+    def __init__(self, *versions):
+        self.versions = list(versions)
+
+    def getIndexVersion(self):
+        version = self.versions.pop(0)
+        if isinstance(version, Exception):
+            raise version
+        return version
+
+
+class ResultCacheTests(TestCase):
+
+    def setUp(self):
+        self.xml = getData('complex_xml_response.txt')
+        self.cache = SolrResultCache(size=100 * len(self.xml), ttl=60,
+            check=0)
+
+    def store(self, key, now=None, size=None):
+        response = SolrResponse(self.xml, lazy=True)
+        self.cache.set(key, response, size or len(self.xml),
+            self.cache.generation, now=now)
+        return response
+
+    def testKey(self):
+        key = self.cache.key
+        self.assertEqual(key('+foo  +bar', dict(fq=['b', 'a'], rows=10)),
+            key('+foo +bar', dict(rows=10, fq=['a', 'b'])))
+        self.assertNotEqual(key('+foo', dict(fq=['allowedRolesAndUsers:a'])),
+            key('+foo', dict(fq=['allowedRolesAndUsers:b'])))
+        self.assertEqual(key('+foo', dict(bar={})), None)
+
+    def testHitsReturnCopies(self):
+        self.assertEqual(self.cache.get('foo'), None)
+        self.store('foo')
+        first = self.cache.get('foo')
+        first.response.wrapper = lambda flare: flare.id
+        self.assertEqual(list(first.response), ['SOLR1000', '3007WFP'])
+        first.response[0:0] = [None]
+        second = self.cache.get('foo')
+        self.assertEqual(len(second.response), 2)
+        self.assertEqual(second.response[0].id, 'SOLR1000')
+        second.response[0]['foo'] = 'bar'
+        self.failIf('foo' in self.cache.get('foo').response[0])
+        stats = self.cache.statistics()
+        self.assertEqual(stats['hits'], 3)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['bytes'], len(self.xml))
+
+    def testAnonymousQueries(self):
+        config = SolrConnectionConfig()
+        config.search_cache_size = 1024 * 1024
+        config.search_cache_ttl = 60
+        schema = SolrSchema(corpus.schema())
+        class Manager(object):
+            def getSchema(self):
+                return schema
+        search = Search()
+        search.manager = Manager()
+        def key(now):
+            # the arguments of an anonymous catalog query at the given time,
+            # see `catalogArguments`
+            args = dict(SearchableText='foo', allowedRolesAndUsers=[
+                'Anonymous'], effectiveRange=DateTime(now))
+            mangleQuery(args, config, schema)
+            query = ' '.join(sorted(search.buildQuery(**args).values()))
+            return self.cache.key(query, dict(rows=10))
+        self.store(key(1000000000.123))
+        self.failIf(self.cache.get(key(1000000000.125)) is None)
+        self.assertEqual(self.cache.statistics()['hits'], 1)
+
+    def testExpiry(self):
+        self.store('foo', now=1000)
+        self.failIf(self.cache.get('foo', now=1059) is None)
+        self.assertEqual(self.cache.get('foo', now=1060), None)
+        self.assertEqual(self.cache.statistics()['entries'], 0)
+
+    def testMemoryBound(self):
+        for idx in range(12):
+            self.store(idx, size=len(self.xml) * 10)
+        self.cache.get(2)                   # 2 is now used most recently
+        self.store('foo', size=len(self.xml) * 9)
+        stats = self.cache.statistics()
+        self.assertEqual(stats['entries'], 10)
+        self.assertEqual(stats['evictions'], 3)
+        self.failUnless(stats['bytes'] <= self.cache.size)
+        self.assertEqual(sorted(self.cache.entries, key=str),
+            sorted(['foo', 2, 4, 5, 6, 7, 8, 9, 10, 11], key=str))
+        self.store('bar', size=len(self.xml) * 11)      # too large
+        self.assertEqual(self.cache.get('bar'), None)
+
+    def testUnknownSize(self):
+        response = SolrResponse(self.xml, lazy=True)
+        self.cache.set('foo', response, None, self.cache.generation)
+        self.assertEqual(self.cache.get('foo'), None)
+
+    def testMeasureWhileParsing(self):
+        results, size = parse(StringIO(self.xml), {}, measure=True)
+        self.assertEqual(size, len(self.xml))
+        self.assertEqual(len(results), 2)
+        response = GzipResponse(StringIO(gzip(self.xml)))
+        results, size = parse(response, {}, measure=True)
+        self.assertEqual(size, len(self.xml))   # the uncompressed size
+        self.assertEqual(len(results), 2)
+        results, size = parse(StringIO(self.xml), {})
+        self.assertEqual(size, None)
+
+    def testInvalidation(self):
+        self.store('foo')
+        generation = self.cache.generation
+        self.cache.invalidate()
+        self.assertEqual(self.cache.get('foo'), None)
+        response = SolrResponse(self.xml)   # searched before invalidation
+        self.cache.set('foo', response, 10, generation)
+        self.assertEqual(self.cache.get('foo'), None)
+        self.assertEqual(self.cache.statistics()['invalidations'], 1)
+
+    def testIndexVersion(self):
+        self.cache.check = 10
+        conn = FakeConnection(1, 1, error('down'), 2)
+        self.assertEqual(self.cache.get('foo', now=100), None)  # checked
+        self.cache.set('foo', SolrResponse(self.xml), 10,
+            self.cache.generation, conn)
+        self.failIf(self.cache.get('foo', now=105) is None)
+        def search(now):
+            self.assertEqual(self.cache.get('foo', now=now), None)
+            self.cache.set('bar', SolrResponse(self.xml), 10,
+                self.cache.generation, conn)
+            return self.cache.get('foo', now=now + 1)
+        self.failIf(search(110) is None)        # unchanged
+        self.failIf(search(120) is None)        # failed check
+        self.assertEqual(search(130), None)     # new index version
+        self.assertEqual(self.cache.get('bar', now=131), None)
+        self.assertEqual(self.cache.statistics()['invalidations'], 1)
+
+    def testCommitInvalidates(self):
+        conn = SolrConnection(host='localhost:8983', persistent=True)
+        conn.cache = self.cache
+        self.store('foo')
+        fakehttp(conn, getData('add_response.txt'))
+        conn.commit()
+        self.assertEqual(self.cache.get('foo'), None)
+
+    def testIndexVersionRequest(self):
+        conn = SolrConnection(host='localhost:8983', persistent=True)
+        luke = '<?xml version="1.0" encoding="UTF-8"?><response>' \
+            '<lst name="index"><int name="numDocs">42</int>' \
+            '<long name="version">1285839912761</long></lst></response>'
+        output = fakehttp(conn, 'HTTP/1.1 200 OK\nContent-Length: %d\n\n%s'
+            % (len(luke), luke))
+        self.assertEqual(conn.getIndexVersion(), 1285839912761)
+        self.failUnless(output.get().startswith(
+            'GET /solr/admin/luke?numTerms=0&show=index'))
+
+    def testSettings(self):
+        try:
+            self.assertEqual(getResultCache('foo', '/solr', 0, 60), None)
+            cache = getResultCache('foo', '/solr', 1024, 60)
+            self.failUnless(getResultCache('foo', '/solr', 2048, 5) is cache)
+            self.assertEqual((cache.size, cache.ttl), (2048, 5))
+            self.assertEqual(getResultCache('foo', '/solr', 2048, 0), None)
+            self.failIf(caches)
+        finally:
+            caches.clear()
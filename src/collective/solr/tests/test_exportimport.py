@@ -15,16 +15,25 @@ class SetupToolTests(SolrTestCase, TarballTester):
         config.host = 'foo'
         config.port = 23
         config.base = '/bar'
+        config.replicas = ('foo:24', 'baz:25')
         config.async = False
         config.auto_commit = True
         config.commit_within = 1000
         config.index_timeout = 7
         config.search_timeout = 3.1415
+        config.pool_size = 5
+        config.batch_size = 50
+        config.batch_bytes = 4096
+        config.update_connections = 4
+        config.compression = True
         config.max_results = 42
+        config.search_cache_size = 65536
+        config.search_cache_ttl = 30
         config.required = ('foo', 'bar')
         config.search_pattern = 'foo:{value}'
         config.facets = ('type', 'state')
         config.filter_queries = ('type', )
+        config.field_lists = ('live: Title path_string', )
         config.slow_query_threshold = 2342
         config.effective_steps = 900
         config.exclude_user = True
@@ -41,15 +50,25 @@ class SetupToolTests(SolrTestCase, TarballTester):
         self.assertEqual(config.host, '127.0.0.1')
         self.assertEqual(config.port, 8983)
         self.assertEqual(config.base, '/solr')
+        self.assertEqual(config.replicas, ('foo:24', 'baz:25'))
         self.assertEqual(config.async, False)
         self.assertEqual(config.auto_commit, True)
         self.assertEqual(config.commit_within, 1000)
         self.assertEqual(config.index_timeout, 0)
         self.assertEqual(config.search_timeout, 0)
+        self.assertEqual(config.pool_size, 10)
+        self.assertEqual(config.batch_size, 100)
+        self.assertEqual(config.batch_bytes, 1048576)
+        self.assertEqual(config.update_connections, 1)
+        self.assertEqual(config.compression, False)
         self.assertEqual(config.max_results, 0)
+        self.assertEqual(config.search_cache_size, 0)
+        self.assertEqual(config.search_cache_ttl, 60)
         self.assertEqual(config.required, ('SearchableText', ))
         self.assertEqual(config.facets, ('portal_type', 'review_state'))
         self.assertEqual(config.filter_queries, ('portal_type', ))
+        self.assertEqual([line.split(':')[0] for line in config.field_lists],
+            ['livesearch'])
         self.assertEqual(config.slow_query_threshold, 0)
         self.assertEqual(config.effective_steps, 1)
         self.assertEqual(config.exclude_user, False)
@@ -93,6 +112,10 @@ SOLR_XML = """\
     <host value="foo" />
     <port value="23" />
     <base value="/bar" />
+    <replicas>
+      <replica host="foo:24" />
+      <replica host="baz:25" />
+    </replicas>
   </connection>
   <settings>
     <async value="False" />
@@ -100,7 +123,14 @@ SOLR_XML = """\
     <commit-within value="1000" />
     <index-timeout value="7" />
     <search-timeout value="3.1415" />
+    <pool-size value="5" />
+    <batch-size value="50" />
+    <batch-bytes value="4096" />
+    <update-connections value="4" />
+    <compression value="True" />
     <max-results value="42" />
+    <search-cache-size value="65536" />
+    <search-cache-ttl value="30" />
     <required-query-parameters>
       <parameter name="foo" />
       <parameter name="bar" />
@@ -113,6 +143,9 @@ SOLR_XML = """\
     <filter-query-parameters>
       <parameter name="type" />
     </filter-query-parameters>
+    <field-lists>
+      <parameter name="live: Title path_string" />
+    </field-lists>
     <slow-query-threshold value="2342" />
     <effective-steps value="900" />
     <exclude-user value="True" />
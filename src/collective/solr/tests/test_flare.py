@@ -13,3 +13,20 @@ class FlareTests(TestCase):
         self.assertEqual(score(score=0.04567), '4.6')
         self.assertEqual(score(score='0.04567'), '4.6')
         self.assertEqual(score(score='0.1'), '10.0')
+
+    def testWrappingSharesData(self):
+        flare = SolrFlare(id='foo', path_string='/plone/foo')
+        plone = PloneFlare(flare)
+        self.assertEqual(plone.getPath(), '/plone/foo')
+        self.failUnless(plone._fields is flare._fields)
+        plone['Title'] = 'Foo'      # changes aren't seen by the flare
+        self.failIf('Title' in flare)
+        self.assertEqual(plone, dict(flare, Title='Foo'))
+
+    def testPickling(self):
+        from cPickle import dumps, loads
+        plone = PloneFlare(SolrFlare(id='foo'), request=object())
+        clone = loads(dumps(plone, 2))
+        self.failUnless(isinstance(clone, PloneFlare))
+        self.assertEqual(clone, plone)
+        self.assertEqual(clone.request, None)
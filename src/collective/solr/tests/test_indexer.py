@@ -3,7 +3,7 @@ from threading import Thread
 from re import search, findall, DOTALL
 from DateTime import DateTime
 from datetime import datetime
-from zope.component import provideUtility
+from zope.component import provideUtility, queryUtility
 from Products.CMFCore.CMFCatalogAware import CMFCatalogAware
 
 from collective.solr.interfaces import ISolrConnectionConfig
@@ -14,6 +14,7 @@ from collective.solr.indexer import logger as logger_indexer
 from collective.solr.tests.utils import getData, fakehttp, fakemore
 from collective.solr.solr import SolrConnection
 from collective.solr.utils import prepareData
+from collective.solr.worker import getWorker, shutdown
 
 
 class Foo(CMFCatalogAware):
@@ -134,6 +135,20 @@ class QueueIndexerTests(TestCase):
         self.proc.commit()                                       # committing sends data
         self.assertEqual(str(output), getData('commit_request.txt'))
 
+    def testAsyncCommit(self):
+        queryUtility(ISolrConnectionConfig).async = True
+        conn = self.mngr.getConnection()
+        worker = getWorker(conn.host, conn.solrBase)
+        worker.conn = SolrConnection(host=conn.host)
+        output = fakehttp(worker.conn, getData('add_response.txt'),
+            getData('commit_response.txt'))
+        self.proc.index(Foo(id='500', name='python test doc'))
+        self.proc.commit()                  # hands over the requests...
+        worker.queue.join()                 # ...which get sent in background
+        shutdown()
+        self.assertEqual(sortFields(output.get()), getData('add_request.txt'))
+        self.assertEqual(output.get(), getData('commit_request_no_wait.txt'))
+
     def testNoIndexingWithoutAllRequiredFields(self):
         response = getData('dummy_response.txt')
         output = fakehttp(self.mngr.getConnection(), response)   # fake add response
@@ -8,6 +8,7 @@ from collective.solr.mangler import mangleQuery
 from collective.solr.mangler import extractQueryParameters
 from collective.solr.mangler import cleanupQueryParameters
 from collective.solr.mangler import optimizeQueryParameters
+from collective.solr.mangler import fieldListParameter
 from collective.solr.parser import SolrSchema, SolrField
 
 
@@ -133,6 +134,20 @@ class QueryManglerTests(TestCase):
             'expires': '[1972-05-11T03:45:00.000Z TO *]',
         })
 
+    def testEffectiveRangeWithSearchCache(self):
+        self.config.search_cache_size = 1024
+        self.config.search_cache_ttl = 60
+        first = dict(effectiveRange=DateTime(1000000000.123))
+        mangleQuery(first, self.config, {})
+        second = dict(effectiveRange=DateTime(1000000000.456))
+        mangleQuery(second, self.config, {})
+        self.assertEqual(first, second)
+        self.assertEqual(first['effective'], '[* TO 2001-09-09T01:46:00.000Z]')
+        self.config.search_cache_size = 0       # no rounding without cache
+        third = dict(effectiveRange=DateTime(1000000000.456))
+        mangleQuery(third, self.config, {})
+        self.assertNotEqual(third, second)
+
     def testIgnoredParameters(self):
         keywords = mangle(use_solr=True, foo='bar')
         self.assertEqual(keywords, {'foo': 'bar'})
@@ -295,6 +310,47 @@ class QueryParameterTests(TestCase):
         params = extract({'fl': ['foo', 'bar']})
         self.assertEqual(params, {'fl': ['foo', 'bar']})
 
+    def testFieldListAliasAndProfile(self):
+        extract = extractQueryParameters
+        params = extract({'metadata_columns': ['Title'], 'fl_profile': 'foo'})
+        self.assertEqual(params, {'fl': ['Title'], 'fl_profile': 'foo'})
+        params = extract({'metadata_columns': ['Title'], 'fl': 'foo'})
+        self.assertEqual(params, {'fl': 'foo'})
+
+    def testCountOnly(self):
+        extract = extractQueryParameters
+        self.assertEqual(extract({'count_only': True}), {'rows': 0})
+        self.assertEqual(extract({'count_only': True, 'b_size': 10}),
+            {'rows': 0})
+        self.assertEqual(extract({'count_only': False, 'b_size': 10}),
+            {'rows': 10})
+
+    def testFieldListProjection(self):
+        config = SolrConnectionConfig()
+        config.field_lists = ['live: Title, Description', 'nav: Title']
+        schema = SolrSchema()
+        schema['uniqueKey'] = 'UID'
+        schema['UID'] = SolrField(name='UID', stored=True)
+        schema['path_string'] = SolrField(name='path_string', stored=True)
+        def fields(**params):
+            fields = fieldListParameter(params, config, schema)
+            return fields, params
+        self.assertEqual(fields(), (None, {'fl': '* score'}))
+        self.assertEqual(fields(fl='* foo'), (None, {'fl': '* foo score'}))
+        self.assertEqual(fields(fl_profile='unknown'),
+            (None, {'fl': '* score'}))
+        self.assertEqual(fields(fl='Title')[1],
+            {'fl': 'Title UID path_string score'})
+        self.assertEqual(fields(fl=['Title', 'Subject'])[1],
+            {'fl': 'Subject Title UID path_string score'})
+        projected, params = fields(fl_profile='live', rows=10)
+        self.assertEqual(params, {'rows': 10,
+            'fl': 'Description Title UID path_string score'})
+        self.assertEqual(projected, set(['Title', 'Description', 'UID',
+            'path_string', 'score']))
+        self.assertEqual(fields(fl='Title', fl_profile='live')[1],
+            {'fl': 'Title UID path_string score'})
+
     def testSortIndexCleanup(self):
         cleanup = cleanupQueryParameters
         schema = SolrSchema()
@@ -0,0 +1,66 @@
+from unittest import TestCase
+from zope.annotation.attribute import AttributeAnnotations
+from zope.annotation.interfaces import IAttributeAnnotatable
+from zope.component import provideAdapter
+from zope.interface import alsoProvides
+from zope.publisher.browser import TestRequest
+from DateTime import DateTime
+
+from collective.solr.memo import SearchMemo, getSearchMemo, forgetSearches
+from collective.solr.memo import statistics
+from collective.solr.parser import SolrResponse
+from collective.solr.tests.utils import getData
+
+
+class SearchMemoTests(TestCase):
+
+    def setUp(self):
+        self.memo = SearchMemo()
+        self.response = SolrResponse(getData('complex_xml_response.txt'))
+
+    def testDuplicates(self):
+        before = statistics()
+        self.assertEqual(self.memo.get('foo'), None)
+        first = self.memo.set('foo', self.response)
+        first.results()[0]['foo'] = 'bar'       # modifying the copy...
+        second = self.memo.get('foo')
+        self.failIf(second is first)
+        self.failIf('foo' in second.results()[0])   # ...leaves it intact
+        self.assertEqual(second.results()[0].id, first.results()[0].id)
+        self.assertEqual(self.memo.get('bar'), None)
+        self.assertEqual(self.memo.statistics(),
+            dict(queries=3, duplicates=1, prefetched=0))
+        after = statistics()
+        self.assertEqual(after['queries'] - before['queries'], 3)
+        self.assertEqual(after['duplicates'] - before['duplicates'], 1)
+
+    def testEffectiveDate(self):
+        first = DateTime(1000000000.123)
+        self.failUnless(self.memo.effective(first) is first)
+        self.failUnless(self.memo.effective(DateTime()) is first)
+
+    def testPrefetched(self):
+        future = self.memo.futures['foo'] = object()
+        self.assertEqual(self.memo.prefetch('bar'), None)
+        self.failUnless(self.memo.prefetch('foo') is future)
+        self.assertEqual(self.memo.prefetch('foo'), None)   # only once
+        self.assertEqual(self.memo.statistics()['prefetched'], 1)
+
+    def testClear(self):
+        self.memo.set('foo', self.response)
+        self.memo.futures['bar'] = object()
+        self.memo.clear()
+        self.assertEqual(self.memo.get('foo'), None)
+        self.assertEqual(self.memo.futures, {})
+
+    def testRequestMemo(self):
+        provideAdapter(AttributeAnnotations)
+        request = TestRequest()
+        self.assertEqual(getSearchMemo(request, create=True), None)
+        alsoProvides(request, IAttributeAnnotatable)
+        self.assertEqual(getSearchMemo(request), None)
+        memo = getSearchMemo(request, create=True)
+        self.failUnless(getSearchMemo(request) is memo)
+        memo.set('foo', self.response)
+        forgetSearches(request)
+        self.assertEqual(memo.get('foo'), None)
@@ -1,12 +1,32 @@
 from unittest import TestCase
+from StringIO import StringIO
+from datetime import datetime
 from DateTime import DateTime
 
 from collective.solr.parser import SolrResponse
+from collective.solr.parser import SolrJSONResponse
+from collective.solr.parser import LazySolrResults
+from collective.solr.parser import VirtualResults
+from collective.solr.parser import DeferredValue
+from collective.solr.parser import parse_date_as_datetime
+from collective.solr.parser import unmarshallers
 from collective.solr.parser import SolrSchema
+from collective.solr.parser import SolrField
+from collective.solr.parser import SolrFlare
 from collective.solr.parser import parseDate
 from collective.solr.tests.utils import getData
 
 
+def getSchema():
+    """ return the schema matching the json and xml test responses """
+    return SolrSchema(getData('schema.xml').split('\n\n', 1)[1])
+
+
+def raw(flare, name):
+    """ return the stored, i.e. possibly still deferred value of a field """
+    return flare._values[flare._fields.positions[name]]
+
+
 class ParserTests(TestCase):
 
     def testParseSimpleSearchResults(self):
@@ -58,6 +78,234 @@ class ParserTests(TestCase):
         self.assertEqual(headers['params']['q'], 'id:[* TO *]')
         self.assertEqual(headers['params']['version'], '2.2')
 
+    def testParseJSONSearchResults(self):
+        complex_json_response = getData('complex_json_response.txt')
+        response = SolrJSONResponse(complex_json_response,
+            schema=getSchema())
+        results = response.response     # the result set is named 'response'
+        self.assertEqual(results.numFound, '2')
+        self.assertEqual(results.start, '0')
+        self.assertEqual(len(results), 2)
+        first = results[0]
+        self.assertEqual(first.cat, ['software', 'search'])
+        self.assertEqual(len(first.features), 7)
+        self.assertEqual([type(x).__name__ for x in first.features],
+            ['str'] * 6 + ['unicode'])
+        self.assertEqual(first.id, 'SOLR1000')
+        self.assertEqual(first.inStock, True)
+        self.assertEqual(first.incubationdate_dt, DateTime('2006/01/17 GMT'))
+        self.assertEqual(first.timestamp,
+            DateTime('2008-03-01 00:13:11.767 GMT'))
+        self.assertEqual(first.popularity, 10)
+        self.assertEqual(first.price, 0.0)
+        self.assertEqual(results[1].weight, 401.6)
+        headers = response.responseHeader
+        self.assertEqual(headers['status'], 0)
+        self.assertEqual(headers['params']['wt'], 'json')
+        self.assertEqual(headers['params']['q'], 'id:[* TO *]')
+        counts = response.facet_counts
+        self.assertEqual(counts['facet_queries'], {})
+        self.assertEqual(counts['facet_fields']['cat']['software'], 1)
+
+    def testParseJSONMatchesXML(self):
+        xml = SolrResponse(getData('complex_xml_response.txt'))
+        json = SolrJSONResponse(getData('complex_json_response.txt'),
+            schema=getSchema())
+        self.assertEqual(list(xml.response), list(json.response))
+
+    def testParseJSONDatesBySchema(self):
+        data = '{"response": {"numFound": 1, "start": 0, "docs": [{' \
+            '"id": "2008-03-01T00:13:11.767Z", "features": ["1999-12-31' \
+            'T23:59:59Z"], "timestamp": "2008-03-01T00:13:11.767Z"}]}}'
+        first = SolrJSONResponse(data, schema=getSchema()).response[0]
+        self.assertEqual(first.id, '2008-03-01T00:13:11.767Z')
+        self.assertEqual(first.features, ['1999-12-31T23:59:59Z'])
+        self.assertEqual(first.timestamp,
+            DateTime('2008-03-01 00:13:11.767 GMT'))
+        # without a schema dates can't be told apart from strings
+        first = SolrJSONResponse(data).response[0]
+        self.assertEqual(first.timestamp, '2008-03-01T00:13:11.767Z')
+
+    def testLazyParsing(self):
+        complex_xml_response = getData('complex_xml_response.txt')
+        eager = SolrResponse(complex_xml_response)
+        response = SolrResponse(complex_xml_response, lazy=True)
+        results = response.response
+        self.failUnless(isinstance(results, LazySolrResults))
+        self.assertEqual(results.numFound, '2')
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results.pending(), 2)  # nothing decoded yet
+        self.assertEqual(response.responseHeader['params']['rows'], '10')
+        first = results[0]
+        self.assertEqual(results.pending(), 1)
+        self.failUnless(results[0] is first)
+        self.assertEqual(first, eager.response[0])
+        self.assertEqual(first.incubationdate_dt, DateTime('2006/01/17 GMT'))
+        self.assertEqual(list(results), list(eager.response))
+        self.assertEqual(results.pending(), 0)
+
+    def testLazyResultsListMethods(self):
+        complex_xml_response = getData('complex_xml_response.txt')
+        eager = SolrResponse(complex_xml_response).response
+        def lazy():
+            return SolrResponse(complex_xml_response, lazy=True).response
+        self.failUnless(eager[1] in lazy())
+        self.assertEqual(lazy().index(eager[1]), 1)
+        self.assertEqual(lazy().pop(), eager[1])
+        self.assertEqual(lazy()[:], eager[:])
+        self.assertEqual(list(reversed(lazy())), [eager[1], eager[0]])
+        self.assertEqual(lazy() + [None], eager + [None])
+        self.assertEqual(lazy(), eager)
+        results = lazy()
+        results.sort(key=lambda flare: flare.id)
+        self.assertEqual([flare.id for flare in results],
+            ['3007WFP', 'SOLR1000'])
+
+    def testLazyResultsWrapper(self):
+        complex_xml_response = getData('complex_xml_response.txt')
+        results = SolrResponse(complex_xml_response, lazy=True).response
+        results.wrapper = lambda flare: flare.id
+        results[0:0] = [None]
+        self.assertEqual(results[1:], ['SOLR1000', '3007WFP'])
+        self.assertEqual(list(results), [None, 'SOLR1000', '3007WFP'])
+
+    def testVirtualResults(self):
+        complex_xml_response = getData('complex_xml_response.txt')
+        results = SolrResponse(complex_xml_response).response
+        results.numFound = '7'
+        virtual = VirtualResults(results, start=2)
+        self.assertEqual(len(virtual), 7)
+        self.assertEqual(virtual.numFound, '7')
+        self.assertEqual([flare and flare.id for flare in virtual],
+            [None, None, 'SOLR1000', '3007WFP', None, None, None])
+        self.assertEqual(virtual[-4].id, '3007WFP')
+        self.assertEqual(virtual[1:3], [None, results[0]])
+        self.assertRaises(IndexError, virtual.__getitem__, 7)
+
+    def testVirtualResultsCountOnly(self):
+        results = SolrResponse(getData('complex_xml_response.txt')).response
+        del results[:]                  # as returned for `rows=0`
+        calls = []
+        def fetch(start, rows):
+            calls.append((start, rows))
+            return []
+        virtual = VirtualResults(results, fetch=fetch)
+        self.assertEqual(len(virtual), 2)
+        self.failUnless(virtual)
+        self.assertEqual(calls, [])     # counting doesn't fetch anything
+
+    def testVirtualResultsCountOnlyFetching(self):
+        complex_xml_response = getData('complex_xml_response.txt')
+        flares = list(SolrResponse(complex_xml_response).response)
+        results = SolrResponse(complex_xml_response).response
+        del results[:]                  # as returned for `rows=0`
+        calls = []
+        def fetch(start, rows):
+            calls.append((start, rows))
+            return flares[start:start + rows]
+        virtual = VirtualResults(results, fetch=fetch)
+        self.assertEqual(list(virtual), [None, None])   # iterating doesn't
+        self.assertEqual(virtual[1].id, '3007WFP')      # ...but indexing does
+        self.assertEqual(virtual[0].id, 'SOLR1000')
+        self.assertEqual(calls, [(0, 2)])
+        self.assertEqual(list(virtual), flares)
+
+    def testVirtualResultsWrapper(self):
+        results = SolrResponse(getData('complex_xml_response.txt'),
+            lazy=True).response
+        calls = []
+        def wrapper(flare):
+            calls.append(flare.id)
+            return flare.id
+        virtual = VirtualResults(results, start=1, wrapper=wrapper)
+        self.assertEqual(virtual[2], '3007WFP')
+        self.assertEqual(calls, ['3007WFP'])    # only accessed ones...
+        self.assertEqual(list(virtual), [None, 'SOLR1000', '3007WFP'])
+        self.assertEqual(list(virtual), [None, 'SOLR1000', '3007WFP'])
+        self.assertEqual(calls, ['3007WFP', 'SOLR1000'])    # ...and once
+
+    def testVirtualResultsFetching(self):
+        requests = []
+        def fetch(start, rows):
+            requests.append((start, rows))
+            return ['r%d' % idx for idx in range(start, start + rows)][:3]
+        virtual = VirtualResults(['r5', 'r6', 'r7', 'r8'], start=5,
+            fetch=fetch, size=4)
+        virtual.length = 15
+        virtual.window = 1
+        self.assertEqual(virtual[3], 'r3')
+        self.assertEqual(virtual[0], 'r0')
+        self.assertEqual(virtual[8], 'r8')
+        self.assertEqual(virtual[10], 'r10')
+        self.assertEqual(virtual[12], None)     # short window
+        self.assertEqual(virtual[14], 'r14')
+        self.assertEqual(virtual[14], 'r14')     # fetched only once
+        self.assertEqual(requests, [(1, 4), (0, 1), (9, 4), (13, 2)])
+
+    def testVirtualResultsFetchingLimits(self):
+        requests = []
+        def fetch(start, rows):
+            requests.append((start, rows))
+            return ['r%d' % idx for idx in range(start, start + rows)]
+        virtual = VirtualResults(['r10'], start=10, fetch=fetch, size=1)
+        virtual.length = 1000
+        self.assertEqual(list(virtual)[9:12], [None, 'r10', None])
+        self.assertEqual(requests, [])      # iterating doesn't fetch
+        self.assertEqual(virtual[11], 'r11')
+        self.assertEqual(virtual[60], 'r60')    # in the same window
+        self.assertEqual(virtual[61], 'r61')
+        self.assertEqual(virtual[5], 'r5')      # up to the initial window
+        self.assertEqual(requests, [(11, 50), (61, 50), (5, 5)])
+        virtual.fetches = 4
+        self.assertEqual(virtual[500], 'r500')
+        self.assertEqual(virtual[600], None)    # too many fetches
+        self.assertEqual(len(requests), 4)
+
+    def testStreamingParse(self):
+        complex_xml_response = getData('complex_xml_response.txt')
+        eager = SolrResponse(complex_xml_response)
+        response = SolrResponse()
+        flares = response.stream(StringIO(complex_xml_response))
+        first = flares.next()
+        self.assertEqual(first, eager.response[0])
+        self.assertEqual(list(flares), eager.response[1:])
+        self.assertEqual(response.response.numFound, '2')
+        self.assertEqual(len(response.response), 0)   # no results list
+        self.assertEqual(response.responseHeader['params']['rows'], '10')
+
+    def testDeferredDates(self):
+        complex_xml_response = getData('complex_xml_response.txt')
+        first = SolrResponse(complex_xml_response).response[0]
+        value = raw(first, 'incubationdate_dt')
+        self.failUnless(isinstance(value, DeferredValue))
+        self.assertEqual(value.value, '2006-01-17T00:00:00.000Z')
+        date = first.incubationdate_dt
+        self.assertEqual(date, DateTime('2006/01/17 GMT'))
+        self.failUnless(first['incubationdate_dt'] is date)     # cached
+        self.failUnless(raw(first, 'incubationdate_dt') is date)
+        self.assertEqual(first.get('timestamp'),
+            DateTime('2008-03-01 00:13:11.767 GMT'))
+        self.failIf([value for value in first.values()
+            if isinstance(value, DeferredValue)])
+
+    def testDeferredDatesWithCustomUnmarshaller(self):
+        simple_unmarshallers = unmarshallers.copy()
+        simple_unmarshallers['date'] = parse_date_as_datetime
+        response = getData('complex_json_response.txt')
+        first = SolrJSONResponse(response, simple_unmarshallers,
+            schema=getSchema()).response[0]
+        self.failUnless(isinstance(raw(first, 'timestamp'),
+            DeferredValue))
+        self.assertEqual(first['timestamp'],
+            datetime(2008, 3, 1, 0, 13, 11, 767000))
+
+    def testDeferredDatesCanBeDisabled(self):
+        response = SolrResponse()
+        response.deferred = ()
+        response.parse(getData('complex_xml_response.txt'))
+        date = raw(response.response[0], 'incubationdate_dt')
+        self.assertEqual(date, DateTime('2006/01/17 GMT'))
+
     def testParseFacetSearchResults(self):
         facet_xml_response = getData('facet_xml_response.txt')
         response = SolrResponse(facet_xml_response)
@@ -151,6 +399,43 @@ class ParserTests(TestCase):
         self.assertEqual(len([f for f in fields if
             getattr(f, 'multiValued', False)]), 3)
 
+    def testSchemaLookupTables(self):
+        schema_xml = getData('schema.xml')
+        schema = SolrSchema(schema_xml.split('\n\n', 1)[1])
+        self.assertEqual(len(schema.fields), 17)
+        self.failUnless(schema.fields is schema.fields)     # built once
+        self.assertEqual(schema.fieldNames, frozenset([field.name
+            for field in schema.fields]))
+        self.assertEqual(schema.required, frozenset(['id', 'name']))
+        self.assertEqual(schema.multiValued,
+            frozenset(['cat', 'features', 'text']))
+        self.failUnless('id' in schema.stored)
+        self.failUnless('timestamp' in schema.indexed)
+        self.failIf('word' in schema.indexed)
+        self.assertEqual(schema.epiIndexes, ())
+        self.failUnless(schema.isDate('timestamp'))
+        self.failUnless(schema.isDate('incubationdate_dt'))     # dynamic
+        self.failIf(schema.isDate('id'))
+        self.assertEqual(schema.lookup('popularity_i').type, 'sint')
+        self.assertEqual(schema.lookup('foo'), None)
+        handlers = {'solr.DateField': str}
+        converters = schema.converters(handlers)
+        self.failUnless(schema.converters(handlers) is converters)
+        self.assertEqual(converters['timestamp'], (str, ' '))
+        self.assertEqual(converters['cat'], (None, None))
+        other = schema.converters({'solr.DateField': int})
+        self.assertEqual(other['timestamp'], (int, ' '))
+        self.failUnless(schema.converters(handlers) is converters)
+        # entries for mappings that are gone can't be mixed up with new ones
+        handlers = {'solr.DateField': str}
+        schema.tables()['converters'][id(handlers)] = ({}, {})
+        self.assertEqual(schema.converters(handlers)['timestamp'], (str, ' '))
+        schema['path_string'] = SolrField(name='path_string')
+        schema['path_depth'] = SolrField(name='path_depth')
+        schema['path_parents'] = SolrField(name='path_parents')
+        self.assertEqual(schema.epiIndexes, ('path',))
+        self.assertEqual(len(schema.fields), 20)
+
     def testParseQuirkyResponse(self):
         quirky_response = getData('quirky_response.txt')
         response = SolrResponse(quirky_response)
@@ -159,6 +444,100 @@ class ParserTests(TestCase):
         self.assertEqual(empty_uid, [])
 
 
+class FlareTests(TestCase):
+
+    def testMapping(self):
+        flare = SolrFlare({'id': 'foo'}, Title='Foo')
+        self.assertEqual(flare['id'], 'foo')
+        self.assertEqual(flare.Title, 'Foo')
+        self.assertEqual(flare.get('Description'), None)
+        self.assertRaises(KeyError, flare.__getitem__, 'Description')
+        self.assertRaises(AttributeError, getattr, flare, 'Description')
+        self.assertEqual(sorted(flare), ['Title', 'id'])
+        self.assertEqual(len(flare), 2)
+        self.failUnless('id' in flare)
+        self.assertEqual(flare, {'id': 'foo', 'Title': 'Foo'})
+        del flare['Title']
+        self.failIf('Title' in flare)
+        self.assertEqual(flare.items(), [('id', 'foo')])
+        self.assertEqual(flare.setdefault('Title', 'Bar'), 'Bar')
+        self.assertEqual(dict(flare), {'id': 'foo', 'Title': 'Bar'})
+
+    def testSharedFields(self):
+        response = SolrResponse(getData('complex_xml_response.txt'))
+        first, second = response.response
+        self.failUnless(first._fields is second._fields)
+        self.assertEqual(len(first._fields.names), 13)
+        first['extra'] = 'foo'      # new fields don't show up elsewhere
+        self.failIf('extra' in second)
+        self.assertEqual(second.get('extra', 42), 42)
+        self.assertEqual(len(second), 12)
+        self.failIf(first._fields is second._fields)    # copied on write
+        self.failIf('extra' in response.flareFields.positions)
+        second['other'] = 'bar'
+        self.failIf('other' in first)
+        self.assertEqual(first.extra, 'foo')
+
+    def testDictApi(self):
+        flare = SolrFlare.fromkeys(['id', 'Title'], 'foo')
+        self.failUnless(isinstance(flare, SolrFlare))
+        self.assertEqual(flare, {'id': 'foo', 'Title': 'foo'})
+        name, value = flare.popitem()
+        self.assertEqual(len(flare), 1)
+        self.failIf(name in flare)
+        flare.clear()
+        self.assertEqual(flare, {})
+        self.assertRaises(KeyError, flare.popitem)
+
+    def testAttributes(self):
+        from zope.interface import Interface, alsoProvides
+        class IMarker(Interface):
+            pass
+        flare = SolrFlare(id='foo')
+        flare.extra = 'bar'         # attributes aren't fields
+        self.assertEqual(flare.extra, 'bar')
+        self.failIf('extra' in flare)
+        alsoProvides(flare, IMarker)
+        self.failUnless(IMarker.providedBy(flare))
+
+    def testDefaults(self):
+        response = SolrResponse(getData('complex_xml_response.txt'))
+        first, second = response.response
+        response.flareFields.defaults = dict(incubationdate_dt='n/a',
+            Title='n/a')
+        self.assertEqual(first.Title, 'n/a')
+        self.assertEqual(first.get('Title'), 'n/a')
+        self.assertEqual(first.incubationdate_dt, DateTime('2006/01/17 GMT'))
+        self.assertEqual(second.incubationdate_dt, 'n/a')
+        self.failUnless('Title' in second)
+        self.assertEqual(len(second), 14)
+        self.assertEqual(second.pop('Title'), 'n/a')
+        second['Title'] = 'Foo'
+        self.assertEqual(second.Title, 'Foo')
+        self.assertEqual(first.Title, 'n/a')
+        self.assertEqual(len(second), 14)
+        del second['Title']
+        self.assertEqual(second.Title, 'n/a')
+        self.assertRaises(KeyError, second.__delitem__, 'Title')
+        self.assertEqual(first.copy().Title, 'n/a')
+        self.assertEqual(response.copy().response[1].Title, 'n/a')
+
+    def testCopyAndPickle(self):
+        from cPickle import dumps, loads
+        flare = SolrResponse(getData('complex_xml_response.txt')).response[0]
+        copy = flare.copy()
+        copy['id'] = 'bar'
+        self.assertEqual(flare.id, 'SOLR1000')
+        clone = loads(dumps(flare, 2))
+        self.assertEqual(clone, flare)
+        self.assertEqual(clone.incubationdate_dt, DateTime('2006/01/17 GMT'))
+        flare = SolrFlare(id='foo')
+        flare.extra = 'bar'         # attributes are kept as well
+        clone = loads(dumps(flare, 2))
+        self.assertEqual(clone, flare)
+        self.assertEqual(clone.extra, 'bar')
+
+
 class ParseDateHelperTests(TestCase):
 
     def testParseDateHelper(self):
@@ -0,0 +1,138 @@
+from unittest import TestCase
+from socket import socketpair
+from threading import Thread
+from zope.component import provideUtility
+
+from collective.solr.interfaces import ISolrConnectionConfig
+from collective.solr.manager import SolrConnectionConfig
+from collective.solr.manager import SolrConnectionManager
+from collective.solr.pool import SolrConnectionPool, isAlive
+from collective.solr.search import Search
+from collective.solr.solr import SolrConnection
+from collective.solr.tests.utils import getData, fakehttp
+
+
+class PoolTests(TestCase):
+
+    def setUp(self):
+        self.pool = SolrConnectionPool('localhost:8983', '/solr', size=2,
+            timeout=0.1)
+
+    def testCheckoutAndCheckin(self):
+        conn = self.pool.checkout()
+        self.failUnless(isinstance(conn, SolrConnection))
+        self.assertEqual(conn.host, 'localhost:8983')
+        self.assertEqual(conn.solrBase, '/solr')
+        self.pool.checkin(conn)
+        self.failUnless(self.pool.checkout() is conn)
+        stats = self.pool.statistics()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['busy'], 1)
+        self.assertEqual(stats['idle'], 0)
+
+    def testCheckinDiscardsPendingRequests(self):
+        conn = self.pool.checkout()
+        conn.delete('500')
+        self.pool.checkin(conn)
+        self.assertEqual(conn.xmlbody, [])
+
+    def testExhaustedPool(self):
+        first = self.pool.checkout()
+        second = self.pool.checkout()
+        third = self.pool.checkout()        # waits, then overflows
+        self.assertEqual(len(set([first, second, third])), 3)
+        stats = self.pool.statistics()
+        self.assertEqual(stats['waits'], 1)
+        self.assertEqual(stats['overflows'], 1)
+        for conn in first, second, third:
+            self.pool.checkin(conn)
+        self.assertEqual(self.pool.statistics()['idle'], 2)
+
+    def testWaitForConnection(self):
+        first = self.pool.checkout()
+        second = self.pool.checkout()
+        self.pool.timeout = 5
+        def release():
+            self.pool.checkin(second)
+        thread = Thread(target=release)
+        thread.start()
+        conn = self.pool.checkout()
+        thread.join()
+        self.failUnless(conn is second)
+        self.assertEqual(self.pool.statistics()['overflows'], 0)
+        self.pool.checkin(first)
+        self.pool.checkin(conn)
+
+    def testIdleEviction(self):
+        conn = self.pool.checkout()
+        self.pool.checkin(conn)
+        self.pool.idle = 0.0001
+        self.pool.evict(now=self.pool.connections[0][1] + 1)
+        self.assertEqual(self.pool.statistics()['evictions'], 1)
+        self.failIf(self.pool.checkout() is conn)
+
+    def testStaleConnection(self):
+        conn = self.pool.checkout()
+        client, server = socketpair()
+        conn.conn.sock = client
+        self.failUnless(isAlive(conn))
+        server.close()                      # the server drops the connection
+        self.failIf(isAlive(conn))
+        self.pool.checkin(conn)
+        self.failUnless(self.pool.checkout() is conn)
+        self.assertEqual(conn.conn.sock, None)
+        self.assertEqual(self.pool.statistics()['reconnects'], 1)
+
+
+class ManagerPoolTests(TestCase):
+
+    def setUp(self):
+        provideUtility(SolrConnectionConfig(), ISolrConnectionConfig)
+        self.mngr = SolrConnectionManager()
+        self.mngr.setHost(active=True, port=55555)
+
+    def tearDown(self):
+        self.mngr.closeConnection()
+        self.mngr.setHost(active=False)
+
+    def testConnectionReuse(self):
+        conn = self.mngr.getConnection()
+        self.failUnless(self.mngr.getConnection() is conn)
+        self.mngr.closeConnection()
+        self.failUnless(self.mngr.getConnection() is conn)
+        stats = self.mngr.getPoolStatistics()
+        self.assertEqual(stats['busy'], 1)
+        self.failUnless(stats['hits'] >= 1)
+
+    def testDisabledPool(self):
+        config = SolrConnectionConfig()
+        config.pool_size = 0
+        provideUtility(config, ISolrConnectionConfig)
+        self.mngr.setHost(active=True, port=55555)
+        conn = self.mngr.getConnection()
+        self.mngr.closeConnection()
+        self.failIf(self.mngr.getConnection() is conn)
+        self.assertEqual(self.mngr.getPoolStatistics(), {})
+
+    def testSearchingThreadsHandBackConnections(self):
+        config = SolrConnectionConfig()
+        config.pool_size = 2
+        provideUtility(config, ISolrConnectionConfig)
+        self.mngr.setHost(active=True, port=55555)
+        conn = self.mngr.getConnection()
+        fakehttp(conn, *[getData('search_response.txt')] * 3)
+        self.mngr.closeConnection()
+        search = Search()
+        search.manager = self.mngr
+        results = []
+        def worker():
+            results.append(search.search('+id:[* TO *]', rows=10))
+        for idx in range(3):            # more threads than connections
+            thread = Thread(target=worker)
+            thread.start()
+            thread.join()
+        self.assertEqual([r.results().numFound for r in results], ['1'] * 3)
+        stats = self.mngr.getPoolStatistics()
+        self.assertEqual(stats['busy'], 0)
+        self.assertEqual(stats['waits'], 0)
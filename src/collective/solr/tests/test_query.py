@@ -8,8 +8,14 @@ from zope.component import provideUtility
 from collective.solr.interfaces import ISolrConnectionConfig
 from collective.solr.manager import SolrConnectionConfig
 from collective.solr.manager import SolrConnectionManager
+from collective.solr.pool import getPool
+from collective.solr.tests.corpus import http
+from collective.solr.tests.test_parser import getSchema
 from collective.solr.tests.utils import getData, fakehttp
 from collective.solr.search import Search
+from collective.solr.solr import SolrException
+from collective.solr.exceptions import SolrInactiveException
+from collective.solr.exceptions import SolrUnavailableException
 from collective.solr.queryparser import quote
 
 
@@ -324,3 +330,91 @@ class SearchTests(TestCase):
         self.assertEqual(match.sku, '500')
         self.assertEqual(match.timestamp,
             DateTime('2008-02-29 16:11:46.998 GMT'))
+
+
+class PooledSearchTests(TestCase):
+
+    def setUp(self):
+        provideUtility(SolrConnectionConfig(), ISolrConnectionConfig)
+        self.mngr = SolrConnectionManager()
+        self.mngr.setHost(active=True, port=55555)
+
+    def tearDown(self):
+        self.mngr.closeConnection()
+        self.mngr.setHost(active=False)
+
+    def testSubmit(self):
+        search = Search()
+        search.manager = self.mngr
+        conn = self.mngr.getConnection()
+        fakehttp(conn, getData('search_response.txt'))
+        self.mngr.closeConnection()             # back into the pool
+        future = search.submit('+id:[* TO *]', rows=10)
+        results = future.result().results()
+        self.failUnless(future.done())
+        self.assertEqual(results.numFound, '1')
+        self.assertEqual(results[0].id, '500')
+        self.assertEqual(self.mngr.getPoolStatistics()['busy'], 0)
+
+    def testFailedSubmitIsRepeated(self):
+        search = Search()
+        search.manager = self.mngr
+        conn = self.mngr.getConnection()
+        fakehttp(conn)                          # no response at all
+        self.mngr.closeConnection()
+        future = search.submit('+id:[* TO *]')
+        future.thread.join()
+        self.failUnless(future.error is not None)
+        conn = self.mngr.getConnection()        # the synchronous retry
+        fakehttp(conn, getData('search_response.txt'))
+        self.assertEqual(future.result().results()[0].id, '500')
+
+    def testInactiveSubmit(self):
+        search = Search()
+        search.manager = self.mngr
+        self.mngr.setHost(active=False)
+        self.assertRaises(SolrInactiveException, search.submit, 'foo')
+
+    def testSearchErrorReleasesConnection(self):
+        config = SolrConnectionConfig()
+        config.replicas = ['replica:8983']
+        provideUtility(config, ISolrConnectionConfig)
+        self.mngr.setHost(active=True, port=55555)
+        pool = getPool('replica:8983', config.base, config.pool_size)
+        conn = pool.checkout()
+        fakehttp(conn, getData('not_found.txt'))
+        pool.checkin(conn)
+        search = Search()
+        search.manager = self.mngr
+        self.assertRaises(SolrException, search.search, 'foo', rows=10)
+        self.assertEqual(pool.statistics()['busy'], 0)
+        self.failUnless(pool.checkout() is conn)    # not ejected
+
+    def testJSONSearchUsesSchema(self):
+        config = SolrConnectionConfig()
+        config.replicas = ['replica:8983']
+        provideUtility(config, ISolrConnectionConfig)
+        self.mngr.setHost(active=True, port=55555)
+        self.mngr.getSchema = getSchema
+        pool = getPool('replica:8983', config.base, config.pool_size)
+        conn = pool.checkout()
+        fakehttp(conn, http(getData('complex_json_response.txt')))
+        pool.checkin(conn)
+        search = Search()
+        search.manager = self.mngr
+        results = search.search('foo', wt='json')
+        self.assertEqual(results[0].timestamp,
+            DateTime('2008-03-01 00:13:11.767 GMT'))
+
+    def testIterateWithoutSchema(self):
+        config = SolrConnectionConfig()
+        config.replicas = ['replica:8983']
+        provideUtility(config, ISolrConnectionConfig)
+        self.mngr.setHost(active=True, port=55555)
+        self.mngr.getSchema = lambda: None      # solr couldn't be asked
+        search = Search()
+        search.manager = self.mngr
+        results = search.iterate('foo')
+        self.assertRaises(SolrUnavailableException, results.next)
+        pool = getPool('replica:8983', config.base, config.pool_size)
+        self.assertEqual(pool.statistics()['busy'], 0)
@@ -0,0 +1,111 @@
+from unittest import TestCase
+from os import remove
+from os.path import exists
+from socket import error
+from tempfile import mktemp
+
+from collective.solr.schema import SolrSchemaCache
+from collective.solr.solr import SolrConnection
+from collective.solr.tests.utils import getData, fakehttp
+
+schema = getData('schema.xml').split('\n\n', 1)[1]
+
+
+class FakeConnection(object):
+    """ a connection returning the given schema file (or exception) """
+
+    host = 'localhost:8983'
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def getSchemaFile(self, etag=None, modified=None):
+        self.requests.append((etag, modified))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class SchemaCacheTests(TestCase):
+
+    def setUp(self):
+        self.path = mktemp()
+        self.cache = SolrSchemaCache(self.path, ttl=60)
+
+    def tearDown(self):
+        if exists(self.path):
+            remove(self.path)
+
+    def testSharedSchema(self):
+        conn = FakeConnection((schema, '"1"', None))
+        first = self.cache.get(conn)
+        self.assertEqual(first.uniqueKey, 'id')
+        self.failUnless(self.cache.get(conn) is first)
+        self.assertEqual(conn.requests, [(None, None)])
+
+    def testRevalidation(self):
+        conn = FakeConnection((schema, '"1"', 'Mon, 01 Mar 2010'),
+            (None, '"1"', 'Mon, 01 Mar 2010'), (schema, '"2"', None),
+            (schema.replace('>id<', '>uid<'), '"3"', None))
+        first = self.cache.get(conn)
+        self.cache.checked -= 60                # not modified
+        self.failUnless(self.cache.get(conn) is first)
+        self.cache.checked -= 60                # same content
+        self.failUnless(self.cache.get(conn) is first)
+        self.cache.checked -= 60                # changed
+        self.assertEqual(self.cache.get(conn).uniqueKey, 'uid')
+        self.assertEqual(conn.requests, [(None, None),
+            ('"1"', 'Mon, 01 Mar 2010'), ('"1"', 'Mon, 01 Mar 2010'),
+            ('"2"', None)])
+
+    def testFailedRevalidation(self):
+        conn = FakeConnection((schema, None, None), error('down'))
+        first = self.cache.get(conn)
+        self.cache.checked -= 60
+        self.failUnless(self.cache.get(conn) is first)
+        self.failUnless(self.cache.get(conn) is first)  # no new attempt
+        self.assertEqual(len(conn.requests), 2)
+
+    def testSnapshot(self):
+        self.cache.get(FakeConnection((schema, '"1"', None)))
+        self.failUnless(exists(self.path))
+        cache = SolrSchemaCache(self.path)      # e.g. after a restart
+        conn = FakeConnection(error('down'))
+        self.assertEqual(cache.get(conn).uniqueKey, 'id')
+        self.assertEqual(conn.requests, [('"1"', None)])
+
+    def testClear(self):
+        conn = FakeConnection((schema, None, None), error('down'))
+        cache = SolrSchemaCache()
+        cache.get(conn)
+        cache.clear()
+        self.assertRaises(error, cache.get, conn)
+
+    def testClearWhileRevalidating(self):
+        cache = SolrSchemaCache(ttl=60)
+        class Connection(FakeConnection):
+            def getSchemaFile(self, etag=None, modified=None):
+                if self.requests:       # clear during the revalidation
+                    cache.clear()
+                return FakeConnection.getSchemaFile(self, etag, modified)
+        conn = Connection((schema, '"1"', None), (schema, '"2"', None))
+        first = cache.get(conn)
+        cache.checked -= 60
+        self.failUnless(cache.get(conn) is first)
+        self.assertEqual(cache.schema, None)    # the new one wasn't used
+        self.assertEqual(cache.etag, None)
+
+
+class ConditionalRequestTests(TestCase):
+
+    def testNotModified(self):
+        conn = SolrConnection(host='localhost:8983', persistent=True)
+        output = fakehttp(conn, 'HTTP/1.1 304 Not Modified\n'
+            'ETag: "1"\nContent-Length: 0\n\n')
+        self.assertEqual(conn.getSchemaFile('"1"', 'Mon, 01 Mar 2010'),
+            (None, '"1"', 'Mon, 01 Mar 2010'))
+        request = output.get()
+        self.failUnless('If-None-Match: "1"' in request)
+        self.failUnless('If-Modified-Since: Mon, 01 Mar 2010' in request)
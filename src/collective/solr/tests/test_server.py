@@ -16,7 +16,9 @@ from collective.solr.interfaces import ISolrConnectionConfig
 from collective.solr.interfaces import ISolrConnectionManager
 from collective.solr.interfaces import ISearch
 from collective.solr.dispatcher import solrSearchResults, FallBackException
+from collective.solr.dispatcher import prefetch
 from collective.solr.indexer import SolrIndexProcessor
+from collective.solr.memo import getSearchMemo
 from collective.solr.indexer import logger as logger_indexer
 from collective.solr.manager import logger as logger_manager
 from collective.solr.flare import PloneFlare
@@ -453,6 +455,17 @@ class SolrServerTests(SolrTestCase):
         self.assertEqual(sorted([(r.Title, r.path_string) for r in results]),
             [('News', '/plone/news'), ('News', '/plone/news/aggregator')])
 
+    def testLiveSearchUsesFieldListProfile(self):
+        self.maintenance.reindex()
+        self.config.field_lists = ('livesearch: Title path_string', )
+        output = self.portal.livesearch_reply('News')
+        self.failUnless('title="News"' in output, output)
+        self.failIf('LSNothingFound' in output, output)
+        results = solrSearchResults(SearchableText='News',
+            fl_profile='livesearch')
+        self.assertEqual(sorted(results[0].keys()),
+            ['Title', 'UID', 'path_string', 'score'])
+
     def testSolrSearchResultsWithUnicodeTitle(self):
         self.folder.processForm(values={'title': u'Føø sekretær'})
         commit()
@@ -696,6 +709,29 @@ class SolrServerTests(SolrTestCase):
         self.failUnless('/plone/news' in paths)
         self.failUnless('/plone/events' in paths)
 
+    def testDuplicateAnonymousSearches(self):
+        self.maintenance.reindex()
+        self.setRoles(())                   # as anonymous user
+        catalog = self.portal.portal_catalog
+        first = catalog(SearchableText='News')
+        sleep(0.01)                         # the effective date differs...
+        second = catalog(SearchableText='News')
+        self.assertEqual(len(second), len(first))
+        memo = getSearchMemo(self.portal.REQUEST)   # ...but not the query
+        self.assertEqual(memo.statistics()['duplicates'], 1)
+
+    def testPrefetchedAnonymousSearch(self):
+        self.maintenance.reindex()
+        self.setRoles(())                   # as anonymous user
+        results, = prefetch(self.portal, dict(SearchableText='News'))
+        sleep(0.01)                         # the effective date differs...
+        expected = self.portal.portal_catalog(SearchableText='News')
+        memo = getSearchMemo(self.portal.REQUEST)   # ...but not the query
+        self.assertEqual(memo.statistics()['prefetched'], 1)
+        self.assertEqual(memo.futures, {})
+        self.assertEqual(len(results), len(expected))
+        self.assertEqual(memo.statistics()['duplicates'], 1)
+
     def testEffectiveRangeWithSteps(self):
         # set some content to become effective/expire around this time...
         now = DateTime('2010/09/09 15:21:08 UTC')
@@ -1,6 +1,9 @@
 from unittest import TestCase
 from elementtree.ElementTree import fromstring
-from collective.solr.solr import SolrConnection
+from zlib import decompress, MAX_WBITS
+from collective.solr.parser import SolrResponse
+from collective.solr.solr import SolrConnection, gzip
+from collective.solr.solr import escapeXML, fieldTag
 from collective.solr.tests.utils import getData, fakehttp
 
 
@@ -118,3 +121,162 @@ class TestSolr(TestCase):
         self.failUnlessEqual(node.attrib['name'], 'QTime')
         self.failUnlessEqual(node.text, '0')
         res.find('QTime')
+
+    def test_coalesced_requests(self):
+        add_response = getData('add_response.txt')
+        c = SolrConnection(host='localhost:8983', persistent=True)
+        output = fakehttp(c, add_response, add_response, add_response)
+        c.add(id='1')
+        c.add(id='2')
+        c.delete('3')
+        c.delete('4')
+        c.deleteByQuery('id:5')
+        res = c.flush()
+        self.assertEqual(len(res), 3)   # three requests were sent
+        body = lambda: output.get().split('\n\n', 1)[1]
+        self.assertEqual(body(), '<add><doc><field name="id">1</field></doc>'
+            '<doc><field name="id">2</field></doc></add>')
+        self.assertEqual(body(), '<delete><id>3</id><id>4</id></delete>')
+        self.assertEqual(body(), '<delete><query>id:5</query></delete>')
+
+    def test_batch_limits(self):
+        add_response = getData('add_response.txt')
+        c = SolrConnection(host='localhost:8983', persistent=True)
+        output = fakehttp(c, *[add_response] * 5)
+        c.batchSize = 2
+        c.add(id='1')
+        c.add(id='2')
+        c.add(id='3')
+        c.add(id='4', commitWithin=1000)
+        self.assertEqual(len(c.flush()), 3)
+        self.assertEqual(len(output), 3)
+        c.batchSize = 100
+        c.batchBytes = 100
+        for idx in range(4):
+            c.add(id=str(idx))
+        self.assertEqual(len(c.flush()), 2)
+
+    def test_bisect_failed_batch(self):
+        add_response = getData('add_response.txt')
+        error_response = 'HTTP/1.1 400 Bad Request\nContent-Length: 0\n\n'
+        c = SolrConnection(host='localhost:8983', persistent=True)
+        output = fakehttp(c, error_response, add_response, error_response,
+            add_response, error_response)
+        c.add(id='1')
+        c.add(id='2')
+        c.add(id='3')
+        res = c.flush()
+        self.assertEqual(len(res), 2)   # only the third document failed
+        ids = lambda: output.get().count('<doc>')
+        self.assertEqual([ids() for idx in range(5)], [3, 1, 2, 1, 1])
+
+    def test_server_error_fails_batch(self):
+        add_response = getData('add_response.txt')
+        error_response = 'HTTP/1.1 500 Server Error\nContent-Length: 0\n\n'
+        c = SolrConnection(host='localhost:8983', persistent=True)
+        output = fakehttp(c, error_response, add_response)
+        c.add(id='1')
+        c.add(id='2')
+        c.add(id='3')
+        failed = []
+        c.sendRequests(c.xmlbody, [], failed)
+        self.assertEqual(len(failed), 3)    # not split up, but kept
+        c.abort()
+        self.assertEqual(len(output), 1)    # nothing else was sent
+        self.assertEqual(output.get().count('<doc>'), 3)
+
+    def test_compressed_update(self):
+        add_response = getData('add_response.txt')
+        c = SolrConnection(host='localhost:8983', persistent=True)
+        output = fakehttp(c, add_response, add_response)
+        c.compress = True
+        c.add(id='500', name='python test doc')
+        c.add(id='501', text='foo bar ' * 1000, commitWithin=1000)
+        self.assertEqual(len(c.flush()), 2)
+        headers, body = ''.join(output[0]).split('\r\n\r\n', 1)
+        self.failIf('gzip' in headers)      # small requests aren't compressed
+        headers, body = ''.join(output[1]).split('\r\n\r\n', 1)
+        self.failUnless('Content-Encoding: gzip' in headers)
+        self.failUnless(len(body) < 200)   # instead of about 8k
+        body = decompress(body, 16 + MAX_WBITS)
+        self.failUnless(body.startswith('<add commitWithin="1000"><doc>'))
+        self.failUnless(body.endswith('</doc></add>'))
+
+    def test_compressed_search(self):
+        search_response = getData('search_response.txt')
+        headers, body = search_response.split('\n\n', 1)
+        body = gzip(body)
+        headers = headers.replace('Content-Length: 560',
+            'Content-Length: %d\nContent-Encoding: gzip' % len(body))
+        c = SolrConnection(host='localhost:8983', persistent=True)
+        output = fakehttp(c, '\n\n'.join([headers, body]))
+        c.compress = True
+        response = c.search(q='+id:[* TO *]', wt='xml', rows='10')
+        response.chunk = 16     # force reading in several steps
+        results = SolrResponse(response).response
+        self.assertEqual(results.numFound, '1')
+        self.assertEqual(results[0].name, 'python test doc')
+        self.failUnless('Accept-Encoding: gzip' in str(output))
+
+    def test_escaping(self):
+        self.assertEqual(escapeXML('foo'), 'foo')
+        self.assertEqual(escapeXML(42), '42')
+        self.assertEqual(escapeXML(u'<\xe4 & \xf6>'),
+            '&lt;\xc3\xa4 &amp; \xc3\xb6&gt;')
+        self.assertEqual(escapeXML('foo\x00\x1fbar\t\n\r'), 'foo  bar\t\n\r')
+        self.assertEqual(fieldTag('foo'), '<field name="foo">')
+        self.assertEqual(fieldTag('f"o&o', 2), '<field name="f&quot;o&amp;o" '
+            'boost="2">')
+        self.failUnless(fieldTag('foo') is fieldTag('foo'))
+
+    def test_parallel_updates(self):
+        add_response = getData('add_response.txt')
+        c = SolrConnection(host='localhost:8983', persistent=True)
+        c.senders = 2
+        c.uniqueKey = 'id'
+        first = fakehttp(c, *[add_response] * 4)
+        second = fakehttp(c.sender(1), *[add_response] * 4)
+        ids = [str(idx) for idx in range(6)]
+        for id in ids:
+            c.add(id=id)
+        c.deleteByQuery('id:[* TO *]')
+        c.delete('0')
+        c.delete('1')
+        res = c.flush()
+        lanes = [[id for id in ids if hash(id) % 2 == lane] for lane in 0, 1]
+        self.assertEqual(len(res), 5)   # two adds, three deletes
+        self.failUnless(first.get().endswith('<add>%s</add>' % ''.join([
+            '<doc><field name="id">%s</field></doc>' % id for id in lanes[0]])))
+        self.failUnless(second.get().endswith('<add>%s</add>' % ''.join([
+            '<doc><field name="id">%s</field></doc>' % id for id in lanes[1]])))
+        self.failUnless(first.get().endswith('</query></delete>'))
+        deletes = dict([(hash(id) % 2, id) for id in '0', '1'])
+        self.failUnless(first.get().endswith('<id>%s</id></delete>' %
+            deletes[0]))
+        self.failUnless(second.get().endswith('<id>%s</id></delete>' %
+            deletes[1]))
+
+    def test_iterate(self):
+        def page(*ids):
+            docs = ''.join(['<doc><str name="id">%s</str></doc>' % id
+                for id in ids])
+            body = '<?xml version="1.0" encoding="UTF-8"?><response>' \
+                '<result name="response" numFound="%d" start="0">%s' \
+                '</result></response>' % (len(ids), docs)
+            return 'HTTP/1.1 200 OK\nContent-Type: text/xml; charset=utf-8' \
+                '\nContent-Length: %d\n\n%s' % (len(body), body)
+        c = SolrConnection(host='localhost:8983', persistent=True)
+        output = fakehttp(c, page('a', 'b', 'c'), page('c', 'd', 'e'),
+            page('e', 'f'))
+        results = c.iterate('id', 3, q='+id:[* TO *]', fq='+foo:bar',
+            fl='name')
+        self.assertEqual([flare.id for flare in results], list('abcdef'))
+        self.assertEqual(len(output), 3)
+        requests = [output.get() for idx in range(3)]
+        self.failUnless('fl=name+id' in requests[0])
+        self.failUnless('sort=id+asc' in requests[0])
+        self.failUnless('start=0' in requests[2])
+        self.failIf('%22c%22' in requests[0])
+        self.failUnless('fq=id%3A%5B%22c%22+TO+%2A%5D' in requests[1])
+        self.failUnless('fq=id%3A%5B%22e%22+TO+%2A%5D' in requests[2])
+        self.failUnless('fq=%2Bfoo%3Abar' in requests[2])
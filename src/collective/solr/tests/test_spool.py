@@ -0,0 +1,100 @@
+from unittest import TestCase
+from os import remove
+from os.path import exists
+from socket import error
+from tempfile import mktemp
+
+from collective.solr.solr import SolrConnection
+from collective.solr.spool import SolrSpool, coalesce
+from collective.solr.tests.utils import getData, fakehttp
+
+
+class UnreachableConnection(object):
+    """ fake http connection to a solr server that is down """
+
+    def request(self, *args, **kw):
+        raise error('connection refused')
+
+    connect = request
+
+    def close(self):
+        pass
+
+
+class SpoolTests(TestCase):
+
+    def setUp(self):
+        self.spool = SolrSpool(mktemp(suffix='.log'))
+
+    def tearDown(self):
+        if exists(self.spool.path):
+            remove(self.spool.path)
+
+    def testAppendAndRead(self):
+        self.failIf(self.spool.pending())
+        self.assertEqual(self.spool.read(), [])
+        self.spool.append(['<delete><id>1</id></delete>'])
+        add = '<add><doc><field name="text">foo\n\nbar\n</field></doc></add>'
+        self.spool.append([add])
+        self.failUnless(self.spool.pending())
+        self.assertEqual(len(self.spool), 2)
+        self.assertEqual(self.spool.read()[1], add)
+        self.spool.write([])
+        self.failIf(self.spool.pending())
+
+    def testCoalesce(self):
+        add = '<add><doc><field name="id">%s</field></doc></add>'
+        delete = '<delete><id>%s</id></delete>'
+        requests = [add % 1, add % 2, delete % 1, '<commit/>', add % 2,
+            '<delete><query>id:3</query></delete>', '<commit/>']
+        self.assertEqual(coalesce(requests, 'id'), [delete % 1, add % 2,
+            '<delete><query>id:3</query></delete>', '<commit/>'])
+        # adds are only recognized when the unique key is known
+        self.assertEqual(coalesce(requests), [add % 1, add % 2, delete % 1,
+            add % 2, '<delete><query>id:3</query></delete>', '<commit/>'])
+
+    def testSpoolFailedRequests(self):
+        c = SolrConnection(host='localhost:8983', persistent=True)
+        c.spool = self.spool
+        c.conn = UnreachableConnection()
+        c.add(id='500', name='python test doc')
+        c.delete('501')
+        self.assertEqual(c.flush(), [])
+        self.assertEqual(c.xmlbody, [])
+        self.assertEqual(self.spool.read(), [
+            '<add><doc><field name="id">500</field><field name="name">'
+            'python test doc</field></doc></add>',
+            '<delete><id>501</id></delete>'])
+
+    def testSpoolUnavailable(self):
+        unavailable = 'HTTP/1.1 503 Service Unavailable\nContent-Length: 0\n\n'
+        bad = 'HTTP/1.1 400 Bad Request\nContent-Length: 0\n\n'
+        c = SolrConnection(host='localhost:8983', persistent=True)
+        c.spool = self.spool
+        fakehttp(c, bad, unavailable)
+        c.add(id='500')
+        c.delete('501')
+        c.flush()
+        self.assertEqual(self.spool.read(), ['<delete><id>501</id></delete>'])
+
+    def testReplay(self):
+        self.spool.append(['<delete><id>500</id></delete>'])
+        c = SolrConnection(host='localhost:8983', persistent=True)
+        c.spool = self.spool
+        output = fakehttp(c, getData('delete_response.txt'),
+            getData('add_response.txt'))
+        c.add(id='500', name='python test doc')
+        self.assertEqual(len(c.flush()), 1)  # replayed requests not counted
+        self.assertEqual(output.get(), getData('delete_request.txt'))
+        self.failUnless(output.get().endswith('</doc></add>'))
+        self.failIf(self.spool.pending())
+
+    def testFailedReplay(self):
+        self.spool.append(['<delete><id>500</id></delete>'])
+        c = SolrConnection(host='localhost:8983', persistent=True)
+        c.spool = self.spool
+        c.conn = UnreachableConnection()
+        c.delete('501')
+        c.flush()
+        self.assertEqual(self.spool.read(), ['<delete><id>500</id></delete>',
+            '<delete><id>501</id></delete>'])
@@ -151,16 +151,26 @@ class BatchingHelperTests(TestCase):
         self.assertEqual(results[0].UID, '7c31adb20d5eee314233abfe48515cf3')
 
     def testResultsPadding(self):
-        results = self.results()
-        padResults(results)
+        results = padResults(self.results())
         self.assertEqual(len(results), 1204)
+        self.assertEqual(results.numFound, '1204')
         self.assertEqual(results[0].UID, '7c31adb20d5eee314233abfe48515cf3')
         self.assertEqual(results[137:], [None] * (1204 - 137))
 
     def testResultsPaddingWithStart(self):
-        results = self.results()
-        padResults(results, start=50)
+        results = padResults(self.results(), start=50)
         self.assertEqual(len(results), 1204)
         self.assertEqual(results[:50], [None] * 50)
         self.assertEqual(results[50].UID, '7c31adb20d5eee314233abfe48515cf3')
         self.assertEqual(results[187:], [None] * (1204 - 187))
+
+    def testResultsPaddingWithFetching(self):
+        requests = []
+        def fetch(start, rows):
+            requests.append((start, rows))
+            return range(start, start + rows)
+        results = padResults(self.results(), start=50, rows=137, fetch=fetch)
+        self.assertEqual(results[50].UID, '7c31adb20d5eee314233abfe48515cf3')
+        self.assertEqual(results[49], 49)
+        self.assertEqual(results[-1], 1203)
+        self.assertEqual(requests, [(0, 50), (1146, 58)])
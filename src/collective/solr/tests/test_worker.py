@@ -0,0 +1,66 @@
+from unittest import TestCase
+
+from collective.solr.solr import SolrConnection
+from collective.solr.worker import SolrIndexWorker
+from collective.solr.tests.utils import getData, fakehttp
+
+
+class WorkerTests(TestCase):
+
+    def setUp(self):
+        self.worker = SolrIndexWorker('localhost:8983', '/solr', size=2,
+            timeout=0.1)
+        self.worker.conn = SolrConnection(host='localhost:8983')
+        self.conn = SolrConnection(host='localhost:8983')
+
+    def tearDown(self):
+        self.worker.stop(timeout=5)
+
+    def testBackgroundIndexing(self):
+        output = fakehttp(self.worker.conn, getData('add_response.txt'))
+        self.conn.add(id='500', name='python test doc')
+        self.failUnless(self.worker.put(self.conn))
+        self.assertEqual(self.conn.xmlbody, [])
+        self.worker.queue.join()
+        self.assertEqual(output.get(), getData('add_request.txt'))
+
+    def testMergedTransactions(self):
+        self.worker.start = lambda: None    # don't process the queue yet
+        self.conn.add(id='1')
+        self.worker.put(self.conn)
+        self.conn.delete('2')
+        self.conn.delete('3')
+        self.worker.put(self.conn, commit=True)
+        responses = [getData('add_response.txt')] * 3
+        output = fakehttp(self.worker.conn, *responses)
+        del self.worker.start
+        self.worker.stop(timeout=5)         # send out pending requests
+        self.assertEqual(len(output), 3)
+        self.failUnless(output.get().endswith('<add><doc>'
+            '<field name="id">1</field></doc></add>'))
+        self.failUnless(output.get().endswith('<delete><id>2</id>'
+            '<id>3</id></delete>'))
+        self.failUnless(output.get().endswith('<commit waitFlush="false" '
+            'waitSearcher="false"/>'))
+
+    def testBackpressure(self):
+        self.worker.start = lambda: None    # simulate a busy worker
+        for idx in range(2):
+            self.conn.delete(str(idx))
+            self.failUnless(self.worker.put(self.conn))
+        self.conn.delete('2')
+        self.failIf(self.worker.put(self.conn))
+        self.assertEqual(self.conn.xmlbody, ['<delete><id>2</id></delete>'])
+        self.assertEqual(self.worker.queue.qsize(), 2)
+        self.worker.queue.queue.clear()
+
+    def testSettings(self):
+        output = fakehttp(self.worker.conn, getData('add_response.txt'))
+        self.conn.batchSize = 7
+        self.conn.compress = True
+        self.conn.add(id='500', name='python test doc')
+        self.worker.put(self.conn)
+        self.worker.queue.join()
+        self.assertEqual(self.worker.conn.batchSize, 7)
+        self.assertEqual(self.worker.conn.compress, True)
+        self.assertEqual(len(output), 1)
@@ -6,6 +6,7 @@ from unidecode import unidecode
 from zope.component import queryUtility
 
 from collective.solr.interfaces import ISolrConnectionConfig
+from collective.solr.parser import VirtualResults
 
 
 def isActive():
@@ -138,9 +139,8 @@ def findObjects(origin):
                 paths.insert(idx + 1, path + '/' + id)
 
 
-def padResults(results, start=0, **kw):
-    if start:
-        results[0:0] = [None] * start
-    found = int(results.numFound)
-    tail = found - len(results)
-    results.extend([None] * tail)
+def padResults(results, start=0, rows=None, fetch=None, wrapper=None, **kw):
+    """ return a sequence of all found results suitable for batching,
+        without allocating space for the ones that weren't fetched """
+    return VirtualResults(results, int(start or 0), fetch, int(rows or 0),
+        wrapper)
@@ -0,0 +1,155 @@
+from logging import getLogger
+from atexit import register
+from Queue import Queue, Full, Empty
+from socket import error
+from threading import Lock, Thread
+
+from collective.solr.solr import SolrConnection, SolrException
+
+logger = getLogger('collective.solr.worker')
+
+# connection attributes copied over from the connections used for queueing
+settings = ('batchSize', 'batchBytes', 'compress', 'compressThreshold',
+    'spool', 'uniqueKey', 'breaker', 'senders', 'cache')
+
+
+class SolrIndexWorker(object):
+    """ a background thread sending the update requests of committed
+        transactions to a solr server;  a single thread is used per server,
+        so that the requests are still sent in the order they were queued """
+
+    def __init__(self, host, base, size=1000, timeout=5, merge=50):
+        self.host = host
+        self.base = base
+        self.timeout = timeout      # seconds to wait for a free queue slot
+        self.merge = merge          # maximum number of transactions per flush
+        self.queue = Queue(size)
+        self.conn = None
+        self.thread = None
+        self.lock = Lock()
+
+    def start(self):
+        """ start the worker thread unless it's already running """
+        self.lock.acquire()
+        try:
+            if self.thread is None or not self.thread.isAlive():
+                self.thread = Thread(target=self.run,
+                    name='collective.solr indexing worker for %s' % self.host)
+                self.thread.setDaemon(True)
+                self.thread.start()
+        finally:
+            self.lock.release()
+
+    def put(self, conn, commit=False):
+        """ queue the pending requests of the given connection for sending
+            them in the background;  if the queue stays full for longer than
+            the timeout `False` is returned and the requests are left in
+            place, so they can be sent synchronously instead """
+        if not conn.xmlbody:
+            return True
+        options = dict([(name, getattr(conn, name)) for name in settings])
+        options['timeout'] = getattr(conn.conn, 'timeout', None)
+        item = list(conn.xmlbody), commit, options
+        self.start()
+        try:
+            self.queue.put(item, True, self.timeout)
+        except Full:
+            logger.warning('indexing queue for %s is full, sending %d '
+                'request(s) synchronously', self.host, len(conn.xmlbody))
+            return False
+        del conn.xmlbody[:]
+        return True
+
+    def connect(self, options):
+        """ return the worker's connection set up using the given options """
+        if self.conn is None:
+            self.conn = SolrConnection(host=self.host, solrBase=self.base,
+                persistent=True)
+        timeout = options.pop('timeout', None)
+        for name, value in options.items():
+            setattr(self.conn, name, value)
+        self.conn.setTimeout(timeout)
+        return self.conn
+
+    def run(self):
+        """ process queued transactions until `None` is encountered;
+            all transactions waiting in the queue are sent at once """
+        while True:
+            items = [self.queue.get()]
+            while items[-1] is not None and len(items) < self.merge:
+                try:
+                    items.append(self.queue.get_nowait())
+                except Empty:
+                    break
+            stop = items[-1] is None
+            items = filter(None, items)
+            try:
+                if items:
+                    self.send(items)
+            finally:
+                for idx in range(len(items) + stop):
+                    self.queue.task_done()
+            if stop:
+                return
+
+    def send(self, items):
+        """ send the requests of the given transactions to solr """
+        conn = self.connect(items[-1][2])
+        commit = False
+        for requests, flag, options in items:
+            conn.xmlbody.extend(requests)
+            commit = commit or flag
+        logger.debug('sending %d request(s) of %d transaction(s)',
+            len(conn.xmlbody), len(items))
+        try:
+            if commit:
+                conn.commit(waitFlush=False, waitSearcher=False)
+            else:
+                conn.flush()
+        except (SolrException, error):
+            logger.exception('exception during background indexing')
+            conn.abort()
+
+    def stop(self, timeout=None):
+        """ send out all queued requests and stop the worker thread """
+        if not self.queue.empty():
+            self.start()
+        thread = self.thread
+        if thread is not None and thread.isAlive():
+            self.queue.put(None)
+            thread.join(timeout)
+            if thread.isAlive():
+                logger.warning('indexing worker for %s did not finish, %d '
+                    'transaction(s) unsent', self.host, self.queue.qsize())
+        if self.conn is not None:
+            self.conn.close()
+
+
+# like the connection pools the workers are shared process-wide
+workers = {}
+workersLock = Lock()
+
+
+def getWorker(host, base):
+    """ return the indexing worker for the given solr server """
+    workersLock.acquire()
+    try:
+        worker = workers.get((host, base), None)
+        if worker is None:
+            worker = workers[host, base] = SolrIndexWorker(host, base)
+        return worker
+    finally:
+        workersLock.release()
+
+
+def shutdown(timeout=30):
+    """ drain the queues of all workers, e.g. when shutting down """
+    workersLock.acquire()
+    try:
+        for worker in workers.values():
+            worker.stop(timeout)
+        workers.clear()
+    finally:
+        workersLock.release()
+
+register(shutdown)